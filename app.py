@@ -1,33 +1,25 @@
+import os
+import uuid
+
 import streamlit as st
 from streamlit_extras.buy_me_a_coffee import button as coffee_button
 
 import utils.wiki_utils as wiki_utils
-from utils.app_utils import (wiki_search, get_sections, get_article_image,
+from utils.app_utils import (wiki_search, get_sections, get_page_image_html, get_page_infobox_html,
                              get_combined_knowledge_sections,
-                             get_translation, get_summary, get_strong_summary)
+                             get_english_search_term, get_suggested_page, get_search_candidates,
+                             prefetch_article, wait_for_prefetch, fill_missing_ui_translations,
+                             get_summary, get_strong_summary)
 from utils.localization import load_translations, set_language, _
+from utils.tracing import start_trace, finish_trace, span, current_span, waterfall_html, NO_SPAN
+from utils.llm_usage import start_request, session_table
+from utils.model_router import router
+from utils.resilience import CortexUnavailable, breaker_table
+from utils.article_store import ArticleRecord, article, store
+from utils.title_index import suggest, add_titles
 
 
-translations = load_translations('locales')
-
-if not 'target_language' in st.session_state:
-    print("Setting default language to English")
-    set_language('en')
-else:
-    print("Setting language to ", st.session_state['target_language'])
-    set_language(st.session_state['target_language'])
-
-
-def reset_section_position():
-    print("Resetting section position")
-    st.session_state['wiki_page'] = None
-    st.session_state['read_to_section'] = 1
-
-
-# Initialisierung der Streamlit App
-st.set_page_config(page_title="Full Wiki Project", layout="wide")
-
-st.markdown("""
+PAGE_STYLE = """
 <style>
 .title {
     display: flex;
@@ -51,169 +43,353 @@ div .stCheckbox {
     min-width: 240px;
     }
 </style>
-""", unsafe_allow_html=True)
-
-col1, col2 = st.columns([1, 3])
-with col1:
-    st.image("https://dannygerst.b-cdn.net/images/wikiglobe.png", width=200)
-with col2:
-    st.markdown('<div class="title"><h1>Full Wiki</h1></div>', unsafe_allow_html=True)
-st.write(_("Full Wiki delivers the complete Wikipedia experience in your language of choice."))
-
-# Sidebar nur für Informationen
-with st.sidebar:
-    st.header('Full Wiki')
-    st.write(_("Full Wiki delivers the complete Wikipedia experience in your language of choice."))
-    st.write("❶ ", _("Select your language"))
-    st.write("❷ ", _("Enter a search term"))
-    st.write("❸ ", _("Hit Search"))
-    st.write(
-        _("The most comprehensive English Wikipedia article will be retrieved and translated for you."))
-    st.divider()
-    st.write(
-        _("Vou wish to harness the combined knowledge of all major languages?"))
-    st.write("✅ ", _("Check the 'Merge Knowledge' box."))
-    st.write(_("This process may take some time, but you will be rewarded with a comprehensive article that integrates "
-               "knowledge from all major Wikipedia instances on the topic."))
-    st.divider()
-    st.text(_("Created by:"))
-    st.write("Danny Gerst")
-    st.write("[LinkedIn](https://www.linkedin.com/in/dannygerst/)")
-    st.write("[Twitter](https://twitter.com/gerstdanny/)")
-    st.write("[Website](https://www.dannygerst.de/)")
-    coffee_button(username="dannygerst", floating=False)
-
-# Hauptbereich für Suchfunktionen und Ergebnisse
-with st.container():
+"""
+
+
+def reset_section_position():
+    print("Resetting section position")
+    st.session_state['article_key'] = None
+    st.session_state['read_to_section'] = 1
+    st.session_state['candidates'] = None
+
+
+def submit_search():
+    st.session_state['submitted_query'] = st.session_state.get('query', '')
+
+
+def pick_suggestion(title, pageid, lang):
+    st.session_state['query'] = title
+    st.session_state['candidates'] = None
+    st.session_state['picked_suggestion'] = (title, pageid, lang)
+
+
+def pick_candidate(title, pageid):
+    st.session_state['candidates'] = None
+    st.session_state['picked_suggestion'] = (title, pageid, 'en')
+
+
+@st.fragment
+def search_box(target_language):
+    """
+      Search field with title suggestions while typing. Typing only reruns this fragment,
+      the suggestions come from the local title index.
+    """
+    # Suchen und Vorschläge brauchen einen Rerun der ganzen App
+    if st.session_state.get('submitted_query') or st.session_state.get('picked_suggestion'):
+        st.rerun()
+
     col1, col2 = st.columns([3, 1])
     with col1:
-        old_language = st.session_state.get('target_language')
-        languages = [['English', 'en'], ['Deutsch', 'de'], ['Français', 'fr'], ['Español', 'es'], ['Italiano', 'it']]
-        labels = [language[0] for language in languages]
-        codes = [language[1] for language in languages]
-        if 'target_language' in st.session_state:
-            selected_language = st.session_state['target_language']
-            index = codes.index(selected_language)
+        query = st.text_input(_("Search Term"), key="query", placeholder=_("Enter a search term..."), live="300ms")
+    with col2:
+        st.button(_("Search"), key="search_btn", on_click=submit_search)
+
+    for number, (title, pageid) in enumerate(suggest(query or '', target_language)):
+        st.button(title, key=f"suggestion_{number}", type="tertiary", on_click=pick_suggestion,
+                  args=(title, pageid, target_language))
+
+
+
+@st.fragment
+def article_reader(wiki_page, query, target_language, image_html):
+    """
+      Sections, navigation buttons and summaries of the article. A click on one of the buttons
+      only reruns this fragment, not the whole script.
+    """
+    # Bei einem Rerun nur des Fragments läuft der Anfang des Skripts nicht, also eigenen Trace starten
+    fragment_trace = start_trace('fragment', language=target_language) if current_span() is NO_SPAN else None
+    if fragment_trace:
+        start_request(st.session_state['session_id'])
+
+    try:
+        if 'next_section_btn' in st.session_state and st.session_state.next_section_btn:
+            st.session_state['read_to_section'] += 1
+            print("Next Section ", st.session_state['read_to_section'])
+
+        extract = wiki_page.extract
+
+        if 'summary_btn' in st.session_state and st.session_state.summary_btn:
+            with st.spinner(_("Summarizing Wikipedia article ... (Takes 1-2 minutes)")):
+                print("Summarizing Wikipedia article ...")
+                try:
+                    summary = get_summary(extract=extract, target_language=target_language, image_html=image_html,
+                                          lang=wiki_page.lang)
+                except CortexUnavailable as e:
+                    print(f"Summary not available: {e}")
+                    st.warning(_("The language model is not available right now. Please try again in a moment."))
+                    st.stop()
+                st.session_state['summary'] = summary
+            st.write(_("Summary"))
+            with span('render', view='summary'):
+                st.markdown(summary, unsafe_allow_html=True)
+            col1, col2, col3 = st.columns([1, 1, 1])
+            with col3:
+                strong_summary_btn = st.button(_("Strong Summary"), key="strong_summary_btn")
+                st.write(f'<p style="font-size:0.8rem; padding-left: 5px; margin-top: -8px; color: lightblue">'
+                         f'{_("Takes a while until finished")}</p>', unsafe_allow_html=True)
+        elif 'strong_summary_btn' in st.session_state and st.session_state.strong_summary_btn:
+            with st.spinner(_("Strong Summarizing Wikipedia article ... (up to 1 minute)")):
+                print("Strong Summarizing Wikipedia article ...")
+                try:
+                    if 'summary' in st.session_state and st.session_state['summary']:
+                        summary = st.session_state['summary']
+                        st.session_state['summary'] = None
+                    else:
+                        summary = get_summary(extract=extract, target_language=target_language, image_html=image_html,
+                                              lang=wiki_page.lang)
+
+                    strong_summary = get_strong_summary(summary=summary, target_language=target_language,
+                                                        image_html=image_html)
+                except CortexUnavailable as e:
+                    print(f"Strong summary not available: {e}")
+                    st.warning(_("The language model is not available right now. Please try again in a moment."))
+                    st.stop()
+            st.write(_("Strong Summary"))
+            with span('render', view='strong_summary'):
+                st.markdown(strong_summary, unsafe_allow_html=True)
         else:
-            index = 0
+            if 'merge_knowledge' in st.session_state and st.session_state['merge_knowledge']:
+                log_area = st.empty()
+                with st.spinner(_("Merging Knowledge ... (3-5 minutes)")):
+                    try:
+                        urls, sections, differences = get_combined_knowledge_sections(
+                            log_area, wiki_page, target_language, st.session_state['read_to_section'],
+                            image_html=image_html)
+                    except CortexUnavailable as e:
+                        print(f"Merge not available: {e}")
+                        st.warning(_("The language model is not available right now. Please try again in a moment."))
+                        st.stop()
+                log_area.empty()
+                links = ""
+                for key, value in urls.items():
+                    links += f"[Wikipedia {key}]({value})&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;"
+                st.write(links)
+
+                with span('render', view='merge'):
+                    st.markdown(sections, unsafe_allow_html=True)
+
+                with st.expander(_("Show Differences")):
+                    st.write(_("Facts that are not in the English article:"))
+                    for key, statements in differences.items():
+                        if statements:
+                            st.markdown(f"**[Wikipedia {key}]({urls.get(key, '')})**\n\n" +
+                                        "\n".join(f"- {statement}" for statement in statements))
+
+                # Jeder Klick führt einen weiteren Abschnitt zusammen
+                st.button(_("Next Section"), key="next_section_btn")
+            else:
+                st.write(f"[Wikipedia]({wiki_page.url})")
+                with st.spinner(_("Translating Wikipedia article ...")):
+                    print("Retrieving Section ", st.session_state['read_to_section'])
+                    sections = get_sections(extract, st.session_state['read_to_section'], target_language,
+                                            image_html=image_html, popularity=wiki_page.pageviews,
+                                            lang=wiki_page.lang)
+                    infobox_html = get_page_infobox_html(wiki_page, target_language)
+
+                with span('render', view='sections'):
+                    st.markdown(infobox_html + sections, unsafe_allow_html=True)
+
+                col1, col2, col3 = st.columns([1, 1, 1])
+                with col1:
+                    # TODO only show if section to read is smaller that the number of sections
+                    next_section_btn = st.button(_("Next Section"), key="next_section_btn")
+                with col3:
+                    summary_btn = st.button(_("Summary"), key="summary_btn")
+                    st.write(f'<p style="font-size:0.8rem; padding-left: 5px; margin-top: -8px; '
+                             f'color: rgb(46, 154, 255)">{_("Takes a while until finished")}</p>',
+                             unsafe_allow_html=True)
+    finally:
+        # Auch ein mit st.stop() beendeter Klick landet im Trace
+        if fragment_trace:
+            finish_trace(fragment_trace)
+
 
-        target_language = st.selectbox(key="target_language", index=index,
-                                       label=_("Target Language"), options=codes, on_change=reset_section_position,
-                                       format_func=lambda code: labels[codes.index(code)])
+# Jeder Rerun ist ein Trace
+trace = start_trace('rerun', language=st.session_state.get('target_language', 'en'))
+try:
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    llm_request = start_request(st.session_state['session_id'])
+    translations = load_translations('locales')
 
+    if not 'target_language' in st.session_state:
+        print("Setting default language to English")
+        set_language('en')
+    else:
+        print("Setting language to ", st.session_state['target_language'])
+        set_language(st.session_state['target_language'])
+
+    # Initialisierung der Streamlit App
+    st.set_page_config(page_title="Full Wiki Project", layout="wide")
+
+    st.markdown(PAGE_STYLE, unsafe_allow_html=True)
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.image("https://dannygerst.b-cdn.net/images/wikiglobe.png", width=200)
     with col2:
-        merge_knowledge = st.checkbox(_("Merge Knowledge"), key="merge_knowledge")
+        st.markdown('<div class="title"><h1>Full Wiki</h1></div>', unsafe_allow_html=True)
+    st.write(_("Full Wiki delivers the complete Wikipedia experience in your language of choice."))
+
+    # Sidebar nur für Informationen
+    with st.sidebar:
+        st.header('Full Wiki')
+        st.write(_("Full Wiki delivers the complete Wikipedia experience in your language of choice."))
+        st.write("❶ ", _("Select your language"))
+        st.write("❷ ", _("Enter a search term"))
+        st.write("❸ ", _("Hit Search"))
+        st.write(
+            _("The most comprehensive English Wikipedia article will be retrieved and translated for you."))
+        st.divider()
+        st.write(
+            _("Vou wish to harness the combined knowledge of all major languages?"))
+        st.write("✅ ", _("Check the 'Merge Knowledge' box."))
+        st.write(_("This process may take some time, but you will be rewarded with a comprehensive article that "
+                   "integrates knowledge from all major Wikipedia instances on the topic."))
+        st.divider()
+        st.text(_("Created by:"))
+        st.write("Danny Gerst")
+        st.write("[LinkedIn](https://www.linkedin.com/in/dannygerst/)")
+        st.write("[Twitter](https://twitter.com/gerstdanny/)")
+        st.write("[Website](https://www.dannygerst.de/)")
+        coffee_button(username="dannygerst", floating=False)
 
-    with st.form(key='my_form', border=False):
+    # Hauptbereich für Suchfunktionen und Ergebnisse
+    submitted_query = st.session_state.pop('submitted_query', None)
+    picked_suggestion = st.session_state.pop('picked_suggestion', None)
+    with st.container():
         col1, col2 = st.columns([3, 1])
         with col1:
-            query = st.text_input(_("Search Term"), key="query", placeholder=_("Enter a search term..."))
+            old_language = st.session_state.get('target_language')
+            languages = [['English', 'en'], ['Deutsch', 'de'], ['Français', 'fr'], ['Español', 'es'],
+                         ['Italiano', 'it']]
+            labels = [language[0] for language in languages]
+            codes = [language[1] for language in languages]
+            if 'target_language' in st.session_state:
+                selected_language = st.session_state['target_language']
+                index = codes.index(selected_language)
+            else:
+                index = 0
+
+            target_language = st.selectbox(key="target_language", index=index,
+                                           label=_("Target Language"), options=codes, on_change=reset_section_position,
+                                           format_func=lambda code: labels[codes.index(code)])
+
         with col2:
-            st_button = st.form_submit_button(_("Search"))
+            merge_knowledge = st.checkbox(_("Merge Knowledge"), key="merge_knowledge")
 
-if merge_knowledge:
-    st.write("⚠️", _("Merge Knowledge is activated. Downloading multiple articles and merging them. Will take some "
-                     "time... (3-5 minutes)"), "⚠️")
+        search_box(target_language)
 
-if query and st_button:
-    if 'target_language' in st.session_state and st.session_state['target_language'] != 'en':
-        st.session_state['original_query'] = query
-        query = get_translation(query, 'en')
-        st.session_state['translated_query'] = query
-    else:
-        if 'original_query' in st.session_state:
-            del st.session_state['original_query']
-        if 'translated_query' in st.session_state:
-            del st.session_state['translated_query']
+    if merge_knowledge:
+        st.write("⚠️", _("Merge Knowledge is activated. Downloading multiple articles and merging them. Will take "
+                         "some time... (3-5 minutes)"), "⚠️")
 
-    with st.spinner(_("Getting Wikipedia article ...")):
-        print("Searching Wikipedia for ", query)
-        wiki_page = wiki_search(query)
+    if picked_suggestion:
+        title, pageid, lang = picked_suggestion
+        with st.spinner(_("Getting Wikipedia article ...")):
+            print("Loading suggested article ", title)
+            wait_for_prefetch(title, pageid, target_language)
+            wiki_page = get_suggested_page(title, pageid, lang)
+        if isinstance(wiki_page, wiki_utils.WikipediaPage):
+            query = wiki_page.title
+            if target_language == 'en':
+                st.session_state.pop('original_query', None)
+                st.session_state.pop('translated_query', None)
+            else:
+                # Bei einem Suchtreffer bleibt der ursprüngliche Suchbegriff stehen
+                if lang != 'en' or 'original_query' not in st.session_state:
+                    st.session_state['original_query'] = title
+                st.session_state['translated_query'] = query
+        else:
+            # Ohne englischen Artikel wie bisher suchen
+            submitted_query = title
 
-    st.session_state['wiki_page'] = wiki_page
-    st.session_state['read_to_section'] = 1
-elif 'wiki_page' in st.session_state:
-    wiki_page = st.session_state['wiki_page']
-else:
-    # result = None
-    wiki_page = None
-
-# Suchen und Ergebnis anzeigen
-if 'next_section_btn' in st.session_state and st.session_state.next_section_btn:
-    st.session_state['read_to_section'] += 1
-    print("Next Section ", st.session_state['read_to_section'])
-
-if wiki_page and isinstance(wiki_page, wiki_utils.WikipediaPage):
-    if 'original_query' in st.session_state:
-        original_query = st.session_state['original_query']
-        translated_query = st.session_state['translated_query']
-        st.header(f"{original_query} => {translated_query}")
-    else:
-        st.header(query)
-
-    extract = wiki_page.extract
-    infobox = wiki_page.infobox
-
-    image_filename = wiki_page.image_name
-
-    if not image_filename and infobox:
-        image_filename = infobox.get('image')
-    image_html = get_article_image(image_filename)
-
-    if 'summary_btn' in st.session_state and st.session_state.summary_btn:
-        with st.spinner(_("Summarizing Wikipedia article ... (Takes 1-2 minutes)")):
-            print("Summarizing Wikipedia article ...")
-            summary = get_summary(extract=extract, target_language=target_language, image_html=image_html)
-            st.session_state['summary'] = summary
-        st.write(_("Summary"))
-        st.markdown(summary, unsafe_allow_html=True)
-        col1, col2, col3 = st.columns([1, 1, 1])
-        with col3:
-            strong_summary_btn = st.button(_("Strong Summary"), key="strong_summary_btn")
-            st.write(f'<p style="font-size:0.8rem; padding-left: 5px; margin-top: -8px; color: lightblue">'
-                     f'{_("Takes a while until finished")}</p>', unsafe_allow_html=True)
-    elif 'strong_summary_btn' in st.session_state and st.session_state.strong_summary_btn:
-        with st.spinner(_("Strong Summarizing Wikipedia article ... (up to 1 minute)")):
-            print("Strong Summarizing Wikipedia article ...")
-            if 'summary' in st.session_state and st.session_state['summary']:
-                summary = st.session_state['summary']
-                st.session_state['summary'] = None
+    if submitted_query:
+        query = submitted_query
+        if 'target_language' in st.session_state and st.session_state['target_language'] != 'en':
+            st.session_state['original_query'] = query
+            try:
+                query = get_english_search_term(query, target_language)
+            except CortexUnavailable as e:
+                print(f"Searching with the untranslated query: {e}")
+            st.session_state['translated_query'] = query
+        else:
+            if 'original_query' in st.session_state:
+                del st.session_state['original_query']
+            if 'translated_query' in st.session_state:
+                del st.session_state['translated_query']
+
+        with st.spinner(_("Getting Wikipedia article ...")):
+            print("Searching Wikipedia for ", query)
+            candidates = get_search_candidates(query)
+            if len(candidates) > 1 and candidates[0]['title'].casefold() != query.casefold():
+                # Der Leser wählt, der wahrscheinlichste Treffer wird derweil im Hintergrund geladen und übersetzt
+                st.session_state['candidates'] = candidates
+                prefetch_article(candidates[0]['title'], candidates[0]['pageid'], target_language)
+                wiki_page = None
+            elif candidates:
+                # Eindeutiger Treffer oder exakter Titel, wie "Go" bei Wikipedia direkt öffnen
+                st.session_state['candidates'] = None
+                wiki_page = get_suggested_page(candidates[0]['title'], candidates[0]['pageid'], 'en')
             else:
-                summary = get_summary(extract=extract, target_language=target_language, image_html=image_html)
+                st.session_state['candidates'] = None
+                wiki_page = wiki_search(query)
 
-            strong_summary = get_strong_summary(summary=summary, target_language=target_language, image_html=image_html)
-        st.write(_("Strong Summary"))
-        st.markdown(strong_summary, unsafe_allow_html=True)
+    if submitted_query or picked_suggestion:
+        # Die Session hält nur den Schlüssel, der Artikel liegt einmal pro Prozess im Store
+        if isinstance(wiki_page, wiki_utils.WikipediaPage):
+            wiki_page = store.put(wiki_page)
+            add_titles(wiki_page.lang, [(wiki_page.title, wiki_page.pageid)])
+        st.session_state['article_key'] = wiki_page.key if isinstance(wiki_page, ArticleRecord) else None
+        st.session_state['article_query'] = query
+        st.session_state['read_to_section'] = 1
+    elif st.session_state.get('article_key'):
+        wiki_page = article(st.session_state['article_key'])
+        # Wurde der Artikel verdrängt und neu geladen, kann es eine neuere Revision sein
+        st.session_state['article_key'] = wiki_page.key if wiki_page else None
+        query = st.session_state.get('article_query', '')
     else:
-        if 'merge_knowledge' in st.session_state and st.session_state['merge_knowledge']:
-            log_area = st.empty()
-            with st.spinner(_("Merging Knowledge ... (3-5 minutes)")):
-                urls, sections = get_combined_knowledge_sections(log_area, wiki_page, query,
-                                                                 target_language, st.session_state['read_to_section'],
-                                                                 image_html=image_html)
-            log_area.empty()
-            links = ""
-            for key, value in urls.items():
-                links += f"[Wikipedia {key}]({value})&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;"
-            st.write(links)
-
-            st.markdown(sections, unsafe_allow_html=True)
-        else:
-            st.write(f"[Wikipedia]({wiki_page.url})")
-            with st.spinner(_("Translating Wikipedia article ...")):
-                print("Retrieving Section ", st.session_state['read_to_section'])
-                sections = get_sections(extract, st.session_state['read_to_section'], target_language,
-                                        image_html=image_html)
+        # result = None
+        wiki_page = None
+        query = ''
 
-            st.markdown(sections, unsafe_allow_html=True)
+    if wiki_page and isinstance(wiki_page, ArticleRecord):
+        if 'original_query' in st.session_state:
+            original_query = st.session_state['original_query']
+            translated_query = st.session_state['translated_query']
+            st.header(f"{original_query} => {translated_query}")
+        else:
+            st.header(query)
 
-            col1, col2, col3 = st.columns([1, 1, 1])
+        # Das Bild wird nur bei einem vollen Rerun neu bestimmt, nicht bei jedem Klick im Fragment
+        article_reader(wiki_page, query, target_language, get_page_image_html(wiki_page))
+    elif st.session_state.get('candidates'):
+        st.header(_("Several articles match your search. Which one do you mean?"))
+        for number, candidate in enumerate(st.session_state['candidates']):
+            col1, col2 = st.columns([4, 1])
             with col1:
-                # TODO only show if section to read is smaller that the number of sections
-                next_section_btn = st.button(_("Next Section"), key="next_section_btn")
-            with col3:
-                summary_btn = st.button(_("Summary"), key="summary_btn")
-                st.write(f'<p style="font-size:0.8rem; padding-left: 5px; margin-top: -8px; color: rgb(46, 154, 255)">'
-                         f'{_("Takes a while until finished")}</p>', unsafe_allow_html=True)
-else:
-    st.header(_("Please enter a search query to get started."))
+                st.markdown(f"**{candidate['title']}**  \n{candidate['extract']}")
+            with col2:
+                st.button(_("Read"), key=f"candidate_{number}", on_click=pick_candidate,
+                          args=(candidate['title'], candidate['pageid']))
+    else:
+        st.header(_("Please enter a search query to get started."))
+finally:
+    # Auch nach st.stop() oder einem Fehler, gerade diese Reruns gehören in den Trace
+    finish_trace(trace)
+
+# Was in den Sprachdateien fehlte, ist beim nächsten Rerun übersetzt
+fill_missing_ui_translations()
+if st.query_params.get('debug') == '1' or os.environ.get('FULLWIKI_DEBUG') == '1':
+    with st.expander("Debug: Trace"):
+        st.markdown(waterfall_html(trace), unsafe_allow_html=True)
+    with st.expander("Debug: LLM usage"):
+        st.write(f"This request: {llm_request.total_tokens} tokens, {llm_request.trimmed} trimmed inputs, "
+                 f"{llm_request.degraded} calls on the cheap model")
+        st.dataframe(llm_request.table())
+        st.write("This session:")
+        st.dataframe(session_table(st.session_state['session_id']))
+        st.write("Cortex backends:")
+        st.dataframe(router.table())
+        st.write("Circuit breakers:")
+        st.dataframe(breaker_table())
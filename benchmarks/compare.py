@@ -0,0 +1,41 @@
+"""
+Compares two reports of ``benchmarks.run``:
+
+    python -m benchmarks.compare before.json after.json
+"""
+import json
+import sys
+
+
+def load(path):
+    with open(path, 'r') as f:
+        report = json.load(f)
+    return report, {result['scenario']: result for result in report['scenarios']}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print("Usage: python -m benchmarks.compare <before.json> <after.json>")
+        return 1
+
+    before_report, before = load(argv[0])
+    after_report, after = load(argv[1])
+    print(f"{'scenario':<24} {'before':>9} {'after':>9} {'speedup':>8}   "
+          f"{'wiki':>9}   {'cortex':>9}   {'cache hits':>11}")
+    print(f"{'':<24} {before_report.get('revision') or '':>9} {after_report.get('revision') or '':>9}")
+    for scenario, new in after.items():
+        old = before.get(scenario)
+        if old is None:
+            print(f"{scenario:<24} {'-':>9} {new['wall_time']:8.3f}s")
+            continue
+        speedup = old['wall_time'] / new['wall_time'] if new['wall_time'] else float('inf')
+        print(f"{scenario:<24} {old['wall_time']:8.3f}s {new['wall_time']:8.3f}s {speedup:7.2f}x   "
+              f"{old['wiki_requests']:4d}>{new['wiki_requests']:<4d}   "
+              f"{old['cortex_statements']:4d}>{new['cortex_statements']:<4d}   "
+              f"{old['cache_hits']:5d}>{new['cache_hits']:<5d}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
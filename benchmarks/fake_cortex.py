@@ -0,0 +1,143 @@
+"""
+Fake Snowpark session that answers the Cortex statements of SnowflakeHelper locally.
+
+Every statement sleeps ``latency`` seconds plus ``row_latency`` per prompt, so batched and
+single calls can be compared. A share of ``tail_rate`` statements additionally sleeps
+``tail_latency`` seconds to reproduce the slow tail of the real service. The answers are cheap transformations of the prompt input:
+translations return the text unchanged, summaries and key facts return the first sentences.
+"""
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+
+SEARCH_TERM = re.compile(r'(?:Now translate the search term|Translate the search term) "?(.*?)"? to (\w+)\.', re.DOTALL)
+TRANSLATION = re.compile(r'Now Translate the following text to (\w+):\s*(.*)', re.DOTALL)
+
+
+def _first_sentences(text, count):
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    return ' '.join(sentences[:count])
+
+
+class FakeDataFrame(object):
+
+    def __init__(self, session, statement, params):
+        self.session = session
+        self.statement = statement
+        self.params = list(params or [])
+
+    def collect(self):
+        return self.session.execute(self.statement, self.params)
+
+    def first(self):
+        rows = self.collect()
+        return rows[0] if rows else None
+
+    def collect_nowait(self):
+        return FakeAsyncJob(self)
+
+
+class FakeAsyncJob(object):
+    """Stands in for Snowpark's AsyncJob, the statement runs in a background thread."""
+
+    def __init__(self, dataframe):
+        self._rows = None
+        self._error = None
+        self._done = threading.Event()
+        self.cancelled = False
+        threading.Thread(target=self._run, args=(dataframe,), daemon=True).start()
+
+    def _run(self, dataframe):
+        try:
+            self._rows = dataframe.collect()
+        except Exception as e:
+            self._error = e
+        self._done.set()
+
+    def is_done(self):
+        return self._done.is_set()
+
+    def cancel(self):
+        self.cancelled = True
+        self._done.set()
+        self._error = RuntimeError("query cancelled")
+
+    def result(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._rows
+
+
+class FakeCortexSession(object):
+
+    def __init__(self, latency=0.2, row_latency=0.0, tail_rate=0.0, tail_latency=0.0):
+        self.latency = latency
+        self.row_latency = row_latency
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self._random = random.Random(0)
+        self.statements = Counter()
+        self.prompts = Counter()
+        self.prompt_characters = 0
+        self._lock = threading.Lock()
+
+    def sql(self, statement, params=None):
+        return FakeDataFrame(self, statement, params)
+
+    def close(self):
+        pass
+
+    def reset_stats(self):
+        with self._lock:
+            self.statements.clear()
+            self.prompts.clear()
+            self.prompt_characters = 0
+
+    def execute(self, statement, params):
+        if 'from values' in statement and 'cortex.translate' in statement:
+            kind = 'translate_batch'
+            indices, prompts = params[0::3], params[1::3]
+            rows = [(index, text) for index, text in zip(indices, prompts)]
+        elif 'from values' in statement:
+            kind = 'complete_batch'
+            indices, prompts = params[0::2], params[1::2]
+            rows = [(index, self.answer(prompt)) for index, prompt in zip(indices, prompts)]
+        elif 'cortex.translate' in statement:
+            kind = 'translate'
+            prompts = [params[0]]
+            rows = [(params[0],)]
+        else:
+            kind = 'complete'
+            prompts = [''.join(str(param) for param in params)]
+            rows = [(self.answer(prompts[0]),)]
+
+        with self._lock:
+            self.statements[kind] += 1
+            self.prompt_characters += sum(len(prompt) for prompt in prompts)
+            tail = self.tail_latency if self._random.random() < self.tail_rate else 0.0
+        time.sleep(self.latency + self.row_latency * len(prompts) + tail)
+        return rows
+
+    def answer(self, prompt):
+        search_term = SEARCH_TERM.search(prompt)
+        translation = TRANSLATION.search(prompt)
+        if search_term:
+            kind, answer = 'search_term', f'"{search_term.group(1).strip()}"'
+        elif translation:
+            kind, answer = 'translation', translation.group(2).strip()
+        elif 'You are a summarizer' in prompt:
+            kind, answer = 'summary', _first_sentences(prompt.split('1-2 Sentences.', 1)[-1], 2)
+        elif 'Sparse Priming Representation' in prompt:
+            kind, answer = 'keyfacts', _first_sentences(prompt.split('# INPUT', 1)[-1].split('\n', 1)[-1], 3)
+        elif 'Wikipedia editor' in prompt:
+            kind, answer = 'rewrite', prompt.split('# INPUT', 1)[-1].strip()
+        else:
+            kind, answer = 'other', _first_sentences(prompt, 3)
+
+        with self._lock:
+            self.prompts[kind] += 1
+        return answer
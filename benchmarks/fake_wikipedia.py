@@ -0,0 +1,236 @@
+"""
+Local stand-in for the MediaWiki API.
+
+Requests are answered with a synthetic article for the requested title, so every scenario runs
+without network access. Titles containing "Long" get a long article. Titles starting with "Missing"
+do not exist, "Redirect to <title>" redirects to <title>, titles ending in "(disambiguation)" are
+disambiguation pages and titles starting with "Deleted" are found by the info query but gone in
+the content query.
+
+Optionally, recorded JSON responses in ``benchmarks/fixtures/<lang>/<key>.json`` are served
+instead, where the key is a hash of the request parameters. No fixtures are committed; with
+``record=True`` missing fixtures are fetched from the real Wikipedia once and stored.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+import requests
+
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SHORT_ARTICLE_SECTIONS = 8
+LONG_ARTICLE_SECTIONS = 60
+MISSING_PREFIX = 'Missing '
+DELETED_PREFIX = 'Deleted '
+REDIRECT_PREFIX = 'Redirect to '
+DISAMBIGUATION_SUFFIX = ' (disambiguation)'
+# Sprachen, auf die jeder Artikel per Sprachlink verweist
+LANGUAGES = ('en', 'de', 'fr', 'es', 'it')
+
+
+def fixture_key(params):
+    relevant = sorted((key, value) for key, value in params.items() if key != 'format')
+    return hashlib.sha1(json.dumps(relevant).encode('utf-8')).hexdigest()
+
+
+def page_id(title, lang):
+    return zlib.crc32(f"{lang}:{title}".encode('utf-8')) % 10_000_000 + 1
+
+
+def synthetic_extract(title, lang, sections):
+    paragraphs = [f"{title} is the subject of this {lang} benchmark article. "
+                  f"It was created to measure Full Wiki without Wikipedia. "
+                  f"The article has {sections} sections."]
+    for section in range(1, sections + 1):
+        paragraphs.append(f"\n\n== Section {section} ==")
+        paragraphs.append(f"Section {section} of {title} describes fact number {section}. "
+                          f"It is followed by a second sentence about the same fact. "
+                          f"See also the related article about topic {section}.")
+        if section % 3 == 0:
+            paragraphs.append(f"\n=== Details {section} ===")
+            paragraphs.append(f"The details of fact {section} are given here. They are rather short.")
+    return "\n".join(paragraphs) + "\n"
+
+
+def synthetic_content(title, lang, sections):
+    infobox = (f"{{{{Infobox thing\n| name = {title}\n| image = {title.replace(' ', '_')}.jpg\n"
+               f"| birth_date = 1 January 1900\n| country = Benchmarkland\n}}}}\n")
+    return infobox + synthetic_extract(title, lang, sections)
+
+
+class FakeWikipedia(object):
+    """
+      Serves the MediaWiki API on ``http://127.0.0.1:<port>/<lang>/w/api.php``.
+      ``latency`` (seconds) is added to every request.
+    """
+
+    def __init__(self, latency=0.0, record=False, fixture_dir=FIXTURE_DIR):
+        self.latency = latency
+        self.record = record
+        self.fixture_dir = fixture_dir
+        self.requests = Counter()
+        self._titles_by_id = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def api_url_template(self):
+        return f"http://127.0.0.1:{self._server.server_port}/{{lang}}/w/api.php"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                lang = url.path.strip('/').split('/')[0]
+                params = dict(parse_qsl(url.query, keep_blank_values=True))
+                body = json.dumps(fake.answer(lang, params)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests.clear()
+
+    def answer(self, lang, params):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests[self._kind(params)] += 1
+
+        path = os.path.join(self.fixture_dir, lang, fixture_key(params) + '.json')
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        if self.record:
+            response = requests.get(f"https://{lang}.wikipedia.org/w/api.php", params=params,
+                                    headers={'User-Agent': 'Full Wiki benchmark recorder'}).json()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(response, f)
+            return response
+        return self._synthesize(lang, params)
+
+    def _kind(self, params):
+        if params.get('list'):
+            return params['list']
+        if params.get('generator'):
+            return 'generator:' + params['generator']
+        return params.get('prop', params.get('action', 'query'))
+
+    def _titles(self, lang, params):
+        if params.get('generator') == 'search':
+            query = params.get('gsrsearch', '').strip()
+            return [query, query + ' (band)'][:int(params.get('gsrlimit', 1))]
+        if params.get('titles'):
+            return params['titles'].split('|')
+        return [self._titles_by_id.get((lang, int(pageid)), f"Page {pageid}")
+                for pageid in params.get('pageids', '').split('|') if pageid]
+
+    def _synthesize(self, lang, params):
+        if params.get('list') == 'search':
+            query = params.get('srsearch', '').strip()
+            return {'query': {'searchinfo': {}, 'search': [{'title': query}, {'title': query + ' (band)'}]}}
+        if params.get('list') == 'prefixsearch':
+            prefix = params.get('pssearch', '').strip()
+            self._titles_by_id[lang, page_id(prefix, lang)] = prefix
+            return {'query': {'prefixsearch': [{'title': prefix, 'pageid': page_id(prefix, lang)}]}}
+
+        prop = params.get('prop', '')
+        titles = self._titles(lang, params)
+        if 'imageinfo' in prop:
+            pages = {}
+            for index, title in enumerate(titles):
+                name = title.split(':', 1)[-1]
+                info = {'url': f"https://upload.example.org/{lang}/{name}"}
+                if params.get('iiurlwidth'):
+                    info['thumburl'] = f"https://upload.example.org/{lang}/thumb/{params['iiurlwidth']}px-{name}"
+                pages[str(-1 - index)] = {'title': title, 'imageinfo': [info]}
+            return {'query': {'pages': pages}}
+
+        # Wie die echte API: ganze Extrakte nur einer pro Antwort, der Rest über excontinue
+        whole_extracts = 'extracts' in prop and 'exintro' not in params and len(titles) > 1
+        extract_offset = int(params.get('excontinue', 0))
+        if 'excontinue' in params:
+            prop = 'extracts'
+
+        redirects = []
+        if 'redirects' in params:
+            for index, title in enumerate(titles):
+                if title.startswith(REDIRECT_PREFIX):
+                    redirects.append({'from': title, 'to': title[len(REDIRECT_PREFIX):]})
+                    titles[index] = title[len(REDIRECT_PREFIX):]
+
+        pages = []
+        for title in titles:
+            # Seiten, die nach der Info-Abfrage gelöscht wurden, fehlen erst beim Inhalt
+            if title.startswith(MISSING_PREFIX) or (title.startswith(DELETED_PREFIX)
+                                                    and ('revisions' in prop or 'extracts' in prop)):
+                page = {'ns': 0, 'title': title, 'missing': True}
+                if params.get('pageids'):
+                    page['pageid'] = page_id(title, lang)
+                pages.append(page)
+                continue
+            sections = LONG_ARTICLE_SECTIONS if 'Long' in title else SHORT_ARTICLE_SECTIONS
+            self._titles_by_id[lang, page_id(title, lang)] = title
+            page = {'pageid': page_id(title, lang), 'ns': 0, 'title': title, 'index': len(pages) + 1,
+                    'fullurl': f"https://{lang}.wikipedia.org/wiki/{title.replace(' ', '_')}",
+                    'lastrevid': page_id(title, lang) * 10}
+            if 'extracts' in prop and (not whole_extracts or len(pages) == extract_offset):
+                page['extract'] = synthetic_extract(title, lang, sections)
+                if 'exintro' in params:
+                    page['extract'] = page['extract'].split("\n")[0]
+            if 'revisions' in prop:
+                page['revisions'] = [{'revid': page['lastrevid'],
+                                      'slots': {'main': {'content': synthetic_content(title, lang, sections)}}}]
+            if 'pageimages' in prop:
+                page['pageimage'] = title.replace(' ', '_') + '.jpg'
+            if 'pageviews' in prop:
+                page['pageviews'] = {'2026-01-01': 1000, '2026-01-02': None}
+            if title.startswith(REDIRECT_PREFIX):
+                page['redirect'] = True
+            if title.endswith(DISAMBIGUATION_SUFFIX):
+                subject = title[:-len(DISAMBIGUATION_SUFFIX)]
+                if 'pageprops' in prop:
+                    page['pageprops'] = {'disambiguation': ''}
+                if 'links' in prop:
+                    page['links'] = [{'ns': 0, 'title': subject}, {'ns': 0, 'title': subject + ' (band)'}]
+            if 'langlinks' in prop:
+                # Ohne lllang alle Sprachen, jede Ausgabe trägt denselben Titel
+                languages = [params['lllang']] if params.get('lllang') else [code for code in LANGUAGES if code != lang]
+                page['langlinks'] = [{'lang': code, 'title': title} for code in languages]
+            pages.append(page)
+
+        if params.get('formatversion') == '2':
+            response = {'query': {'pages': pages}}
+            if redirects:
+                response['query']['redirects'] = redirects
+            if whole_extracts and extract_offset + 1 < len(pages):
+                response['continue'] = {'excontinue': extract_offset + 1, 'continue': '||'}
+            return response
+        query = {'pages': {str(page.get('pageid', -1 - index)): page for index, page in enumerate(pages)}}
+        if redirects:
+            query['redirects'] = redirects
+        return {'query': query}
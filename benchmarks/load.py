@@ -0,0 +1,264 @@
+"""
+Load test of the Streamlit app with N concurrent sessions in one process.
+
+Every session is a headless ``AppTest`` of ``app.py`` against the local stand-ins for Wikipedia
+and Cortex, and clicks through start page, language, search, next section, summary and
+optionally merge. Sessions read ``--articles`` different articles, so several of them share an
+article and its cache entries:
+
+    python -m benchmarks.load --sessions 1,2,4,8,16 --output load.json
+    python -m benchmarks.load --sessions 8 --merge --cortex-latency 0.5 --warm
+
+Each N runs in a fresh process with empty caches. Reported per N: throughput, latency
+percentiles per interaction, peak memory of the process (and from it the additional memory
+per session) and the time of disk cache hits,
+which grows when the sessions contend for the cache. Where the throughput stops growing
+with N, one process stops scaling.
+
+A session stops at its first failed interaction, the failure is counted as an error of that
+interaction. Throughput and scaling efficiency only count the interactions of completed
+sessions, the latency percentiles those of all sessions. The run exits with 1 if any session
+did not complete.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+INTERACTIONS = ('start', 'language', 'search', 'next_section', 'summary', 'merge')
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def peak_memory_mb():
+    # ru_maxrss ist unter Linux in KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_session(number, args, timings, errors, failures, completed, barrier):
+    """Runs the interactions of one session, stops at the first failed one."""
+    def step(name, action=None):
+        try:
+            if action:
+                action()
+            started = time.perf_counter()
+            app.run()
+            duration = time.perf_counter() - started
+        except Exception as e:
+            # Z.B. fehlt der Button, weil der vorige Rerun gescheitert ist
+            errors[name] += 1
+            failures.append(f"session {number} {name}: {e!r}")
+            return False
+        if app.exception:
+            errors[name] += 1
+            failures.append(f"session {number} {name}: {app.exception[0].message}")
+            return False
+        if not app.main.children:
+            # Ein Fehler beim Kompilieren des Skripts erscheint nicht in app.exception
+            errors[name] += 1
+            failures.append(f"session {number} {name}: empty page")
+            return False
+        timings[name].append(duration)
+        return True
+
+    try:
+        from streamlit.testing.v1 import AppTest
+
+        app = AppTest.from_file(os.path.join(REPO_DIR, 'app.py'), default_timeout=600)
+        query = f"Benchmark article {number % args.articles}"
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        failures.append(f"session {number}: not started, another session failed before the start")
+        return
+    except Exception as e:
+        # Die anderen Sessions nicht ewig warten lassen
+        barrier.abort()
+        failures.append(f"session {number}: not started: {e!r}")
+        return
+
+    steps = [
+        ('start', None),
+        ('language', lambda: app.selectbox(key="target_language").select(args.language)),
+        ('search', lambda: (app.text_input(key="query").input(query), app.button(key="search_btn").click())),
+        ('next_section', lambda: app.button(key="next_section_btn").click()),
+        ('summary', lambda: app.button(key="summary_btn").click()),
+    ]
+    if args.merge:
+        steps.append(('merge', lambda: app.checkbox(key="merge_knowledge").check()))
+    if all(step(name, action) for name, action in steps):
+        completed.append((number, len(steps)))
+
+
+def worker(args):
+    """Runs one load level in this process and returns its report."""
+    workdir = tempfile.mkdtemp(prefix='fullwiki-load-')
+    shutil.copytree(os.path.join(REPO_DIR, 'locales'), os.path.join(workdir, 'locales'))
+    os.chdir(workdir)
+
+    from benchmarks.fake_wikipedia import FakeWikipedia
+    from benchmarks.fake_cortex import FakeCortexSession
+    import utils.wiki_utils as wiki_utils
+    import utils.snowflake_helper as snowflake_helper
+    import utils.filecache as filecache
+    import utils.tracing as tracing
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import local_script_runner
+
+    wiki = FakeWikipedia(latency=args.wiki_latency).start()
+    cortex = FakeCortexSession(latency=args.cortex_latency, row_latency=args.cortex_row_latency)
+    wiki_utils.API_URL_TEMPLATE = wiki.api_url_template
+    wiki_utils.set_lang('en')
+    snowflake_helper.create_session = lambda: cortex
+    # Die Spans der Cache-Treffer zeigen, wie lange die Sessions auf den Disk-Cache warten
+    tracing.TRACE_FILE = os.path.join(workdir, 'trace.jsonl')
+    # Wie der Server das Skript nur einmal pro Prozess kompilieren. Jeder AppTest-Rerun legt sonst einen
+    # eigenen ScriptCache an, und gleichzeitiges ast.parse scheitert unter Python 3.11 gelegentlich
+    # mit "AST constructor recursion depth mismatch".
+    script_cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: script_cache
+
+    if args.warm:
+        run_session(0, args, defaultdict(list), defaultdict(int), [], [], threading.Barrier(1))
+        os.remove(tracing.TRACE_FILE)
+        filecache.cache_hits.clear()
+        filecache.cache_misses.clear()
+        wiki.reset_stats()
+        cortex.reset_stats()
+
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+    failures = []
+    completed = []
+    barrier = threading.Barrier(args.worker)
+    threads = [threading.Thread(target=run_session,
+                                args=(number, args, timings, errors, failures, completed, barrier))
+               for number in range(args.worker)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+    wiki.stop()
+
+    cache_reads = []
+    if os.path.exists(tracing.TRACE_FILE):
+        with open(tracing.TRACE_FILE, encoding='utf-8') as f:
+            for line in f:
+                span = json.loads(line)
+                if span['attributes'].get('cache_hit') is True:
+                    cache_reads.append(span['duration_ms'])
+
+    # Wie die Skalierung nur die Interaktionen abgeschlossener Sessions, die Latenzen zählen alle
+    interactions = sum(count for _, count in completed)
+    hits, misses = sum(filecache.cache_hits.values()), sum(filecache.cache_misses.values())
+    return {
+        'sessions': args.worker,
+        'sessions_completed': len(completed),
+        'wall_time_s': round(wall_time, 3),
+        'throughput_per_s': round(interactions / wall_time, 3),
+        'interactions': {name: {'count': len(timings[name]), 'errors': errors[name],
+                                'p50_s': percentile(timings[name], 50), 'p95_s': percentile(timings[name], 95),
+                                'p99_s': percentile(timings[name], 99)}
+                         for name in INTERACTIONS if timings[name] or errors[name]},
+        'peak_memory_mb': round(peak_memory_mb(), 1),
+        'cache_hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        'cache_read_p50_ms': percentile(cache_reads, 50),
+        'cache_read_p95_ms': percentile(cache_reads, 95),
+        'wiki_requests': sum(wiki.requests.values()),
+        'cortex_statements': sum(cortex.statements.values()),
+        'failures': failures[:20],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the app with concurrent sessions.")
+    parser.add_argument('--sessions', default='1,2,4,8', help="comma separated session counts (default: 1,2,4,8)")
+    parser.add_argument('--articles', type=int, default=3, help="different articles read by the sessions")
+    parser.add_argument('--language', default='de', help="target language of the sessions (default: de)")
+    parser.add_argument('--merge', action='store_true', help="also merge knowledge in every session")
+    parser.add_argument('--warm', action='store_true', help="run one session before measuring")
+    parser.add_argument('--wiki-latency', type=float, default=0.02, help="seconds per Wikipedia request")
+    parser.add_argument('--cortex-latency', type=float, default=0.2, help="seconds per Cortex statement")
+    parser.add_argument('--cortex-row-latency', type=float, default=0.01,
+                        help="additional seconds per prompt in a Cortex statement")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        # Die App schreibt viel auf stdout, der Bericht geht als letzte Zeile hinaus
+        stdout, sys.stdout = sys.stdout, io.StringIO()
+        report = worker(args)
+        sys.stdout = stdout
+        print(json.dumps(report))
+        return 0
+
+    output = os.path.abspath(args.output) if args.output else None
+    options = [f'--articles={args.articles}', f'--language={args.language}',
+               f'--wiki-latency={args.wiki_latency}', f'--cortex-latency={args.cortex_latency}',
+               f'--cortex-row-latency={args.cortex_row_latency}']
+    options += ['--merge'] if args.merge else []
+    options += ['--warm'] if args.warm else []
+
+    reports = []
+    for sessions in [int(value) for value in args.sessions.split(',') if value.strip()]:
+        result = subprocess.run([sys.executable, '-m', 'benchmarks.load', f'--worker={sessions}'] + options,
+                                cwd=REPO_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(result.stderr, file=sys.stderr)
+            return 1
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        reports.append(report)
+        measured = [item for item in report['interactions'].items() if item[1]['p95_s'] is not None]
+        slowest = max(measured, key=lambda item: item[1]['p95_s']) if measured else ('none', {'p95_s': 0.0})
+        print(f"{sessions:4d} sessions  {report['sessions_completed']:4d} completed  "
+              f"{report['throughput_per_s']:7.2f} interactions/s  "
+              f"p95 {slowest[0]} {slowest[1]['p95_s']:6.2f}s  peak {report['peak_memory_mb']:7.1f} MB  "
+              f"cache read p95 {report['cache_read_p95_ms'] or 0:6.1f} ms", file=sys.stderr)
+        for failure in report['failures']:
+            print(f"      {failure}", file=sys.stderr)
+
+    if len(reports) > 1:
+        first = reports[0]
+        # Nur abgeschlossene Sessions zählen, verlorene würden die Skalierung schönen
+        base = first['throughput_per_s'] / max(first['sessions_completed'], 1)
+        for report in reports[1:]:
+            report['scaling_efficiency'] = round(report['throughput_per_s'] / max(report['sessions_completed'], 1)
+                                                 / base, 3) if base else None
+            # Zusätzlicher Speicher pro Session gegenüber der kleinsten Stufe, ohne den Sockel des Prozesses
+            added = report['sessions'] - first['sessions']
+            report['memory_per_session_mb'] = round((report['peak_memory_mb'] - first['peak_memory_mb']) / added,
+                                                    2) if added else None
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'settings': vars(args), 'levels': reports}, f, indent=2)
+    else:
+        print(json.dumps(reports, indent=2))
+
+    lost = sum(report['sessions'] - report['sessions_completed'] for report in reports)
+    if lost:
+        print(f"{lost} sessions did not complete", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Microbenchmark of the wikitext to Markdown conversion on large articles.
+
+Compares the single pass ``escape_markdown`` with the former chain of replaces
+(``$`` escape, line breaks, eight heading replaces, bold/italic and the link regex),
+per node as the app calls it and on the whole text:
+
+    python -m benchmarks.markdown_convert --sections 400 --number 20
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import timeit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+# Die Disk-Caches der importierten Module landen nicht im Repository
+os.environ.setdefault('FULLWIKI_CACHE_DIR', tempfile.mkdtemp(prefix='fullwiki-cache-'))
+
+import mwparserfromhell
+
+from benchmarks.fake_wikipedia import synthetic_extract
+from utils.app_utils import escape_markdown
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+
+def legacy_escape_markdown(text):
+    text = text.replace("$", "\\$")
+    text = text.replace("\n", "  \n  \n")
+    levels = {'=': '#', '==': '##', '===': '###', '====': '####'}
+    for wikicode, markdown in levels.items():
+        text = text.replace(wikicode, markdown).replace(wikicode[::-1], "")
+    text = text.replace("'''", '**')
+    text = text.replace("''", '*')
+    text = re.sub(r'\[\[(.*?)\|(.*?)\]\]', r'[\2](\1)', text)
+    return text
+
+
+def large_article(sections):
+    text = synthetic_extract('Long benchmark article', 'en', sections)
+    # Etwas echtes Markup, damit alle Zweige des Konverters laufen
+    with open(os.path.join(CORPUS_DIR, 'comet.wiki'), encoding='utf-8') as f:
+        markup = f.read()
+    return text + markup * (sections // 10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the wikitext to Markdown conversion.")
+    parser.add_argument('--sections', type=int, default=400, help="sections of the synthetic article")
+    parser.add_argument('--number', type=int, default=20, help="conversions per measurement")
+    args = parser.parse_args(argv)
+
+    text = large_article(args.sections)
+    nodes = [str(node) for node in mwparserfromhell.parse(text).nodes]
+    print(f"Article: {len(text)} characters, {len(nodes)} nodes")
+
+    for name, convert in (('legacy chain', legacy_escape_markdown), ('single pass', escape_markdown.__wrapped__)):
+        per_node = min(timeit.repeat(lambda: [convert(node) for node in nodes], number=args.number, repeat=3))
+        whole = min(timeit.repeat(lambda: convert(text), number=args.number, repeat=3))
+        print(f"{name:<14} per node {per_node / args.number * 1000:8.2f} ms   "
+              f"whole text {whole / args.number * 1000:8.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
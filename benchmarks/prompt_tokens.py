@@ -0,0 +1,81 @@
+"""
+Measures how many prompt tokens the prompt input normalizer saves.
+
+For every article of the corpus the text is rendered the way it used to go into the
+summary, key fact and rewrite prompts (``escape_markdown`` per node) and compared with
+``prompt_input`` of the same text:
+
+    python -m benchmarks.prompt_tokens
+    python -m benchmarks.prompt_tokens --output tokens.json
+
+The corpus are the files in ``benchmarks/corpus/`` (plain text extracts and raw wikitext),
+the synthetic articles and, if any were recorded, the extracts of the fixtures in ``benchmarks/fixtures/``.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+# Die Disk-Caches der importierten Module landen nicht im Repository
+os.environ.setdefault('FULLWIKI_CACHE_DIR', tempfile.mkdtemp(prefix='fullwiki-cache-'))
+
+import mwparserfromhell
+
+from benchmarks.fake_wikipedia import FIXTURE_DIR, synthetic_extract, SHORT_ARTICLE_SECTIONS, LONG_ARTICLE_SECTIONS
+from utils.app_utils import escape_markdown
+from utils.llm_usage import estimate_tokens
+from utils.prompt_text import prompt_input
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+
+def corpus():
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, '*'))):
+        with open(path, encoding='utf-8') as f:
+            yield os.path.basename(path), f.read()
+
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*', '*.json'))):
+        with open(path, encoding='utf-8') as f:
+            pages = json.load(f).get('query', {}).get('pages', [])
+        for page in pages if isinstance(pages, list) else pages.values():
+            if page.get('extract'):
+                yield f"fixture {page.get('title', os.path.basename(path))}", page['extract']
+
+    yield 'synthetic short', synthetic_extract('Benchmark article', 'en', SHORT_ARTICLE_SECTIONS)
+    yield 'synthetic long', synthetic_extract('Long benchmark article', 'en', LONG_ARTICLE_SECTIONS)
+
+
+def display_text(text):
+    return "".join(escape_markdown(node) for node in mwparserfromhell.parse(text).nodes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the token reduction of the prompt input normalizer.")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, text in corpus():
+        before = estimate_tokens(display_text(text))
+        after = estimate_tokens(prompt_input(display_text(text)))
+        results.append({'article': name, 'tokens_before': before, 'tokens_after': after,
+                        'reduction': round(1 - after / before, 3) if before else 0.0})
+        print(f"{name:<40} {before:7d} -> {after:7d}  {results[-1]['reduction']:6.1%}")
+
+    before = sum(result['tokens_before'] for result in results)
+    after = sum(result['tokens_after'] for result in results)
+    total = {'tokens_before': before, 'tokens_after': after, 'reduction': round(1 - after / before, 3) if before else 0.0}
+    print(f"{'total':<40} {before:7d} -> {after:7d}  {total['reduction']:6.1%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'articles': results, 'total': total}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
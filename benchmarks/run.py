@@ -0,0 +1,197 @@
+"""
+End-to-end benchmarks for the Full Wiki pipeline against a local MediaWiki stand-in and a
+fake Cortex session, so neither Wikipedia nor a Snowflake warehouse is needed.
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --cortex-latency 0.5
+    python -m benchmarks.compare before.json after.json
+
+Every scenario reports the wall time (median over ``--repeat`` runs), the Wikipedia requests
+and Cortex statements it caused and the cache hits and misses as JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.fake_wikipedia import FakeWikipedia
+from benchmarks.fake_cortex import FakeCortexSession
+
+ARTICLE = "Benchmark article"
+LONG_ARTICLE = "Long benchmark article"
+
+
+class NullLogArea:
+    def text(self, message):
+        pass
+
+    def empty(self):
+        pass
+
+
+class Harness(object):
+    """Points wiki_utils and SnowflakeHelper at the stand-ins and runs the scenarios."""
+
+    def __init__(self, wiki_latency, cortex_latency, cortex_row_latency, cortex_tail_rate=0.0,
+                 cortex_tail_latency=0.0):
+        # Die Disk-Caches liegen relativ zum Arbeitsverzeichnis, also vor dem Import wechseln
+        self.workdir = tempfile.mkdtemp(prefix='fullwiki-bench-')
+        os.chdir(self.workdir)
+
+        import utils.wiki_utils as wiki_utils
+        import utils.snowflake_helper as snowflake_helper
+        import utils.filecache as filecache
+        import utils.app_utils as app_utils
+
+        self.wiki = FakeWikipedia(latency=wiki_latency).start()
+        self.cortex = FakeCortexSession(latency=cortex_latency, row_latency=cortex_row_latency,
+                                        tail_rate=cortex_tail_rate, tail_latency=cortex_tail_latency)
+        wiki_utils.API_URL_TEMPLATE = self.wiki.api_url_template
+        wiki_utils.set_lang('en')
+        snowflake_helper.create_session = lambda: self.cortex
+
+        self.wiki_utils = wiki_utils
+        self.filecache = filecache
+        self.app_utils = app_utils
+
+    def page(self, title=ARTICLE):
+        self.wiki_utils.set_lang('en')
+        return self.app_utils.wiki_search(title)
+
+    def search(self):
+        self.page()
+
+    def sections(self, target_language, title=ARTICLE, read_to_section=3):
+        wiki_page = self.page(title)
+        image_html = self.app_utils.get_page_image_html(wiki_page)
+        self.app_utils.get_sections(wiki_page.extract, read_to_section, target_language, image_html=image_html,
+                                    lang=wiki_page.lang)
+
+    def summary(self, target_language):
+        wiki_page = self.page()
+        image_html = self.app_utils.get_page_image_html(wiki_page)
+        self.app_utils.get_summary(extract=wiki_page.extract, target_language=target_language, image_html=image_html,
+                                   lang=wiki_page.lang)
+
+    def merge(self, target_language):
+        wiki_page = self.page()
+        image_html = self.app_utils.get_page_image_html(wiki_page)
+        self.app_utils.get_combined_knowledge_sections(NullLogArea(), wiki_page, target_language, 1,
+                                                       image_html=image_html)
+
+    def scenarios(self, languages):
+        scenarios = [('search', lambda: self.search())]
+        for language in languages:
+            scenarios.append((f'sections_{language}', lambda language=language: self.sections(language)))
+        scenarios.append(('long_article_de', lambda: self.sections('de', title=LONG_ARTICLE, read_to_section=0)))
+        scenarios.append(('summary_de', lambda: self.summary('de')))
+        scenarios.append(('merge_de', lambda: self.merge('de')))
+        return scenarios
+
+    def measure(self, name, scenario, cold, repeat):
+        wall_times = []
+        for _ in range(repeat):
+            if cold:
+                self.filecache.clear_disk_caches()
+            else:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    scenario()
+            self.wiki.reset_stats()
+            self.cortex.reset_stats()
+            self.filecache.cache_hits.clear()
+            self.filecache.cache_misses.clear()
+
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                scenario()
+            wall_times.append(time.perf_counter() - started)
+
+        return {
+            'scenario': f"{name}_{'cold' if cold else 'warm'}",
+            'wall_time': statistics.median(wall_times),
+            'wall_times': wall_times,
+            'wiki_requests': sum(self.wiki.requests.values()),
+            'wiki_requests_by_kind': dict(self.wiki.requests),
+            'cortex_statements': sum(self.cortex.statements.values()),
+            'cortex_statements_by_kind': dict(self.cortex.statements),
+            'cortex_prompts_by_kind': dict(self.cortex.prompts),
+            'cortex_prompt_characters': self.cortex.prompt_characters,
+            'cache_hits': sum(self.filecache.cache_hits.values()),
+            'cache_misses': sum(self.filecache.cache_misses.values()),
+            'cache_hits_by_function': dict(self.filecache.cache_hits),
+            'cache_misses_by_function': dict(self.filecache.cache_misses),
+        }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Full Wiki against local stand-ins.")
+    parser.add_argument('--languages', default='de,fr', help="target languages (default: de,fr)")
+    parser.add_argument('--scenario', action='append', help="only run scenarios starting with this name")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per scenario (default: 3)")
+    parser.add_argument('--wiki-latency', type=float, default=0.02, help="seconds per Wikipedia request")
+    parser.add_argument('--cortex-latency', type=float, default=0.2, help="seconds per Cortex statement")
+    parser.add_argument('--cortex-row-latency', type=float, default=0.01,
+                        help="additional seconds per prompt in a Cortex statement")
+    parser.add_argument('--cortex-tail-rate', type=float, default=0.0,
+                        help="share of Cortex statements that are additionally slow (default: 0)")
+    parser.add_argument('--cortex-tail-latency', type=float, default=0.0,
+                        help="additional seconds of the slow Cortex statements")
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    # Vor dem Wechsel in das temporäre Arbeitsverzeichnis auflösen
+    output = os.path.abspath(args.output) if args.output else None
+
+    harness = Harness(args.wiki_latency, args.cortex_latency, args.cortex_row_latency,
+                      args.cortex_tail_rate, args.cortex_tail_latency)
+    languages = [language.strip() for language in args.languages.split(',') if language.strip()]
+
+    results = []
+    for name, scenario in harness.scenarios(languages):
+        if args.scenario and not any(name.startswith(prefix) for prefix in args.scenario):
+            continue
+        for cold in (True, False):
+            result = harness.measure(name, scenario, cold, args.repeat)
+            print(f"{result['scenario']:<24} {result['wall_time']:8.3f}s  "
+                  f"wiki {result['wiki_requests']:4d}  cortex {result['cortex_statements']:4d}  "
+                  f"cache {result['cache_hits']}/{result['cache_hits'] + result['cache_misses']}",
+                  file=sys.stderr)
+            results.append(result)
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'settings': {'wiki_latency': args.wiki_latency, 'cortex_latency': args.cortex_latency,
+                     'cortex_row_latency': args.cortex_row_latency, 'cortex_tail_rate': args.cortex_tail_rate,
+                     'cortex_tail_latency': args.cortex_tail_latency, 'repeat': args.repeat},
+        'scenarios': results,
+    }
+    harness.wiki.stop()
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Memory held per session for the article being read, before and after the shared article store.
+
+Before, every session kept its own WikipediaPage in ``st.session_state`` (the disk cache hands
+out a fresh copy per search), with the wikitext and the plain text extract. Now a session keeps
+only the key of an immutable record in ``utils.article_store``. Both layouts are built for
+``--sessions`` sessions reading ``--articles`` different articles and measured with tracemalloc:
+
+    python -m benchmarks.session_memory --sessions 100 --articles 5
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+# Die Disk-Caches der importierten Module landen nicht im Repository
+os.environ.setdefault('FULLWIKI_CACHE_DIR', tempfile.mkdtemp(prefix='fullwiki-cache-'))
+
+from benchmarks.fake_wikipedia import FakeWikipedia
+import utils.wiki_utils as wiki_utils
+from utils.article_store import ArticleStore
+
+
+def load_pages(articles):
+    pages = []
+    for number in range(articles):
+        page = wiki_utils.page(title=f"Long benchmark article {number}", auto_suggest=False, preload=True)
+        page.infobox
+        pages.append(pickle.dumps(page))
+    return pages
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used, sessions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the memory per session of the article being read.")
+    parser.add_argument('--sessions', type=int, default=100, help="number of sessions (default: 100)")
+    parser.add_argument('--articles', type=int, default=5, help="number of different articles (default: 5)")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    wiki = FakeWikipedia().start()
+    wiki_utils.API_URL_TEMPLATE = wiki.api_url_template
+    wiki_utils.set_lang('en')
+    pages = load_pages(args.articles)
+    wiki.stop()
+
+    def copies():
+        return [{'wiki_page': pickle.loads(pages[session % len(pages)])} for session in range(args.sessions)]
+
+    def shared():
+        store = ArticleStore()
+        return store, [{'article_key': store.put(pickle.loads(pages[session % len(pages)])).key}
+                       for session in range(args.sessions)]
+
+    before, _ = measure(copies)
+    after, (store, _) = measure(shared)
+    report = {
+        'sessions': args.sessions,
+        'articles': args.articles,
+        'bytes_per_session_before': before // args.sessions,
+        'bytes_per_session_after': after // args.sessions,
+        'store_bytes': store.size,
+    }
+    print(f"{args.sessions} sessions reading {args.articles} articles")
+    print(f"before (page per session)  {report['bytes_per_session_before']:10d} bytes per session")
+    print(f"after (shared store)       {report['bytes_per_session_after']:10d} bytes per session")
+    print(f"store                      {report['store_bytes']:10d} bytes in {len(store)} records")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
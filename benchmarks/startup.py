@@ -0,0 +1,111 @@
+"""
+Import time of the app modules and wall time of Streamlit reruns.
+
+The import is measured in fresh interpreters, the reruns with Streamlit's AppTest
+against the local stand-ins for Wikipedia and Cortex: the start page, and a rerun of an
+article that is already cached.
+
+    python -m benchmarks.startup --output startup.json
+    python -m benchmarks.startup --max-import 0.5 --max-rerun 0.3
+
+With ``--max-import``/``--max-rerun`` (seconds) the exit code is 1 when a median is above
+the limit, so a regression fails the run.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+IMPORT_SNIPPET = ("import time; started = time.perf_counter(); import utils.app_utils; "
+                  "print(time.perf_counter() - started)")
+
+
+def import_times(repeat):
+    times = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_SNIPPET], cwd=REPO_DIR)
+        times.append(float(output.decode().strip().splitlines()[-1]))
+    return times
+
+
+def rerun_times(repeat):
+    workdir = tempfile.mkdtemp(prefix='fullwiki-startup-')
+    shutil.copytree(os.path.join(REPO_DIR, 'locales'), os.path.join(workdir, 'locales'))
+    os.chdir(workdir)
+
+    from streamlit.testing.v1 import AppTest
+    from benchmarks.fake_wikipedia import FakeWikipedia
+    from benchmarks.fake_cortex import FakeCortexSession
+    import utils.wiki_utils as wiki_utils
+    import utils.snowflake_helper as snowflake_helper
+
+    wiki = FakeWikipedia().start()
+    wiki_utils.API_URL_TEMPLATE = wiki.api_url_template
+    wiki_utils.set_lang('en')
+    snowflake_helper.create_session = lambda: FakeCortexSession(latency=0)
+
+    app = AppTest.from_file(os.path.join(REPO_DIR, 'app.py'), default_timeout=120)
+
+    def run():
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.run()
+        if app.exception:
+            raise RuntimeError(app.exception)
+        return time.perf_counter() - started
+
+    first = run()
+    start_page = [run() for _ in range(repeat)]
+
+    app.text_input(key="query").input("Benchmark article")
+    app.button[0].click()
+    run()
+    article = [run() for _ in range(repeat)]
+    wiki.stop()
+    return first, start_page, article
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import time and rerun time of the app.")
+    parser.add_argument('--repeat', type=int, default=5, help="measurements per value (default: 5)")
+    parser.add_argument('--max-import', type=float, help="fail if the median import time is above this")
+    parser.add_argument('--max-rerun', type=float, help="fail if the median rerun time is above this")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+
+    imports = import_times(args.repeat)
+    first, start_page, article = rerun_times(args.repeat)
+    report = {
+        'import_s': statistics.median(imports),
+        'first_run_s': first,
+        'rerun_start_page_s': statistics.median(start_page),
+        'rerun_article_s': statistics.median(article),
+        'samples': {'import': imports, 'rerun_start_page': start_page, 'rerun_article': article},
+    }
+    for key in ('import_s', 'first_run_s', 'rerun_start_page_s', 'rerun_article_s'):
+        print(f"{key:<20} {report[key]:8.3f}s", file=sys.stderr)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failed = ((args.max_import is not None and report['import_s'] > args.max_import) or
+              (args.max_rerun is not None and max(report['rerun_start_page_s'], report['rerun_article_s']) > args.max_rerun))
+    if failed:
+        print("Startup benchmark above the limit", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
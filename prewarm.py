@@ -0,0 +1,180 @@
+"""
+Pre-warms the disk caches for a list of Wikipedia articles, so that the first reader of a
+popular article does not have to wait for the LLM.
+
+    python prewarm.py titles.txt --languages de,fr --workers 4 --summary --merge
+    cat titles.txt | python prewarm.py -
+
+Every finished title is appended to the checkpoint file, a restarted run skips the titles
+that were already pre-warmed successfully.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+
+class PrintLogArea:
+    """Stand-in for the Streamlit placeholder that get_combined_knowledge_sections writes its progress to."""
+
+    def __init__(self, title):
+        self.title = title
+
+    def text(self, message):
+        print(f"[{self.title}] {message}")
+
+    def empty(self):
+        pass
+
+
+def prewarm_article(title, languages, sections, summary, merge, wiki_page=None):
+    # Import im Worker-Prozess, damit jeder Prozess seine eigenen Verbindungen aufbaut
+    import utils.wiki_utils as wiki_utils
+    from utils.app_utils import (wiki_search, get_sections, get_page_image_html, get_summary,
+                                 get_combined_knowledge_sections)
+
+    started = time.time()
+    try:
+        if wiki_page is None:
+            wiki_page = wiki_search(title)
+        if not isinstance(wiki_page, wiki_utils.WikipediaPage):
+            return {"title": title, "status": "failed", "error": str(wiki_page), "duration": time.time() - started}
+
+        extract = wiki_page.extract
+        image_html = get_page_image_html(wiki_page)
+
+        for target_language in languages:
+            # Gleiche Aufrufe wie in app.py, sonst treffen die Cache-Keys nicht
+            get_sections(extract, sections, target_language, image_html=image_html,
+                         popularity=wiki_page.pageviews, lang=wiki_page.lang)
+            if summary:
+                get_summary(extract=extract, target_language=target_language, image_html=image_html,
+                            lang=wiki_page.lang)
+            if merge:
+                get_combined_knowledge_sections(PrintLogArea(title), wiki_page, target_language, 1,
+                                                image_html=image_html)
+    except Exception as e:
+        return {"title": title, "status": "failed", "error": repr(e), "duration": time.time() - started}
+
+    return {"title": title, "status": "ok", "duration": time.time() - started}
+
+
+def load_pages(titles):
+    """
+      The English articles of the titles, found with batched info queries. Their content is
+      loaded by the workers. Titles that are missing or ambiguous are left out, the worker looks
+      them up with a search as before.
+    """
+    import utils.wiki_utils as wiki_utils
+
+    try:
+        loaded = wiki_utils.pages(titles, lang='en', preload=False)
+    except Exception as e:
+        print(f"Batched loading failed, searching every title: {e}")
+        return {}
+    finally:
+        # Offene Verbindungen nicht an die Worker-Prozesse vererben
+        wiki_utils._http.close()
+    return {title: wiki_page for title, wiki_page in loaded.items() if isinstance(wiki_page, wiki_utils.WikipediaPage)}
+
+
+def read_titles(source):
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    titles = [line.strip() for line in lines if line.strip() and not line.startswith('#')]
+    return list(dict.fromkeys(titles))
+
+
+def read_checkpoint(checkpoint):
+    finished = set()
+    if os.path.exists(checkpoint):
+        with open(checkpoint, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry['status'] == 'ok':
+                    finished.add(entry['title'])
+    return finished
+
+
+def print_report(results, started, total):
+    elapsed = time.time() - started
+    ok = [result for result in results if result['status'] == 'ok']
+    failed = len(results) - len(ok)
+    per_minute = len(results) / elapsed * 60 if elapsed else 0.0
+    average = sum(result['duration'] for result in ok) / len(ok) if ok else 0.0
+    print(f"{len(results)}/{total} articles in {elapsed:.1f}s ({per_minute:.1f}/min), "
+          f"{len(ok)} ok, {failed} failed, {average:.1f}s per article")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-warm the Full Wiki caches for a list of articles.")
+    parser.add_argument('titles', help="file with one English article title per line, '-' for stdin")
+    parser.add_argument('--languages', default='de,fr,es,it',
+                        help="comma separated target languages (default: de,fr,es,it)")
+    parser.add_argument('--sections', type=int, default=3,
+                        help="number of sections to translate, 0 for the whole article (default: 3)")
+    parser.add_argument('--summary', action='store_true', help="also create the summaries")
+    parser.add_argument('--merge', action='store_true', help="also merge the knowledge of all languages")
+    parser.add_argument('--workers', type=int, default=4, help="number of parallel processes (default: 4)")
+    parser.add_argument('--batch-size', type=int, default=50,
+                        help="articles loaded from Wikipedia per batch, at most 50 (default: 50)")
+    parser.add_argument('--checkpoint', default='prewarm_checkpoint.jsonl',
+                        help="file that records finished titles (default: prewarm_checkpoint.jsonl)")
+    parser.add_argument('--report-every', type=int, default=10,
+                        help="print a throughput report every n articles (default: 10)")
+    args = parser.parse_args(argv)
+
+    languages = [language.strip() for language in args.languages.split(',') if language.strip()]
+    titles = read_titles(args.titles)
+    finished = read_checkpoint(args.checkpoint)
+    pending = [title for title in titles if title not in finished]
+    print(f"{len(titles)} titles, {len(titles) - len(pending)} already pre-warmed, {len(pending)} to go")
+
+    results = []
+    started = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor, \
+            open(args.checkpoint, 'a', encoding='utf-8') as checkpoint:
+
+        def finish(result):
+            results.append(result)
+            checkpoint.write(json.dumps(result) + "\n")
+            checkpoint.flush()
+            if result['status'] != 'ok':
+                print(f"Failed: {result['title']}: {result['error']}")
+            if len(results) % args.report_every == 0:
+                print_report(results, started, len(pending))
+
+        futures = {}
+        broken = False
+        for start in range(0, len(pending), args.batch_size):
+            batch = pending[start:start + args.batch_size]
+            wiki_pages = {} if broken else load_pages(batch)
+            for title in batch:
+                try:
+                    future = executor.submit(prewarm_article, title, languages, args.sections, args.summary,
+                                             args.merge, wiki_pages.get(title))
+                except BrokenProcessPool as e:
+                    broken = True
+                    finish({"title": title, "status": "failed", "error": repr(e), "duration": 0.0})
+                    continue
+                futures[future] = title
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                # Ein abgestürzter Worker reißt den Pool mit, die fertigen Titel stehen trotzdem im Checkpoint
+                result = {"title": futures[future], "status": "failed", "error": repr(e), "duration": 0.0}
+            finish(result)
+
+    print_report(results, started, len(pending))
+    return 0 if all(result['status'] == 'ok' for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Vor dem ersten Import von utils, damit die Tests keine Caches im Repository anlegen
+os.environ.setdefault('FULLWIKI_CACHE_DIR', tempfile.mkdtemp(prefix='fullwiki-tests-'))
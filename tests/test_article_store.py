@@ -0,0 +1,41 @@
+import pytest
+
+import utils.wiki_utils as wiki_utils
+from benchmarks.fake_wikipedia import FakeWikipedia
+from utils.article_store import ArticleRecord, ArticleStore
+
+
+@pytest.fixture
+def wiki(monkeypatch):
+    wiki = FakeWikipedia().start()
+    monkeypatch.setattr(wiki_utils, 'API_URL_TEMPLATE', wiki.api_url_template)
+    yield wiki
+    wiki.stop()
+
+
+def test_put_returns_the_record_even_if_it_is_evicted(wiki):
+    results = wiki_utils.pages(["Ada Lovelace", "Long article"], lang='en')
+    # Platz für genau einen Artikel: jeder put verdrängt den vorigen
+    store = ArticleStore(size_limit=1)
+
+    first = store.put(results["Ada Lovelace"])
+    second = store.put(results["Long article"])
+
+    assert isinstance(first, ArticleRecord) and first.title == "Ada Lovelace"
+    assert second.title == "Long article"
+    assert store.get(first.key) is None
+    # Eine bekannte Revision wird geteilt
+    assert store.put(results["Long article"]) is second
+
+
+def test_record_of_an_old_page_does_not_reload_it(wiki, monkeypatch):
+    wiki_page = wiki_utils.pages(["Ada Lovelace"], lang='en')["Ada Lovelace"]
+    # Seiten aus älteren Disk-Caches haben noch keine Seitenaufrufe
+    del wiki_page._pageviews
+    monkeypatch.setattr(wiki_utils.WikipediaPage, 'load_content',
+                        lambda self: pytest.fail("the page was loaded again"))
+
+    record = ArticleRecord(wiki_page)
+
+    assert record.pageviews == 0
+    assert record.title == "Ada Lovelace"
@@ -0,0 +1,84 @@
+import pytest
+
+import utils.wiki_utils as wiki_utils
+from utils.wiki_utils import _parse_infobox
+
+
+@pytest.fixture
+def fast_path_only(monkeypatch):
+    def full_parse(wikicode):
+        raise AssertionError("the whole page was parsed")
+    monkeypatch.setattr(wiki_utils, '_find_infobox', full_parse)
+
+
+def test_simple_infobox():
+    content = "{{Infobox person\n| name = Ada\n| birth_date = 1815\n}}\nAda was a mathematician."
+    assert _parse_infobox(content) == {'name': 'Ada', 'birth_date': '1815'}
+
+
+def test_no_infobox():
+    assert _parse_infobox("{{Short description|A test}}\nJust text.") == {}
+
+
+def test_nested_templates():
+    content = ("{{Short description|City}}\n"
+               "{{Infobox settlement\n| name = Bern\n| population = {{formatnum:134591}}\n"
+               "| coordinates = {{coord|46|57|N|7|27|E}}\n}}\nBern is a city.")
+    infobox = _parse_infobox(content)
+    assert infobox['name'] == 'Bern'
+    assert set(infobox) == {'name', 'population', 'coordinates'}
+
+
+def test_triple_brace_parameters():
+    assert _parse_infobox('{{Infobox x|a={{{1}}}}}') == {'a': ''}
+    infobox = _parse_infobox("{{Infobox x\n| a = {{{1|default}}}\n| b = two\n}}")
+    assert infobox['b'] == 'two'
+
+
+def test_commented_infobox_is_skipped():
+    content = ("<!-- {{Infobox old\n| name = Old\n}} -->\n"
+               "{{Infobox new\n| name = New\n}}\nText.")
+    assert _parse_infobox(content) == {'name': 'New'}
+
+
+def test_only_commented_infobox():
+    assert _parse_infobox("<!-- {{Infobox old | name = Old }} -->\nText.") == {}
+
+
+def test_comment_inside_infobox():
+    content = "{{Infobox band\n| name = Band <!-- {{ unbalanced -->\n| genre = Rock\n}}\nText."
+    assert _parse_infobox(content) == {'name': 'Band', 'genre': 'Rock'}
+
+
+def test_nowiki_infobox_is_skipped():
+    content = "<nowiki>{{Infobox example | name = Example}}</nowiki>\n{{Infobox real\n| name = Real\n}}"
+    assert _parse_infobox(content) == {'name': 'Real'}
+
+
+def test_comments_take_the_fast_path(fast_path_only):
+    content = ("<!-- Please do not change the infobox without discussion -->\n{{Short description|City}}\n"
+               "<!-- {{Infobox old\n| name = Old\n}} -->\n"
+               "{{Infobox settlement\n| name = Bern <!-- official name: {{lang|de|Bern}} -->\n"
+               "| motto = <nowiki>}}</nowiki>\n| population = {{formatnum:134591}}\n}}\n"
+               "Bern is a city.<!-- {{unbalanced -->")
+    infobox = _parse_infobox(content)
+    assert set(infobox) == {'name', 'motto', 'population'}
+    assert infobox['name'] == 'Bern' and infobox['motto'] == '}}'
+
+
+def test_template_parameters_fall_back_to_the_full_parse(monkeypatch):
+    parsed = []
+    find_infobox = wiki_utils._find_infobox
+    monkeypatch.setattr(wiki_utils, '_find_infobox', lambda wikicode: parsed.append(1) or find_infobox(wikicode))
+    assert _parse_infobox("{{Infobox x\n| a = {{{1|default}}}\n| b = two\n}}")['b'] == 'two'
+    assert parsed
+
+
+def test_hidden_infobox_fields():
+    from utils.app_utils import INFOBOX_HIDDEN_FIELDS
+
+    for field in ('image', 'image_size', 'caption', 'alt', 'logo2', 'map_caption', 'pushpin_map', 'signature_alt',
+                  'module', 'embed', 'footnotes', 'area_footnotes', 'name'):
+        assert INFOBOX_HIDDEN_FIELDS.search(field), field
+    for field in ('altitude', 'mapframe', 'modulename', 'native_name', 'imagery', 'population'):
+        assert not INFOBOX_HIDDEN_FIELDS.search(field), field
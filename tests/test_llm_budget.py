@@ -0,0 +1,58 @@
+import pytest
+
+import utils.llm_usage as llm_usage
+import utils.resilience as resilience
+import utils.snowflake_helper as snowflake_helper
+from benchmarks.fake_cortex import FakeCortexSession
+from utils.llm_usage import split_to_tokens, start_request
+from utils.model_router import ModelRouter
+from utils.snowflake_helper import SnowflakeHelper
+
+
+@pytest.fixture
+def cortex(monkeypatch):
+    cortex = FakeCortexSession(latency=0.0)
+    monkeypatch.setattr(snowflake_helper, '_session', None)
+    monkeypatch.setattr(snowflake_helper, 'create_session', lambda: cortex)
+    # Nur über Prompts, Cortex TRANSLATE kennt kein Prompt-Budget
+    monkeypatch.setattr(snowflake_helper, 'router', ModelRouter(dict(ModelRouter().routes, translation=['arctic'])))
+    resilience.breakers.clear()
+    yield cortex
+    resilience.breakers.clear()
+    llm_usage._current_request.set(None)
+
+
+def test_split_to_tokens_keeps_everything():
+    text = " ".join(f"Sentence number {number} of the text." for number in range(50))
+    pieces = split_to_tokens(text, 20)
+    assert len(pieces) > 1
+    assert all(len(piece) <= 20 * llm_usage.CHARS_PER_TOKEN for piece in pieces)
+    assert " ".join(pieces) == text
+
+
+def test_long_translation_is_split_not_trimmed(cortex):
+    usage = start_request(max_prompt_tokens=200)
+    text = " ".join(f"Sentence number {number} of a very long paragraph." for number in range(60))
+
+    translation = SnowflakeHelper().translate(text, 'de')
+
+    assert translation == text
+    assert usage.trimmed == 0
+    assert cortex.statements['complete_batch'] == 1
+
+
+def test_request_budget_applies_to_the_whole_batch(cortex):
+    usage = start_request(max_prompt_tokens=0, max_request_tokens=300)
+    items = [(f"Sentence number {number} of the batch.", 'de') for number in range(20)]
+
+    SnowflakeHelper().translate_many(items)
+
+    # Jeder Prompt für sich passt ins Budget, der Batch nicht
+    assert usage.degraded == 1
+    assert usage.operations['translation']['model:' + llm_usage.CHEAP_MODEL] == 20
+
+
+def test_other_prompts_are_still_trimmed(cortex):
+    usage = start_request(max_prompt_tokens=200)
+    SnowflakeHelper().summarize("A sentence of the article. " * 200)
+    assert usage.trimmed == 1
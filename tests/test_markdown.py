@@ -0,0 +1,16 @@
+import utils.wiki_utils as wiki_utils
+from utils.app_utils import escape_markdown, get_sections
+
+
+def test_links_follow_the_page_language(monkeypatch):
+    # Eine andere Session hat gerade die italienische Wikipedia durchsucht
+    monkeypatch.setattr(wiki_utils, 'LANG', 'it')
+    assert escape_markdown("See [[Bern]].") == "See [Bern](https://en.wikipedia.org/wiki/Bern)."
+    assert escape_markdown("Siehe [[Bern]].", 'de') == "Siehe [Bern](https://de.wikipedia.org/wiki/Bern)."
+
+
+def test_english_sections_link_to_english_wikipedia(monkeypatch):
+    monkeypatch.setattr(wiki_utils, 'LANG', 'it')
+    sections = get_sections("Bern is the [[capital]] of [[Switzerland]].\n", 0, 'en', lang='en')
+    assert "https://en.wikipedia.org/wiki/Switzerland" in sections
+    assert "it.wikipedia.org" not in sections
@@ -0,0 +1,53 @@
+import pytest
+
+import utils.app_utils as app_utils
+import utils.resilience as resilience
+import utils.snowflake_helper as snowflake_helper
+import utils.wiki_utils as wiki_utils
+from benchmarks.fake_cortex import FakeCortexSession
+from benchmarks.fake_wikipedia import FakeWikipedia
+
+
+class LogArea(object):
+    def text(self, message):
+        pass
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    wiki = FakeWikipedia().start()
+    cortex = FakeCortexSession(latency=0.0)
+    monkeypatch.setattr(wiki_utils, 'API_URL_TEMPLATE', wiki.api_url_template)
+    monkeypatch.setattr(snowflake_helper, '_session', None)
+    monkeypatch.setattr(snowflake_helper, 'create_session', lambda: cortex)
+    resilience.breakers.clear()
+    yield wiki
+    wiki.stop()
+    resilience.breakers.clear()
+
+
+def test_foreign_articles_follow_the_language_links(fakes):
+    foreign_pages = app_utils.get_foreign_pages("Merge article", ('de', 'fr'))
+
+    assert {language_code: wiki_page.lang for language_code, wiki_page in foreign_pages.items()} == \
+        {'de': 'de', 'fr': 'fr'}
+    # Ohne Suche und ohne die globale Sprache umzustellen
+    assert not fakes.requests['generator:search'] and not fakes.requests['search']
+    assert wiki_utils.LANG == 'en'
+
+
+def test_earlier_sections_are_not_merged_again(fakes, monkeypatch):
+    en_wiki_page = wiki_utils.pages(["Long merge article"], lang='en')["Long merge article"]
+    merged = []
+
+    def get_merged_section(en_section, foreign_sections, en_search_term):
+        merged.append(en_section[0])
+        return en_section[1], {}
+    monkeypatch.setattr(app_utils, 'get_merged_section', get_merged_section)
+
+    app_utils.get_combined_knowledge_sections(LogArea(), en_wiki_page, 'en', 3)
+    first = list(merged)
+    app_utils.get_combined_knowledge_sections(LogArea(), en_wiki_page, 'en', 4)
+
+    assert len(first) == 2
+    assert merged[len(first):] == [merged[-1]] and merged[-1] not in first
@@ -0,0 +1,81 @@
+import pytest
+from wikipedia.exceptions import DisambiguationError, PageError, RedirectError
+
+import utils.wiki_utils as wiki_utils
+from benchmarks.fake_wikipedia import FakeWikipedia, page_id
+
+
+@pytest.fixture
+def wiki(monkeypatch):
+    wiki = FakeWikipedia().start()
+    monkeypatch.setattr(wiki_utils, 'API_URL_TEMPLATE', wiki.api_url_template)
+    yield wiki
+    wiki.stop()
+
+
+def test_found_pages_are_loaded(wiki):
+    results = wiki_utils.pages(["Ada Lovelace", "Long article"], lang='en')
+
+    for title, wiki_page in results.items():
+        assert isinstance(wiki_page, wiki_utils.WikipediaPage)
+        assert wiki_page.title == title
+        assert wiki_page._content.startswith("{{Infobox thing")
+        assert title in wiki_page._extract
+        assert wiki_page._pageviews == 1000
+    # Eine Info-Abfrage und die Inhaltsabfrage mit der Fortsetzung für den zweiten Extrakt
+    assert wiki.requests['info|pageprops'] == 1
+
+
+def test_redirect(wiki):
+    results = wiki_utils.pages(["Redirect to Ada Lovelace"], lang='en')
+    wiki_page = results["Redirect to Ada Lovelace"]
+    assert wiki_page.title == "Ada Lovelace"
+    assert wiki_page.original_title == "Redirect to Ada Lovelace"
+
+    results = wiki_utils.pages(["Redirect to Ada Lovelace"], lang='en', redirect=False)
+    assert isinstance(results["Redirect to Ada Lovelace"], RedirectError)
+
+    # Die Page-ID einer Weiterleitung wird über ihren Titel aufgelöst
+    pageid = page_id("Redirect to Ada Lovelace", 'en')
+    assert wiki_utils.pages([pageid], lang='en')[pageid].title == "Ada Lovelace"
+
+
+def test_missing_page(wiki):
+    results = wiki_utils.pages(["Missing article", "Ada Lovelace"], lang='en')
+    assert isinstance(results["Missing article"], PageError)
+    assert isinstance(results["Ada Lovelace"], wiki_utils.WikipediaPage)
+
+
+def test_disambiguation(wiki):
+    results = wiki_utils.pages(["Mercury (disambiguation)"], lang='en')
+    error = results["Mercury (disambiguation)"]
+    assert isinstance(error, DisambiguationError)
+    assert error.options == ["Mercury", "Mercury (band)"]
+
+
+def test_page_deleted_before_content_query(wiki):
+    results = wiki_utils.pages(["Deleted article", "Ada Lovelace"], lang='en')
+    assert isinstance(results["Deleted article"], PageError)
+    assert isinstance(results["Ada Lovelace"], wiki_utils.WikipediaPage)
+
+
+def test_without_preload_content_is_loaded_on_access(wiki):
+    wiki_page = wiki_utils.pages(["Ada Lovelace"], lang='de', preload=False)["Ada Lovelace"]
+    assert wiki_page._content is None
+    assert "Ada Lovelace" in wiki_page.extract
+    assert wiki_page.lang == 'de'
+
+
+def test_search_candidates_in_another_language(wiki, monkeypatch):
+    # Die Sprache anderer Sessions bleibt unberührt
+    monkeypatch.setattr(wiki_utils, 'API_URL', wiki.api_url_template.format(lang='en'))
+    candidates = wiki_utils.search_candidates("Ada Lovelace", lang='de')
+    assert candidates[0]['pageid'] == str(page_id("Ada Lovelace", 'de'))
+    assert wiki_utils.LANG == 'en'
+
+
+def test_content_without_revisions():
+    wiki_page = wiki_utils.WikipediaPage.from_query(
+        {'title': "Ada Lovelace", 'pageid': 1, 'fullurl': "https://en.wikipedia.org/wiki/Ada_Lovelace"}, 'en')
+    wiki_page._set_content({'pageid': 1, 'title': "Ada Lovelace"})
+    assert wiki_page._extract == '' and wiki_page._content == '' and wiki_page._revid is None
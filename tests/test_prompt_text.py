@@ -0,0 +1,22 @@
+from utils.prompt_text import prompt_input
+
+
+def test_balanced_emphasis_is_removed():
+    assert prompt_input("A **bold** and *italic* and ***both*** word.") == "A bold and italic and both word."
+    assert prompt_input("'''Bern''' is the ''de facto'' capital.") == "Bern is the de facto capital."
+
+
+def test_lone_asterisks_stay():
+    assert prompt_input("5*3 is 15.") == "5*3 is 15."
+    assert prompt_input("The price* was 5*3*2 dollars.\n\n* Excluding taxes.") == \
+        "The price* was 5*3*2 dollars.\n* Excluding taxes."
+
+
+def test_headings():
+    text = "== History ==\nThe city was founded.\n## Economy\nTrade.\n=== Empty ===\n== Sport ==\n"
+    assert prompt_input(text) == "## History\nThe city was founded.\n## Economy\nTrade."
+
+
+def test_lines_that_only_look_like_headings():
+    assert prompt_input("#1 single in 1999.\n= 5\n== Charts ==\nIt charted.") == \
+        "#1 single in 1999.\n= 5\n## Charts\nIt charted."
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+import utils.resilience as resilience
+from benchmarks.fake_cortex import FakeCortexSession
+from utils.resilience import CortexTimeout, run_hedged
+
+
+@pytest.fixture(autouse=True)
+def clean_breakers():
+    resilience.breakers.clear()
+    resilience.latencies.clear()
+    yield
+    resilience.breakers.clear()
+    resilience.latencies.clear()
+
+
+def submit(session, text='Text'):
+    return lambda: session.sql("select snowflake.cortex.translate(?, '', ?)", params=(text, 'de')).collect_nowait()
+
+
+def test_fast_calls_do_not_wait_for_slow_ones():
+    slow, fast = FakeCortexSession(latency=1.5), FakeCortexSession(latency=0.05)
+    calls = [('slow', slow, 3)] * 40 + [('fast', fast, 0.5)] * 20
+    results = [None] * len(calls)
+    barrier = threading.Barrier(len(calls))
+
+    def call(number):
+        name, session, timeout = calls[number]
+        barrier.wait()
+        if name == 'fast':
+            # Erst wenn alle langsamen Aufrufe laufen
+            time.sleep(0.2)
+        try:
+            results[number] = run_hedged(name, submit(session, f"Text {number}"), timeout=timeout, hedging=False)[0][0]
+        except CortexTimeout as e:
+            results[number] = e
+
+    threads = [threading.Thread(target=call, args=(number,)) for number in range(len(calls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [f"Text {number}" for number in range(len(calls))]
+    assert resilience.breakers['fast'].state == 'closed'
+
+
+def test_timed_out_job_is_cancelled():
+    session = FakeCortexSession(latency=1.0)
+    jobs = []
+
+    def start():
+        jobs.append(submit(session)())
+        return jobs[-1]
+
+    started = time.monotonic()
+    with pytest.raises(CortexTimeout):
+        run_hedged('slow', start, timeout=0.2, hedging=False)
+    assert time.monotonic() - started < 0.8
+    assert jobs[0].cancelled
+
+
+def test_slow_call_is_hedged():
+    for _ in range(resilience.HEDGE_MIN_SAMPLES):
+        resilience.latencies['hedged'].add(0.05)
+    latencies = iter([1.0, 0.0])
+    jobs = []
+
+    def start():
+        jobs.append(submit(FakeCortexSession(latency=next(latencies)))())
+        return jobs[-1]
+
+    started = time.monotonic()
+    assert run_hedged('hedged', start, timeout=5)[0][0] == 'Text'
+    assert time.monotonic() - started < 0.5
+    assert len(jobs) == 2 and jobs[0].cancelled
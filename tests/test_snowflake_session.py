@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+from snowflake.connector.errors import OperationalError
+
+import utils.resilience as resilience
+import utils.snowflake_helper as snowflake_helper
+from benchmarks.fake_cortex import FakeCortexSession
+from utils.model_router import ModelRouter
+from utils.snowflake_helper import SnowflakeHelper
+
+
+class BrokenSession(FakeCortexSession):
+    """A session whose connection was closed, every statement fails."""
+
+    def __init__(self):
+        super().__init__(latency=0.01)
+        self.closed = False
+
+    def execute(self, statement, params):
+        raise OperationalError(msg="Connection is closed", errno=250002)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    created = []
+
+    def create(factory):
+        def create_session():
+            session = factory()
+            created.append(session)
+            return session
+        monkeypatch.setattr(snowflake_helper, 'create_session', create_session)
+
+    monkeypatch.setattr(snowflake_helper, '_session', None)
+    monkeypatch.setattr(snowflake_helper, 'router', ModelRouter())
+    resilience.breakers.clear()
+    resilience.latencies.clear()
+    yield create, created
+    resilience.breakers.clear()
+    resilience.latencies.clear()
+
+
+def run_threads(count, target):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def run(number):
+        barrier.wait()
+        results[number] = target(number)
+
+    threads = [threading.Thread(target=run, args=(number,)) for number in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_session(sessions):
+    create, created = sessions
+    create(lambda: FakeCortexSession(latency=0.02))
+
+    results = run_threads(16, lambda number: SnowflakeHelper().translate(f"Text {number}", 'de'))
+
+    assert results == [f"Text {number}" for number in range(16)]
+    assert len(created) == 1
+    assert sum(created[0].statements.values()) == 16
+
+
+def test_broken_session_is_recreated_once(sessions):
+    create, created = sessions
+    factories = iter([BrokenSession] + [lambda: FakeCortexSession(latency=0.01)] * 16)
+    create(lambda: next(factories)())
+
+    # Alle Threads scheitern an derselben Session, nur einer baut sie neu auf
+    summaries = run_threads(8, lambda number: SnowflakeHelper().summarize(f"Sentence {number}. More."))
+
+    assert all(f"Sentence {number}." in summary for number, summary in enumerate(summaries))
+    assert isinstance(created[0], BrokenSession) and created[0].closed
+    assert len(created) == 2
+    assert snowflake_helper.get_session() is created[1]
+
+
+def test_session_error_without_fallback_is_cortex_unavailable(sessions):
+    create, created = sessions
+    create(BrokenSession)
+    snowflake_helper.router.routes = dict(snowflake_helper.router.routes, summary=['mixtral'])
+
+    with pytest.raises(resilience.CortexUnavailable):
+        SnowflakeHelper().summarize("Some text.")
+    assert snowflake_helper._session is None
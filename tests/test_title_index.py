@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+import pytest
+
+import utils.title_index as title_index
+import utils.wiki_utils as wiki_utils
+from benchmarks.fake_wikipedia import FakeWikipedia
+
+
+@pytest.fixture
+def wiki(monkeypatch):
+    wiki = FakeWikipedia().start()
+    monkeypatch.setattr(wiki_utils, 'API_URL_TEMPLATE', wiki.api_url_template)
+    monkeypatch.setattr(title_index, '_indexes', {})
+    monkeypatch.setattr(title_index, '_asked_prefixes', OrderedDict())
+    monkeypatch.setattr(title_index, '_complete_prefixes', OrderedDict())
+    monkeypatch.setattr(title_index, 'PREFIX_LIMIT', 2)
+    yield wiki
+    wiki.stop()
+
+
+def test_prefix_search_is_asked_once_per_prefix(wiki):
+    assert title_index.suggest("Zebra", 'en')[0][0] == "Zebra"
+    title_index.suggest("Zebra", 'en')
+    title_index.suggest("Zebras", 'en')
+
+    assert wiki.requests['prefixsearch'] == 1
+
+
+def test_remembered_prefixes_are_bounded(wiki):
+    for prefix in ("Alpha", "Beta", "Gamma", "Delta"):
+        title_index.suggest(prefix, 'en')
+
+    assert len(title_index._asked_prefixes) == 2
+    assert len(title_index._complete_prefixes) == 2
+    # Der zuletzt getippte Präfix bleibt, der älteste wird wieder nachgeschlagen
+    title_index.suggest("Delta", 'en')
+    assert wiki.requests['prefixsearch'] == 4
+    title_index.suggest("Alpha", 'en')
+    assert wiki.requests['prefixsearch'] == 5
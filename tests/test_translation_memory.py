@@ -0,0 +1,19 @@
+from utils.translation_memory import split_sentences
+
+
+def test_short_sentences_are_not_merged():
+    assert split_sentences("No. The vote failed. Yes. It passed later.") == [
+        "No.", "The vote failed.", "Yes.", "It passed later."]
+    assert split_sentences("Ja. Das stimmt.") == ["Ja.", "Das stimmt."]
+
+
+def test_abbreviations_do_not_end_a_sentence():
+    assert split_sentences("He met Dr. Smith in St. Louis. They talked.") == [
+        "He met Dr. Smith in St. Louis.", "They talked."]
+    assert split_sentences("Es gibt z.B. Äpfel. Und Birnen.") == ["Es gibt z.B. Äpfel.", "Und Birnen."]
+    assert split_sentences("The author J. R. R. Tolkien wrote it. It sold well.") == [
+        "The author J. R. R. Tolkien wrote it.", "It sold well."]
+
+
+def test_number_abbreviations():
+    assert split_sentences("It reached No. 1 in May. No. It did not.") == ["It reached No. 1 in May.", "No.", "It did not."]
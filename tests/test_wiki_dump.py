@@ -0,0 +1,58 @@
+import bz2
+
+import pytest
+from wikipedia.exceptions import RedirectError
+
+from utils.wiki_dump import WikiDump, build_index
+
+
+def page_xml(title, page_id, text='', redirect=None):
+    redirect = f'<redirect title="{redirect}" />' if redirect else ''
+    return (f"<page><title>{title}</title><ns>0</ns><id>{page_id}</id>{redirect}"
+            f"<revision><id>{page_id * 10}</id><text>{text}</text></revision></page>\n")
+
+
+def write_dump(directory, streams):
+    """Writes a multistream dump of the given streams (lists of (title, page id, xml)) and its index."""
+    dump_path = directory / 'dump.xml.bz2'
+    index_lines = []
+    with open(dump_path, 'wb') as f:
+        for stream in streams:
+            offset = f.tell()
+            f.write(bz2.compress(''.join(xml for _, _, xml in stream).encode('utf-8')))
+            index_lines += [f"{offset}:{page_id}:{title}\n" for title, page_id, _ in stream]
+    (directory / 'index.txt').write_text(''.join(index_lines), encoding='utf-8')
+    build_index(str(directory / 'index.txt'), str(directory / 'dump.idx'))
+    return WikiDump(str(dump_path), str(directory / 'dump.idx'))
+
+
+def test_truncated_stream(tmp_path):
+    truncated = "<page><title>Cut</title><ns>0</ns><id>7</id><revision><text>Cut off"
+    dump = write_dump(tmp_path, [[("Whole", 1, page_xml("Whole", 1, "Text.")), ("Cut", 7, truncated)]])
+
+    assert dump.read_page(dump.find("Cut")[1], 7) is None
+    assert dump.page("Whole", auto_suggest=False).content == "Text."
+
+
+def test_double_redirect(tmp_path):
+    dump = write_dump(tmp_path, [[
+        ("Old name", 1, page_xml("Old name", 1, redirect="Middle name")),
+        ("Middle name", 2, page_xml("Middle name", 2, redirect="Target")),
+        ("Target", 3, page_xml("Target", 3, "The target article.")),
+    ]])
+
+    wiki_page = dump.page("Old name", auto_suggest=False)
+    assert wiki_page.title == "Target" and wiki_page.pageid == '3'
+    assert wiki_page.original_title == "Old name"
+    with pytest.raises(RedirectError):
+        dump.page("Old name", auto_suggest=False, redirect=False)
+
+
+def test_redirect_loop(tmp_path):
+    dump = write_dump(tmp_path, [[
+        ("Ping", 1, page_xml("Ping", 1, redirect="Pong")),
+        ("Pong", 2, page_xml("Pong", 2, redirect="Ping")),
+    ]])
+
+    with pytest.raises(RedirectError):
+        dump.page("Ping", auto_suggest=False)
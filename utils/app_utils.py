@@ -1,12 +1,25 @@
+import os
 import re
+import html
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import datetime, timedelta
 
+import requests
 import wikipedia
 import mwparserfromhell
 import utils.wiki_utils as wiki_utils
 from utils.wikimdparser import wiki_to_markdown
-from utils.filecache import cache_with_disk
+from utils.filecache import cache_with_disk, get_disk_cache, record_cache_access
 from utils.snowflake_helper import SnowflakeHelper
+from utils.resilience import CortexUnavailable
+import utils.translation_memory as translation_memory
+import utils.llm_usage as llm_usage
+from utils.novelty import novel_statements
+from utils.section_alignment import article_sections, align
+from utils.tracing import span, traced, current_span
+import utils.localization as localization
 from utils.localization import _
 
 
@@ -18,13 +31,29 @@ supported_languages = {
     "it": "Italian"
 }
 
-def escape_markdown(text):
-    # Escape Dollarzeichen und andere spezielle Markdown-Zeichen
-    text = text.replace("$", "\$")
-    # Ersetze \n durch zwei Leerzeichen gefolgt von \n für korrekte Markdown Zeilenumbrüche
-    text = text.replace("\n", "  \n  \n")
-    text = wiki_to_markdown(text)
-    return text
+# Fan-out: Abschnitte populärer Artikel gleich in alle Sprachen übersetzen
+TRANSLATION_FANOUT = os.environ.get("FULLWIKI_TRANSLATION_FANOUT", "") == "1"
+FANOUT_MIN_PAGEVIEWS = int(os.environ.get("FULLWIKI_FANOUT_MIN_PAGEVIEWS", 50000))
+FANOUT_MIN_WAIT = timedelta(seconds=float(os.environ.get("FULLWIKI_FANOUT_MIN_WAIT", 2)))
+FANOUT_LAST_CALL = None
+
+# Felder der Infobox, die im Panel nicht angezeigt werden, als ganze Namen mit Präfix oder Suffix wie
+# image_size, map_caption, pushpin_map oder logo2; altitude oder mapframe bleiben sichtbar
+INFOBOX_HIDDEN_FIELDS = re.compile(r'^(\w+_)?(image|caption|alt|logo|map|signature|module|embed|footnotes?)(_\w+)?\d*$'
+                                   r'|^name$', re.IGNORECASE)
+INFOBOX_MAX_FIELDS = 20
+INFOBOX_MAX_VALUE_LENGTH = 150
+
+# Lädt den wahrscheinlichsten Suchtreffer, während der Leser noch wählt
+_prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prefetch')
+_prefetches = {}
+_prefetch_lock = threading.Lock()
+
+@traced('escape_markdown')
+def escape_markdown(text, lang='en'):
+    # Dollarzeichen escapen, \n für korrekte Markdown Zeilenumbrüche verdoppeln und Wikitext umwandeln,
+    # alles in einem Durchlauf; Links zeigen auf die Wikipedia des Artikels, nicht auf die globale Sprache
+    return wiki_to_markdown(text, lang=lang, escape=True)
 
 
 @cache_with_disk()
@@ -53,23 +82,110 @@ def wiki_search(wiki_query, wikipedia_language="en"):
         return "Kein Artikel gefunden."
 
 
+@cache_with_disk()
+def get_search_candidates(wiki_query, wikipedia_language="en"):
+    """The hits of a search with a short extract each, disambiguation pages left out."""
+    return [candidate for candidate in wiki_utils.search_candidates(wiki_query, lang=wikipedia_language)
+            if not candidate['disambiguation']]
+
+
+def prefetch_article(title, pageid, target_language):
+    """
+      Loads a candidate article and translates its first section in the background, so that
+      choosing it renders from the caches. Each article and language is fetched only once at a time.
+    """
+    key = (title, pageid, target_language)
+    with _prefetch_lock:
+        if key in _prefetches and not _prefetches[key].done():
+            return _prefetches[key]
+        # Fertige Vorab-Ladungen liegen schon in den Caches
+        for finished in [other for other, future in _prefetches.items() if future.done()]:
+            del _prefetches[finished]
+        _prefetches[key] = _prefetcher.submit(_prefetch_article, title, pageid, target_language)
+        return _prefetches[key]
+
+
+def wait_for_prefetch(title, pageid, target_language, timeout=60):
+    """Waits for a running prefetch of the article instead of doing the same work twice."""
+    with _prefetch_lock:
+        future = _prefetches.pop((title, pageid, target_language), None)
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except TimeoutError:
+            print(f"Prefetch of {title} still running")
+
+
+def _prefetch_article(title, pageid, target_language):
+    started = time.time()
+    try:
+        wiki_page = get_suggested_page(title, pageid, 'en')
+        if not isinstance(wiki_page, wiki_utils.WikipediaPage):
+            return
+        # Dieselben Aufrufe wie in app.py, sonst treffen die Cache-Keys nicht
+        image_html = get_page_image_html(wiki_page)
+        get_sections(wiki_page.extract, 1, target_language, image_html=image_html, popularity=wiki_page.pageviews,
+                     lang=wiki_page.lang)
+        get_page_infobox_html(wiki_page, target_language)
+        print(f"Prefetched {title} ({target_language}) in {time.time() - started:.1f}s")
+    except Exception as e:
+        print(f"Prefetch of {title} failed: {e}")
+
+
+@cache_with_disk()
+def get_suggested_page(title, pageid, language_code):
+    """
+      The English article for a title picked from the search suggestions of the Wikipedia of
+      `language_code`. Loaded by its page id or through the interlanguage link, without a search.
+      None if there is no English article.
+    """
+    try:
+        if language_code != 'en':
+            title = wiki_utils.langlink_title(title, language_code, pageid=pageid)
+            if not title:
+                return None
+            pageid = None
+        # Ohne set_lang, der Aufruf läuft auch im Hintergrund neben einer Zusammenführung
+        item = int(pageid) if pageid else title
+        wiki_page = wiki_utils.pages([item], lang='en')[item]
+        if isinstance(wiki_page, wikipedia.exceptions.WikipediaException):
+            raise wiki_page
+        return wiki_page
+    except wikipedia.exceptions.DisambiguationError as e:
+        return f"Mehrdeutiger Begriff, bitte präzisiere. Einige Möglichkeiten: {', '.join(e.options[:5])}"
+    except wikipedia.exceptions.PageError as pe:
+        print(pe)
+        return "Kein Artikel gefunden."
+
+
 @cache_with_disk()
 def get_section_headlines(extract, skip_translation=False):
     parsed = mwparserfromhell.parse(extract)
-    section_headlines = parsed.filter_headings()
+    section_headlines = [section for section in parsed.filter_headings() if section.level in (2, 3)]
+    titles = [section.title.strip() for section in section_headlines]
+    if not skip_translation:
+        titles = translate_headings(titles)
     headlines = ''
-    for section in section_headlines:
-        if skip_translation:
-            translated_section = section.title.strip()
-        else:
-            translated_section = translate(section.title.strip(), 'en', new_line=False, is_search_term=True)
-        if section.level == 2:
-            headlines += "## " + translated_section + "\n"
-        elif section.level == 3:
-            headlines += "### " + translated_section + "\n"
+    for section, translated_section in zip(section_headlines, titles):
+        headlines += "#" * section.level + " " + translated_section + "\n"
     return headlines
 
 
+def translate_headings(headings):
+    """Translates headings of any language to English in one batched Cortex call, through the translation memory."""
+    translations = {}
+    for heading in dict.fromkeys(headings):
+        remembered = translation_memory.lookup(heading, 'en', is_search_term=True)
+        if remembered is not None:
+            translations[heading] = remembered
+    missing = [(heading, 'en') for heading in dict.fromkeys(headings) if heading not in translations]
+    if missing:
+        print(f"Translating {len(missing)} headings to English")
+        for (heading, target_language), translation in _translate_into_memory(missing, is_search_term=True).items():
+            translations[heading] = translation
+    return [translations[heading] or heading for heading in headings]
+
+
 def improve_outline(english_outline, foreign_outline):
     snowflake_helper = SnowflakeHelper()
     improved_outline = snowflake_helper.improve_article_outline(english_outline, foreign_outline)
@@ -102,29 +218,38 @@ def extract_keyfacts(combined_section, wiki_query):
     return rewritten_section
 
 
-def _get_wikipage_from_language(search_term, language_code):
-    search_term = translate(search_term, language_code, new_line=False, is_search_term=True)
-    wiki_page = wiki_search(search_term, language_code)
-    return wiki_page
-
-
-def _get_wikipage_leading_abstract(extract):
-    wikicode = mwparserfromhell.parse(extract)
+@cache_with_disk()
+def get_foreign_pages(en_title, language_codes):
+    """
+      The articles in `language_codes` the English article links to, as dict of language code ->
+      WikipediaPage. Each one is loaded from its own Wikipedia without switching the language of
+      the other sessions; languages without an article are left out.
+    """
+    foreign_pages = {}
+    for language_code, title in wiki_utils.linked_titles(en_title, language_codes).items():
+        wiki_page = wiki_utils.pages([title], lang=language_code)[title]
+        if isinstance(wiki_page, wikipedia.exceptions.WikipediaException):
+            print(f"No {language_code} article for {en_title}: {wiki_page}")
+            continue
+        foreign_pages[language_code] = wiki_page
+    return foreign_pages
+
+
+def _get_wikipage_leading_abstract(extract, lang='en'):
+    with span('mwparser.parse', kind='abstract'):
+        wikicode = mwparserfromhell.parse(extract)
     abstract = ''
     for node in wikicode.nodes:
         if isinstance(node, mwparserfromhell.nodes.Heading):
             break
-        abstract += escape_markdown(node)
+        abstract += escape_markdown(node, lang)
 
     return abstract
 
 
-def _get_translated_abstract(log_area, urls, en_search_term, language_code):
-    log_area.text(_(f"Getting the {supported_languages[language_code]} Wikipedia article ..."))
+def _get_translated_abstract(log_area, wiki_page, en_search_term, language_code):
     try:
-        wiki_page = _get_wikipage_from_language(en_search_term, language_code)
-        urls[language_code] = wiki_page.url
-        abstract = _get_wikipage_leading_abstract(wiki_page.extract)
+        abstract = _get_wikipage_leading_abstract(wiki_page.extract, wiki_page.lang)
         log_area.text(_(f"Translate {supported_languages[language_code]} Wikipedia abstract to english ..."))
         abstract_in_en = translate(abstract, 'en')
         keyfacts_in_en = extract_keyfacts(abstract_in_en, en_search_term)
@@ -139,19 +264,41 @@ def _get_translated_abstract(log_area, urls, en_search_term, language_code):
     return keyfacts_in_en
 
 
-def get_combined_knowledge_sections(log_area, en_wiki_page, en_search_term, target_language,
-                                    read_to_section, image_html=None):
-    # if read_to_section == 1 - Only combine the first section
+def get_combined_knowledge_sections(log_area, en_wiki_page, target_language, read_to_section, image_html=None):
+    # read_to_section == 1: nur der Abstract, jeder weitere Schritt führt einen Abschnitt zusammen
+    # Die Caches hängen am Artikel, nicht an dem, was der Leser gesucht hat
+    en_search_term = en_wiki_page.title
     urls = {"en": en_wiki_page.url}
-    en_abstract = _get_wikipage_leading_abstract(en_wiki_page.extract)
-
-    translated_de_abstract_in_en = _get_translated_abstract(log_area, urls, en_search_term, 'de')
-    translated_fr_abstract_in_en = _get_translated_abstract(log_area, urls, en_search_term, 'fr')
-    translated_es_abstract_in_en = _get_translated_abstract(log_area, urls, en_search_term, 'es')
-    translated_it_abstract_in_en = _get_translated_abstract(log_area, urls, en_search_term, 'it')
+    images = {"en": en_wiki_page.image_name}
+    en_abstract = _get_wikipage_leading_abstract(en_wiki_page.extract, en_wiki_page.lang)
 
-    combined_abstract = (en_abstract + translated_de_abstract_in_en + translated_fr_abstract_in_en
-                         + translated_es_abstract_in_en + translated_it_abstract_in_en)
+    log_area.text(_("Getting the Wikipedia articles of the other languages ..."))
+    try:
+        # Über die Sprachlinks des englischen Artikels, einmal pro Artikel aus dem Disk-Cache
+        foreign_pages = get_foreign_pages(en_search_term, ('de', 'fr', 'es', 'it'))
+    except (wikipedia.exceptions.WikipediaException, requests.RequestException) as e:
+        print(e)
+        log_area.text(_("ERROR: Could not get the Wikipedia articles of the other languages ..."))
+        foreign_pages = {}
+
+    keyfacts = {}
+    pages = {}
+    for language_code, wiki_page in foreign_pages.items():
+        # Ist das LLM-Budget der Anfrage aufgebraucht, wird mit weniger Sprachen zusammengeführt
+        if llm_usage.current_request().over_budget():
+            print(f"LLM budget exhausted, merging without {supported_languages[language_code]}")
+            continue
+        urls[language_code] = wiki_page.url
+        images[language_code] = wiki_page.image_name
+        pages[language_code] = wiki_page
+        keyfacts[language_code] = _get_translated_abstract(log_area, wiki_page, en_search_term, language_code)
+
+    # Nur Aussagen, die weder im englischen Abstract noch in einer anderen Sprache stehen, gehen in den Prompt
+    differences = novel_statements(en_abstract, keyfacts)
+    combined_abstract = en_abstract
+    for statements in differences.values():
+        if statements:
+            combined_abstract += "\n" + "\n".join(f"- {statement}" for statement in statements) + "\n"
     log_area.text(_(f"Combining the knowledge from all languages ..."))
     combined_section = rewrite_section(combined_abstract, en_search_term)
 
@@ -159,59 +306,115 @@ def get_combined_knowledge_sections(log_area, en_wiki_page, en_search_term, targ
         log_area.text(_(f"Translate the combined knowledge to {supported_languages[target_language]} ..."))
         combined_section = get_translated_section(combined_section, target_language)
 
-    combined_section = escape_markdown(combined_section)
+    combined_section = escape_markdown(combined_section, en_wiki_page.lang)
 
     if image_html:
         combined_section = image_html + combined_section
-
-    return urls, combined_section
-
-   # OPTIONAL code if read_to_section > 1 the outline and article needs to be created from scratch section by section
-   #    en_outline = get_section_headlines(en_wiki_page.extract, skip_translation=True)
-   #     log_area.text(_(f"Getting the German Article Outline translated to englisch ..."))
-   #     de_outline_in_en = get_section_headlines(de_wiki_page.extract)
-   #     log_area.text(_(f"Getting the French Article Outline translated to englisch ..."))
-   #     fr_outline_in_en = get_section_headlines(fr_wiki_page.extract)
-   #     outlines_in_en = [en_outline, de_outline_in_en, fr_outline_in_en]
-   #     log_area.text(_(f"Merging Outlines to a new one ..."))
-   #     new_wiki_outline = get_new_wiki_outline(en_outline, outlines_in_en[1:])
-   #
-   #     parsed_new_outline = mwparserfromhell.parse(new_wiki_outline)
-   #     new_section_headlines = parsed_new_outline.filter_headings()
-   #     sections_headlines = ''
-   #     section_counter = 0
-   #     for section in new_section_headlines:
-   #         if section.level == 1:
-   #             continue
-   #         elif section.level == 2:
-   #             if sections_headlines != '':
-   #                 sections_headlines = section.title.strip()
-   #             else:
-   #                 if section_counter == read_to_section:
-   #                     break
-   #                 else:
-   #                     sections_headlines = section.title.strip()
-   #             section_counter += 1
-   #         else:
-   #             if sections_headlines != '':
-   #                 sections_headlines += '\n' + section.title.strip()
-
-   #     print(sections_headlines)
-   #     snowflake_helper = SnowflakeHelper()
-
-   #    needed_sections = snowflake_helper.determine_needed_sections(sections_headlines, en_outline, en_search_term)
-   #     print("The needed sections of EN are: ", needed_sections)
-        # Now extract the content for these sections, check if is komma separated
-   #     needed_sections = needed_sections.split(',')
-   #     needed_section_content = ''
-   #     for needed_section in needed_sections:
-   #         needed_section_content += get_needed_section_content(needed_section, en_outline, en_wiki_page.extract)
-
-   #     print("The content of the needed sections is: ", needed_section_content)
-   #     new_section = snowflake_helper.write_the_new_wikipedia_section(needed_section_content, sections_headlines,
-   #                                                                    en_search_term)
-
-   #    return None
+    # Die Bilder aller Sprachausgaben, aufgelöst in einer Anfrage
+    combined_section += get_gallery_html(images)
+
+    if read_to_section > 1:
+        en_sections, alignment = get_section_alignment(en_wiki_page, pages)
+        foreign_sections = {language_code: article_sections(wiki_page.extract)
+                            for language_code, wiki_page in pages.items()}
+        # Abschnitte werden erst zusammengeführt, wenn der Leser so weit ist, die früheren kommen aus dem Cache
+        for en_section, matches in list(zip(en_sections, alignment))[:read_to_section - 1]:
+            log_area.text(_("Combining the section {} ...").format(en_section[0]))
+            merged_section, section_differences = get_cached_merged_section(en_wiki_page, en_section, pages,
+                                                                            foreign_sections, matches)
+            for language_code, statements in section_differences.items():
+                differences.setdefault(language_code, []).extend(statements)
+
+            heading = escape_markdown(f"== {en_section[0]} ==", en_wiki_page.lang)
+            if target_language != 'en':
+                heading = get_translated_section(heading, target_language)
+                merged_section = get_translated_section(merged_section, target_language)
+            combined_section += "\n" + heading.strip() + "\n" + escape_markdown(merged_section, en_wiki_page.lang)
+
+    return urls, combined_section, differences
+
+
+def _revision_key(wiki_page):
+    revid = getattr(wiki_page, 'revid', None) or getattr(wiki_page, '_revid', None)
+    return getattr(wiki_page, 'lang', None), str(wiki_page.pageid), revid
+
+
+def get_cached_merged_section(en_wiki_page, en_section, foreign_pages, foreign_sections, matches):
+    """
+      ``get_merged_section`` for the matched sections of `foreign_sections`, kept in the disk cache
+      per revision of all articles and matched sections, so earlier sections are not merged again.
+    """
+    key = ('merged_section', _revision_key(en_wiki_page), en_section[0],
+           tuple(sorted((language_code, _revision_key(foreign_pages[language_code]), tuple(indices))
+                        for language_code, indices in matches.items())))
+    cache = get_disk_cache()
+    # Als Text, gepickelte Tupel gleichen Inhalts sind nicht immer dieselben Bytes
+    cached = cache.get(str(key))
+    record_cache_access('merged_section', cached is not None)
+    if cached is not None:
+        return cached
+
+    matched = {language_code: [foreign_sections[language_code][index][1] for index in indices]
+               for language_code, indices in matches.items()}
+    merged = get_merged_section(en_section, matched, en_wiki_page.title)
+    if key[1][2] and all(revision[2] for _, revision, _ in key[3]):
+        cache[str(key)] = merged
+    return merged
+
+
+def get_section_alignment(en_wiki_page, foreign_pages):
+    """
+      The sections of the English article and, per section, the matched sections of the foreign
+      articles as dict of language code -> section indices. The headings of all languages are
+      translated in one batch, the alignment is kept in the disk cache per revision.
+    """
+    key = ('section_alignment', _revision_key(en_wiki_page),
+           tuple(sorted((language_code, _revision_key(wiki_page))
+                        for language_code, wiki_page in foreign_pages.items())))
+    cache = get_disk_cache()
+    cached = cache.get(str(key))
+    record_cache_access('section_alignment', cached is not None)
+
+    en_sections = article_sections(en_wiki_page.extract)
+    if cached is not None:
+        return en_sections, cached
+
+    foreign_headings = {language_code: [heading for heading, _ in article_sections(wiki_page.extract)]
+                        for language_code, wiki_page in foreign_pages.items()}
+    translated = iter(translate_headings([heading for headings in foreign_headings.values() for heading in headings]))
+    foreign_headings = {language_code: [next(translated) for _ in headings]
+                        for language_code, headings in foreign_headings.items()}
+    alignment = align([heading for heading, _ in en_sections], foreign_headings)
+    if all(revision[2] for _, revision in key[2]) and key[1][2]:
+        cache[str(key)] = alignment
+    return en_sections, alignment
+
+
+def get_merged_section(en_section, foreign_sections, en_search_term):
+    """
+      Merges an English section with its matched sections of other languages. Only these are
+      translated and sent to the model, and only facts new to the English section go into the
+      rewrite prompt. Without matches the English section is returned unchanged.
+
+      Returns the section and the novel statements per language.
+    """
+    heading, text = en_section
+    if not foreign_sections:
+        return text, {}
+
+    keyfacts = {}
+    for language_code, texts in foreign_sections.items():
+        section_in_en = translate("\n".join(texts), 'en')
+        keyfacts[language_code] = extract_keyfacts(section_in_en, f"{en_search_term}: {heading}")
+
+    differences = novel_statements(text, keyfacts)
+    combined = text
+    for statements in differences.values():
+        if statements:
+            combined += "\n" + "\n".join(f"- {statement}" for statement in statements) + "\n"
+    if combined == text:
+        return text, differences
+    return rewrite_section(combined, en_search_term), differences
 
 
 def parse_outline_to_dict(outline_str):
@@ -265,8 +468,9 @@ def get_new_wiki_outline(en_outline, outlines, en_search_term):
     new_outline = polish_outline(en_outline, en_search_term)
     return new_outline
 
-def get_sections(extract, read_to_section, target_language, image_html=None):
-    wikicode = mwparserfromhell.parse(extract)
+def get_sections(extract, read_to_section, target_language, image_html=None, popularity=None, lang='en'):
+    with span('mwparser.parse', kind='sections'):
+        wikicode = mwparserfromhell.parse(extract)
     print(f"Section to read: {read_to_section}")
     print(len(wikicode.nodes))
     if read_to_section == 0:
@@ -274,14 +478,21 @@ def get_sections(extract, read_to_section, target_language, image_html=None):
     sections = ''
     section_counter = 0
     for node in wikicode.nodes:
-        new_section = escape_markdown(node)
+        new_section = escape_markdown(node, lang)
         print(new_section)
         if new_section and len(new_section.strip()) > 0:
             if section_counter == 0 and image_html:
                 sections += image_html
 
+            prewarm_section_translations(new_section, popularity)
+
             if target_language in ["de", "fr", "es", "it"]:
-                sections += get_translated_section(new_section, target_language)
+                try:
+                    sections += get_translated_section(new_section, target_language)
+                except CortexUnavailable as e:
+                    # Unübersetzt anzeigen und nicht cachen, beim nächsten Rerun wird es erneut versucht
+                    print(f"Showing section untranslated: {e}")
+                    sections += new_section
             else:
                 sections += new_section
 
@@ -296,15 +507,21 @@ def get_sections(extract, read_to_section, target_language, image_html=None):
     return sections
 
 
-@cache_with_disk()
-def get_translated_section(section, target_language):
-
+def _get_section_heading(section):
     pattern = r'#+\s.*?\s#+'
     segments = re.findall(pattern, section, flags=re.MULTILINE)
     if segments and len(segments) > 0:
-        section = segments[0]
+        return segments[0]
+    return None
+
+
+@cache_with_disk()
+def get_translated_section(section, target_language):
+    heading = _get_section_heading(section)
+    if heading:
+        section = heading
         print(section)
-        clean_section = segments[0].strip("# ").strip()
+        clean_section = heading.strip("# ").strip()
         print(clean_section)
         translated_section = translate(clean_section, target_language, new_line=False)
         translated_section = translated_section.strip()
@@ -318,21 +535,116 @@ def get_translated_section(section, target_language):
     return translated_section
 
 
-@cache_with_disk()
-def translate(text, target_language, new_line=True, is_search_term=False):
+def set_translation_fanout(fanout, min_pageviews=50000, min_wait=timedelta(seconds=2)):
+    """
+      Enable or disable translating sections into all supported languages at once.
+
+      Arguments:
+
+      * fanout - (Boolean) whether sections of popular articles are pre-translated into every language
+
+      Keyword arguments:
+
+      * min_pageviews - only articles with at least this many recent page views are fanned out
+      * min_wait - minimum time between two fan-out batches, sections in between are translated as usual
+    """
+    global TRANSLATION_FANOUT
+    global FANOUT_MIN_PAGEVIEWS
+    global FANOUT_MIN_WAIT
+    global FANOUT_LAST_CALL
+
+    TRANSLATION_FANOUT = fanout
+    FANOUT_MIN_PAGEVIEWS = min_pageviews
+    FANOUT_MIN_WAIT = min_wait
+    FANOUT_LAST_CALL = None
+
+
+def prewarm_section_translations(section, popularity):
+    """
+      Translate an escaped section into every supported language in one batched Cortex query
+      and fill the section cache for each language.
+    """
+    global FANOUT_LAST_CALL
+
+    if not TRANSLATION_FANOUT or popularity is None or popularity < FANOUT_MIN_PAGEVIEWS:
+        return
+    if FANOUT_LAST_CALL and FANOUT_LAST_CALL + FANOUT_MIN_WAIT > datetime.now():
+        print("Translation fan-out throttled")
+        return
+
+    heading = _get_section_heading(section)
+    text = heading.strip("# ").strip() if heading else section
+    languages = [language_code for language_code in supported_languages if language_code != 'en']
+
+    translation_units = _split_for_translation(text)
+    sentences = [sentence for sentences in translation_units for sentence in sentences]
+    missing = [(sentence, language_code) for language_code in languages for sentence in dict.fromkeys(sentences)
+               if translation_memory.lookup(sentence, language_code) is None]
+    if not missing:
+        return
+
+    FANOUT_LAST_CALL = datetime.now()
+    print(f"Translation fan-out: {len(missing)} sentences into {', '.join(languages)}")
+    try:
+        _translate_into_memory(missing)
+    except CortexUnavailable as e:
+        print(f"Translation fan-out skipped: {e}")
+        return
+    for language_code in languages:
+        get_translated_section(section, language_code)
+
+
+def _split_for_translation(text, is_search_term=False):
+    # TODO Dirty hack instead of chunking the text. Depending that wiki text is well formatted ;-)
+    text_parts = [text_part for text_part in text.split("\n") if len(text_part.strip()) > 0]
+    if is_search_term:
+        return [[text_part.strip()] for text_part in text_parts]
+    return [translation_memory.split_sentences(text_part) for text_part in text_parts]
+
+
+def _translate_into_memory(items, is_search_term=False):
     snowflake_helper = SnowflakeHelper()
+    translated = snowflake_helper.translate_many(items, is_search_term)
+    translations = {}
+    for (sentence, target_language), translation in zip(items, translated):
+        translation = translation.strip()
+        translation_memory.store(sentence, target_language, translation, is_search_term)
+        translations[sentence, target_language] = translation
+    return translations
+
 
+@cache_with_disk()
+def translate(text, target_language, new_line=True, is_search_term=False):
     #if is_search_term:
     #    return snowflake_helper.translate_search_term_with_cortex(text, target_language)
 
-    # TODO Dirty hack instead of chunking the text. Depending that wiki text is well formatted ;-)
-    text_parts = text.split("\n")
+    translation_units = _split_for_translation(text, is_search_term)
+
+    # Erst das Translation Memory fragen, nur der Rest geht an Cortex
+    translations = {}
+    missing = []
+    for sentences in translation_units:
+        for sentence in sentences:
+            if sentence in translations or sentence in missing:
+                continue
+            remembered = translation_memory.lookup(sentence, target_language, is_search_term)
+            if remembered is None:
+                missing.append(sentence)
+            else:
+                translations[sentence] = remembered
+
+    current_span().set(language=target_language, memory_hits=len(translations), chunks=len(missing))
+    if missing:
+        print(f"Translation memory: {len(translations)} hits, {len(missing)} sentences to translate")
+        translated = _translate_into_memory([(sentence, target_language) for sentence in missing], is_search_term)
+        for sentence in missing:
+            translations[sentence] = translated[sentence, target_language]
+
     translated_text = ""
-    for index, text_part in enumerate(text_parts):
-        if len(text_part.strip()) > 0:
-            translated_text += snowflake_helper.translate(text_part, target_language, is_search_term)
-            if new_line:
-                translated_text += "\n\n"
+    for sentences in translation_units:
+        translated_text += " ".join(translations[sentence] for sentence in sentences)
+        if new_line:
+            translated_text += "\n\n"
 
     return translated_text
 
@@ -354,13 +666,29 @@ def get_strong_summary(summary, image_html, target_language):
 
 @cache_with_disk()
 def get_translation(text, target_language, is_search_term=False):
-    snowflake_helper = SnowflakeHelper()
-    return snowflake_helper.translate(text, target_language, is_search_term)
+    return translate(text, target_language, new_line=False, is_search_term=is_search_term)
+
+
+def get_english_search_term(query, language_code):
+    """
+      English search term for a query in `language_code`. Looks the query up on the user's own
+      Wikipedia and follows the link to the English article; only if there is none the LLM translates it.
+    """
+    try:
+        title = wiki_utils.english_title(query, language_code)
+    except (wikipedia.exceptions.WikipediaException, ValueError) as e:
+        print(f"Interlanguage lookup failed: {e}")
+        title = None
+    if title:
+        return title
+    print("No English article linked, translating the search term")
+    return get_translation(query, 'en', is_search_term=True)
 
 
 @cache_with_disk()
-def get_summary(extract, image_html, target_language, max_section_summarized=10):
-    wikicode = mwparserfromhell.parse(extract)
+def get_summary(extract, image_html, target_language, max_section_summarized=10, lang='en'):
+    with span('mwparser.parse', kind='summary'):
+        wikicode = mwparserfromhell.parse(extract)
 
     print("Node to be summarized: ", len(wikicode.nodes))
     summary = ''
@@ -368,7 +696,7 @@ def get_summary(extract, image_html, target_language, max_section_summarized=10)
 
     section_counter = 0
     for node in wikicode.nodes:
-        new_section = escape_markdown(node)
+        new_section = escape_markdown(node, lang)
         if new_section and len(new_section.strip()) > 0:
             current_section += new_section
 
@@ -388,16 +716,122 @@ def get_summary(extract, image_html, target_language, max_section_summarized=10)
         if section_counter >= max_section_summarized:
             break
 
-    summary = image_html + escape_markdown(summary)
+    summary = image_html + escape_markdown(summary, lang)
     return summary
 
 
-def get_article_image(image_filename):
+def get_article_image(image_filename, lang=None):
     image_html = ""
 
-    if image_filename:
-        image_url = wiki_utils.get_image_url(image_filename)
+    image_url = wiki_utils.get_image_url(image_filename, lang=lang) if image_filename else None
+    if image_url:
         # Erstelle HTML-Code für das Bild mit Textfluss
         image_html = f'<div style="float: left; margin-right: 15px; margin-top: 8px"><img src="{image_url}" alt="Bild" style="max-height: 200px;"></div>'
 
     return image_html
+
+
+def get_page_image_html(wiki_page):
+    image_filename = wiki_page.image_name
+
+    if not image_filename:
+        infobox = wiki_page.infobox
+        if infobox:
+            image_filename = infobox.get('image')
+    return get_article_image(image_filename, lang=getattr(wiki_page, 'lang', None))
+
+
+def get_gallery_html(images):
+    """
+      A row of thumbnails for the page images of several language editions.
+      `images` is a dict of language code -> file name; all files are resolved in one query,
+      files that only exist on their own Wikipedia are looked up there.
+    """
+    images = {language_code: filename for language_code, filename in images.items() if filename}
+    urls = wiki_utils.get_image_urls(images.values(), lang='en')
+    for language_code, filename in images.items():
+        if filename not in urls:
+            urls.update(wiki_utils.get_image_urls([filename], lang=language_code))
+
+    figures = ""
+    shown = set()
+    for language_code, filename in images.items():
+        if filename not in urls or filename in shown:
+            continue
+        shown.add(filename)
+        figures += (f'<figure style="display: inline-block; margin: 0 15px 8px 0; text-align: center">'
+                    f'<img src="{urls[filename]}" alt="{html.escape(filename)}" style="max-height: 150px;">'
+                    f'<figcaption style="font-size: 0.75rem">Wikipedia {language_code}</figcaption></figure>')
+    return f'<div>{figures}</div>' if len(shown) > 1 else ""
+
+
+def _infobox_fields(infobox):
+    fields = []
+    for key, value in infobox.items():
+        value = " ".join(value.split())
+        if not value or INFOBOX_HIDDEN_FIELDS.search(key):
+            continue
+        if len(value) > INFOBOX_MAX_VALUE_LENGTH:
+            value = value[:INFOBOX_MAX_VALUE_LENGTH].rsplit(" ", 1)[0] + " ..."
+        label = key.replace("_", " ").strip()
+        fields.append((label[:1].upper() + label[1:], value))
+    return fields[:INFOBOX_MAX_FIELDS]
+
+
+@cache_with_disk()
+def get_infobox_html(infobox, target_language):
+    """
+      Renders the infobox as a panel floating right of the article, translated to `target_language`.
+      Labels come from the label dictionary, values from the translation memory; everything
+      missing is translated in a single batched Cortex call.
+    """
+    fields = _infobox_fields(infobox)
+    if not fields:
+        return ""
+
+    if target_language != 'en' and target_language in supported_languages:
+        labels = {label: translation_memory.lookup_label(label, target_language) for label, _ in fields}
+        values = {value: translation_memory.lookup(value, target_language) for _, value in fields}
+        missing_labels = [label for label, translation in labels.items() if translation is None]
+        missing_values = [value for value, translation in values.items() if translation is None]
+        current_span().set(language=target_language, chunks=len(missing_labels) + len(missing_values))
+
+        if missing_labels or missing_values:
+            snowflake_helper = SnowflakeHelper()
+            translated = snowflake_helper.translate_many(
+                [(text, target_language) for text in missing_labels + missing_values])
+            for label, translation in zip(missing_labels, translated):
+                labels[label] = translation.strip()
+                translation_memory.store_label(label, target_language, labels[label])
+            for value, translation in zip(missing_values, translated[len(missing_labels):]):
+                values[value] = translation.strip()
+                translation_memory.store(value, target_language, values[value])
+
+        fields = [(labels[label], values[value]) for label, value in fields]
+
+    rows = "".join(f'<tr><th style="text-align: left; padding-right: 8px; vertical-align: top">{html.escape(label)}'
+                   f'</th><td>{html.escape(value)}</td></tr>' for label, value in fields)
+    caption = html.escape(infobox.get("name", ""))
+    return (f'<div style="float: right; margin-left: 15px; margin-bottom: 8px; max-width: 320px; '
+            f'font-size: 0.85rem"><table><caption style="caption-side: top; font-weight: bold">{caption}'
+            f'</caption>{rows}</table></div>')
+
+
+def fill_missing_ui_translations():
+    """Translates the UI texts missing in the locale files in the background, in one batched Cortex call."""
+    if localization.AUTO_LOCALIZE:
+        localization.fill_missing_in_background(lambda items: SnowflakeHelper().translate_many(items))
+
+
+def get_page_infobox_html(wiki_page, target_language):
+    infobox = wiki_page.infobox
+    if not infobox:
+        return ""
+    # Artikel aus dem Store haben eine unveränderliche Infobox, der Cache-Schlüssel bleibt der eines dict
+    infobox = dict(infobox)
+    try:
+        return get_infobox_html(infobox, target_language)
+    except CortexUnavailable as e:
+        # Dann eben die englische Infobox
+        print(f"Showing infobox untranslated: {e}")
+        return get_infobox_html(infobox, 'en')
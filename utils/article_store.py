@@ -0,0 +1,127 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+from wikipedia.exceptions import WikipediaException
+
+import utils.wiki_utils as wiki_utils
+from utils.filecache import record_cache_access
+
+
+# Obergrenze für alle Artikel im Prozess, die am längsten nicht gelesenen fallen heraus
+STORE_SIZE_LIMIT = int(float(os.environ.get("FULLWIKI_ARTICLE_STORE_MB", 256)) * 2**20)
+
+
+class ArticleRecord(object):
+    """
+      Immutable, compact copy of the fields of a WikipediaPage the app reads.
+      The wikitext is not kept, only the infobox parsed from it.
+    """
+    __slots__ = ('lang', 'pageid', 'revid', 'title', 'url', 'extract', 'image_name', 'pageviews', 'infobox')
+
+    def __init__(self, wiki_page):
+        infobox = wiki_page.infobox
+        values = {
+            'lang': getattr(wiki_page, 'lang', wiki_utils.LANG),
+            'pageid': str(wiki_page.pageid),
+            'revid': getattr(wiki_page, '_revid', None),
+            'title': wiki_page.title,
+            'url': wiki_page.url,
+            'extract': wiki_page.extract,
+            'image_name': wiki_page.image_name,
+            # Ohne die Property, die alte Seiten aus dem Disk-Cache sonst neu laden würde
+            'pageviews': getattr(wiki_page, '_pageviews', None) or 0,
+            'infobox': MappingProxyType(dict(infobox)) if infobox else None,
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"ArticleRecord is immutable, cannot set {name}")
+
+    def __repr__(self):
+        return f"<ArticleRecord '{self.title}' {self.lang}:{self.pageid}@{self.revid}>"
+
+    @property
+    def key(self):
+        return self.lang, self.pageid, self.revid
+
+    @property
+    def size(self):
+        """Approximate bytes held by the record."""
+        size = sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, name)) for name in self.__slots__
+                                         if name != 'infobox')
+        if self.infobox:
+            size += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in self.infobox.items())
+        return size
+
+
+class ArticleStore(object):
+    """
+      Process-wide store of ArticleRecords keyed by (lang, pageid, revid). Sessions reading the
+      same revision share one record and keep only its key. Bounded by `size_limit` bytes.
+    """
+
+    def __init__(self, size_limit=STORE_SIZE_LIMIT):
+        self.size_limit = size_limit
+        self.size = 0
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, wiki_page):
+        """
+          Stores the page unless its revision is already known and returns the stored record.
+          The record is returned directly, a concurrent put may already have evicted it again.
+        """
+        key = (getattr(wiki_page, 'lang', wiki_utils.LANG), str(wiki_page.pageid), getattr(wiki_page, '_revid', None))
+        with self._lock:
+            if key in self._records:
+                self._records.move_to_end(key)
+                return self._records[key]
+        record = ArticleRecord(wiki_page)
+        with self._lock:
+            if record.key in self._records:
+                return self._records[record.key]
+            self._records[record.key] = record
+            self.size += record.size
+            # Den gerade eingefügten Artikel nie verdrängen
+            while self.size > self.size_limit and len(self._records) > 1:
+                _, evicted = self._records.popitem(last=False)
+                self.size -= evicted.size
+        return record
+
+    def get(self, key):
+        """The record for `key`, or None if it was never stored or has been evicted."""
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+        record_cache_access('article_store', record is not None)
+        return record
+
+    def __len__(self):
+        return len(self._records)
+
+
+store = ArticleStore()
+
+
+def article(key):
+    """
+      The record for a key held in a session. An evicted article is loaded again by its page id,
+      possibly in a newer revision; returns None if the page is gone.
+    """
+    record = store.get(key)
+    if record is None:
+        lang, pageid, _ = key
+        try:
+            # Mit der Sprache als Argument, ohne die globale Sprache der anderen Sessions umzustellen
+            wiki_page = wiki_utils.pages([int(pageid)], lang=lang)[int(pageid)]
+            if isinstance(wiki_page, WikipediaException):
+                raise wiki_page
+            record = store.put(wiki_page)
+        except WikipediaException as e:
+            print(f"Could not load the article {key} again: {e}")
+    return record
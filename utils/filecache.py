@@ -1,22 +1,65 @@
+import os
 import sys
 import diskcache as dc
+from collections import Counter
 from functools import wraps
 
+from utils.tracing import span
 
-def cache_with_disk(path="./.cache", size_limit=2**25):  # 512 MB als Standardgröße
+
+# Wurzel aller Caches auf der Platte; Tests und Benchmarks setzen ein temporäres Verzeichnis
+CACHE_DIRECTORY = os.environ.get("FULLWIKI_CACHE_DIR", "./.cache")
+
+# Ein dc.Cache pro Pfad, damit alle Stores im selben Prozess dieselbe Instanz teilen
+_disk_caches = {}
+
+# Treffer und Fehlschläge pro Funktion, für Benchmarks und Auswertungen
+cache_hits = Counter()
+cache_misses = Counter()
+
+
+def record_cache_access(name, hit):
+    if hit:
+        cache_hits[name] += 1
+    else:
+        cache_misses[name] += 1
+
+
+def clear_disk_caches():
+    """Empties every disk cache of this process and resets the hit counters."""
+    for cache in _disk_caches.values():
+        cache.clear()
+    cache_hits.clear()
+    cache_misses.clear()
+
+
+def get_disk_cache(path=None, size_limit=2**25):
+    """Returns the shared diskcache instance for `path`, by default the cache directory."""
+    path = path or CACHE_DIRECTORY
+    if path not in _disk_caches:
+        _disk_caches[path] = dc.Cache(path, size_limit=size_limit)
+    return _disk_caches[path]
+
+
+def cache_with_disk(path=None, size_limit=2**25):  # 512 MB als Standardgröße
     def decorator(func):
-        cache = dc.Cache(path, size_limit=size_limit)
+        cache = get_disk_cache(path, size_limit=size_limit)
 
         @wraps(func)
         def wrapper(*args, **kwargs):
             key = func.__name__ + str(args) + str(kwargs)
-            if key in cache:
-                item_size = sys.getsizeof(cache[key])
-                return cache[key]
-            else:
-                result = func(*args, **kwargs)
-                cache[key] = result
-                return result
+            with span(func.__name__) as current:
+                if key in cache:
+                    record_cache_access(func.__name__, True)
+                    current.set(cache_hit=True)
+                    item_size = sys.getsizeof(cache[key])
+                    return cache[key]
+                else:
+                    record_cache_access(func.__name__, False)
+                    current.set(cache_hit=False)
+                    result = func(*args, **kwargs)
+                    cache[key] = result
+                    return result
 
         #def clear_cache():
         #    cache.clear()
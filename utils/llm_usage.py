@@ -0,0 +1,138 @@
+import os
+import threading
+import contextvars
+from collections import defaultdict, OrderedDict
+
+
+# Grobe Schätzung, Cortex rechnet je nach Modell mit etwa 4 Zeichen pro Token
+CHARS_PER_TOKEN = 4
+
+# Budgets pro Anfrage (ein Rerun der App), 0 bedeutet unbegrenzt
+MAX_PROMPT_TOKENS = int(os.environ.get("FULLWIKI_MAX_PROMPT_TOKENS", 6000))
+MAX_REQUEST_TOKENS = int(os.environ.get("FULLWIKI_MAX_REQUEST_TOKENS", 0))
+
+# Modell, auf das ausgewichen wird, wenn das Budget der Anfrage aufgebraucht ist
+CHEAP_MODEL = os.environ.get("FULLWIKI_CHEAP_MODEL", "mistral-7b")
+
+# Verbrauch der zuletzt aktiven Sessions, die älteste fällt heraus
+SESSION_USAGE_LIMIT = int(os.environ.get("FULLWIKI_SESSION_USAGE_LIMIT", 1000))
+
+_current_request = contextvars.ContextVar('current_request', default=None)
+_sessions_lock = threading.Lock()
+session_usage = OrderedDict()
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def trim_to_tokens(text, max_tokens):
+    """Cuts `text` to about `max_tokens` tokens at the last line or sentence end before the limit."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind("\n"), cut.rfind(". "))
+    return cut[:boundary + 1] if boundary > max_chars // 2 else cut
+
+
+def split_to_tokens(text, max_tokens):
+    """
+      Splits `text` into pieces of about `max_tokens` tokens at line, sentence or word ends.
+      Unlike trimming nothing is left out.
+    """
+    max_chars = max(max_tokens, 1) * CHARS_PER_TOKEN
+    pieces = []
+    while len(text) > max_chars:
+        cut = text[:max_chars]
+        boundary = max(cut.rfind("\n"), cut.rfind(". "), cut.rfind(" "))
+        end = boundary + 1 if boundary > max_chars // 2 else max_chars
+        pieces.append(text[:end])
+        text = text[end:]
+    pieces.append(text)
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+
+def trim_inputs(inputs, max_tokens):
+    """
+      Trims a dict of name -> input text to about `max_tokens` tokens together. Short inputs stay
+      complete, the longer ones share the rest evenly.
+    """
+    trimmed = {}
+    remaining = max_tokens
+    ordered = sorted(inputs.items(), key=lambda item: estimate_tokens(item[1]))
+    for count, (name, text) in enumerate(ordered):
+        trimmed[name] = trim_to_tokens(text, max(remaining // (len(ordered) - count), 0))
+        remaining -= estimate_tokens(trimmed[name])
+    return trimmed
+
+
+class RequestUsage(object):
+    """
+      LLM usage of one request, aggregated per operation (prompt kind).
+    """
+
+    def __init__(self, session_id=None, max_prompt_tokens=MAX_PROMPT_TOKENS, max_request_tokens=MAX_REQUEST_TOKENS):
+        self.session_id = session_id
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_request_tokens = max_request_tokens
+        self.operations = defaultdict(lambda: defaultdict(float))
+        self.degraded = 0
+        self.trimmed = 0
+
+    @property
+    def total_tokens(self):
+        total = self.operations.get('total', {})
+        return int(total.get('prompt_tokens', 0) + total.get('completion_tokens', 0))
+
+    def over_budget(self, additional_tokens=0):
+        return bool(self.max_request_tokens) and self.total_tokens + additional_tokens > self.max_request_tokens
+
+    def record(self, kind, model, prompt_tokens, completion_tokens, latency, calls=1):
+        for usage in (self.operations[kind], self.operations['total']):
+            usage['calls'] += calls
+            usage['prompt_tokens'] += prompt_tokens
+            usage['completion_tokens'] += completion_tokens
+            usage['latency'] += latency
+            usage['model:' + model] += calls
+        if self.session_id is not None:
+            with _sessions_lock:
+                if self.session_id not in session_usage:
+                    session_usage[self.session_id] = defaultdict(lambda: defaultdict(float))
+                    while len(session_usage) > SESSION_USAGE_LIMIT:
+                        session_usage.popitem(last=False)
+                session_usage.move_to_end(self.session_id)
+                for name in (kind, 'total'):
+                    usage = session_usage[self.session_id][name]
+                    usage['calls'] += calls
+                    usage['prompt_tokens'] += prompt_tokens
+                    usage['completion_tokens'] += completion_tokens
+                    usage['latency'] += latency
+
+    def table(self):
+        return [{'operation': kind, 'calls': int(usage['calls']), 'prompt_tokens': int(usage['prompt_tokens']),
+                 'completion_tokens': int(usage['completion_tokens']), 'latency_s': round(usage['latency'], 2)}
+                for kind, usage in self.operations.items()]
+
+
+def start_request(session_id=None, **budget):
+    """Starts the usage accounting of a new request, e.g. one rerun of the app."""
+    request = RequestUsage(session_id, **budget)
+    _current_request.set(request)
+    return request
+
+
+def current_request():
+    """The usage of the running request, or a request without session outside the app."""
+    request = _current_request.get()
+    if request is None:
+        request = start_request(max_request_tokens=0)
+    return request
+
+
+def session_table(session_id):
+    with _sessions_lock:
+        usage = {kind: dict(values) for kind, values in session_usage.get(session_id, {}).items()}
+    return [{'operation': kind, 'calls': int(values['calls']), 'prompt_tokens': int(values['prompt_tokens']),
+             'completion_tokens': int(values['completion_tokens']), 'latency_s': round(values['latency'], 2)}
+            for kind, values in usage.items()]
@@ -1,27 +1,178 @@
+"""
+UI texts in the language of the reader.
+
+    python -m utils.localization pt nl
+
+translates every known UI text into new languages and writes them to the overlay files.
+"""
 import os
+import sys
+import threading
+from types import MappingProxyType
+
+from utils.filecache import CACHE_DIRECTORY
 
 # Dictionary, das alle Übersetzungen speichert
 translations = {}
+current_language = 'en'
+_loaded_directories = set()
+_load_lock = threading.Lock()
+
+# Vom LLM übersetzte Texte, die in den Dateien unter locales/ fehlen
+OVERLAY_DIRECTORY = os.environ.get("FULLWIKI_LOCALE_OVERLAY", os.path.join(CACHE_DIRECTORY, "locales"))
+AUTO_LOCALIZE = os.environ.get("FULLWIKI_AUTO_LOCALIZE", "1") == "1"
+
+# Fehlende Texte pro Sprache, die noch übersetzt werden müssen
+_missing = {}
+_requested = set()
+_missing_lock = threading.Lock()
+_fill_lock = threading.Lock()
+
+
+def _read_entries(path):
+    entries = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if '=' in line:
+                key, value = line.strip().split('=', 1)
+                entries[key] = value
+    return entries
+
+
+def _read_directory(directory):
+    entries = {}
+    if os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if filename.endswith('.txt'):
+                entries[filename.split('.')[0]] = _read_entries(os.path.join(directory, filename))
+    return entries
+
 
 def load_translations(directory):
-    """Lädt alle Übersetzungen aus Dateien im angegebenen Verzeichnis."""
-    for filename in os.listdir(directory):
-        if filename.endswith('.txt'):
-            lang_code = filename.split('.')[0]
-            with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
-                translations[lang_code] = {}
-                for line in f:
-                    if '=' in line:
-                        key, value = line.strip().split('=', 1)
-                        translations[lang_code][key] = value
+    """Lädt alle Übersetzungen aus Dateien im angegebenen Verzeichnis, einmal pro Prozess."""
+    with _load_lock:
+        if directory in _loaded_directories:
+            return translations
+        overlay = _read_directory(OVERLAY_DIRECTORY)
+        files = _read_directory(directory)
+        for lang_code in set(overlay) | set(files):
+            # Die gepflegten Dateien haben Vorrang vor den Übersetzungen des LLM
+            entries = dict(overlay.get(lang_code, {}), **files.get(lang_code, {}))
+            # Unveränderlich, alle Sessions teilen sich dieselben Einträge
+            translations[lang_code] = MappingProxyType(entries)
+        _loaded_directories.add(directory)
+    return translations
 
 
 def set_language(lang_code):
     """Setzt die aktuelle Sprache für die Übersetzungen."""
     global current_language
     current_language = lang_code
+    if lang_code != 'en' and lang_code not in translations:
+        # Neue Sprache ohne Datei, alle bekannten Texte auf einmal anfordern
+        request_translations(lang_code, known_texts())
+
+
+def known_texts():
+    """All UI texts that appear in any of the loaded languages."""
+    texts = {}
+    for entries in list(translations.values()):
+        texts.update(dict.fromkeys(entries))
+    return list(texts)
+
+
+def request_translations(lang_code, texts):
+    """Queues `texts` for the next ``fill_missing`` unless they were already requested."""
+    with _missing_lock:
+        for text in texts:
+            if (lang_code, text) not in _requested:
+                _requested.add((lang_code, text))
+                _missing.setdefault(lang_code, {})[text] = None
 
 
 def _(text):
     """Gibt die Übersetzung für den angegebenen Text zurück."""
-    return translations.get(current_language, {}).get(text, text)
\ No newline at end of file
+    entries = translations.get(current_language)
+    if entries is not None and text in entries:
+        return entries[text]
+    if current_language != 'en' and (current_language, text) not in _requested:
+        request_translations(current_language, [text])
+    return text
+
+
+def _write_overlay(lang_code, entries):
+    os.makedirs(OVERLAY_DIRECTORY, exist_ok=True)
+    with open(os.path.join(OVERLAY_DIRECTORY, f"{lang_code}.txt"), 'a', encoding='utf-8') as f:
+        for key, value in entries.items():
+            # Das Dateiformat kennt nur einzeilige Schlüssel ohne "="
+            if '\n' not in key and '=' not in key:
+                f.write(f"{key}={value}\n")
+
+
+def fill_missing(translate_many):
+    """
+      Translates all queued texts of all languages with one call of `translate_many`, which takes
+      a list of (text, language) pairs and returns the translations in the same order. The results
+      are written to the overlay files and replace the shared entries. Returns the number of texts.
+    """
+    with _missing_lock:
+        items = [(text, lang_code) for lang_code, texts in _missing.items() for text in texts]
+        _missing.clear()
+    if not items:
+        return 0
+
+    try:
+        translated = translate_many(items)
+    except Exception:
+        # Beim nächsten Mal erneut versuchen
+        with _missing_lock:
+            _requested.difference_update((lang_code, text) for text, lang_code in items)
+        raise
+
+    new_entries = {}
+    for (text, lang_code), translation in zip(items, translated):
+        translation = " ".join((translation or "").split())
+        if translation:
+            new_entries.setdefault(lang_code, {})[text] = translation
+
+    with _load_lock:
+        for lang_code, entries in new_entries.items():
+            # Ersetzen statt ändern, Leser sehen immer einen vollständigen Stand
+            translations[lang_code] = MappingProxyType(dict(entries, **translations.get(lang_code, {})))
+            _write_overlay(lang_code, entries)
+    print(f"Localized {len(items)} UI texts into {', '.join(new_entries) or 'no language'}")
+    return len(items)
+
+
+def fill_missing_in_background(translate_many):
+    """Runs ``fill_missing`` in a thread, unless one is already running or nothing is missing."""
+    if not _missing or not _fill_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            fill_missing(translate_many)
+        except Exception as e:
+            print(f"UI localization failed: {e}")
+        finally:
+            _fill_lock.release()
+
+    threading.Thread(target=run, name='localization', daemon=True).start()
+
+
+def main(argv=None):
+    from utils.snowflake_helper import SnowflakeHelper
+
+    languages = argv if argv is not None else sys.argv[1:]
+    if not languages:
+        print("Usage: python -m utils.localization <language code> ...")
+        return 1
+    load_translations('locales')
+    for lang_code in languages:
+        request_translations(lang_code, [text for text in known_texts() if text not in translations.get(lang_code, {})])
+    fill_missing(SnowflakeHelper().translate_many)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
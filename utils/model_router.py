@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import threading
+
+
+# Cortex-Funktion bzw. Modell hinter jedem Backend
+BACKEND_MODELS = {
+    'arctic': 'snowflake-arctic',
+    'mixtral': 'mixtral-8x7b',
+    'cortex-translate': None,
+}
+
+# Backends in der bevorzugten Reihenfolge pro Aufgabe, die folgenden sind die Fallbacks
+DEFAULT_ROUTES = {
+    'search_term': ['mixtral', 'arctic'],
+    'translation': ['cortex-translate', 'arctic'],
+    'summary': ['mixtral', 'arctic'],
+    'rewrite': ['arctic', 'mixtral'],
+    'default': ['arctic', 'mixtral'],
+}
+
+# Z.B. FULLWIKI_MODEL_ROUTES='{"translation": ["arctic"]}'
+ROUTES = dict(DEFAULT_ROUTES, **json.loads(os.environ.get("FULLWIKI_MODEL_ROUTES", "{}")))
+
+EWMA_ALPHA = 0.2
+MAX_ERROR_RATE = 0.5
+MIN_SAMPLES = 5
+# Ein Backend wird übersprungen, wenn es so viel langsamer ist als der schnellste Fallback
+SLOW_FACTOR = 3.0
+# Nach dieser Zeit ohne Fehler wird ein ungesundes Backend wieder zuerst versucht
+RECHECK_AFTER = 60
+
+
+class BackendStats(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.last_failure = None
+
+    def record(self, latency, ok):
+        self.calls += 1
+        if ok:
+            self.latency = latency if self.latency is None else (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * latency
+        else:
+            self.errors += 1
+            self.last_failure = time.monotonic()
+        self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA * (0.0 if ok else 1.0)
+
+    @property
+    def healthy(self):
+        return (self.calls < MIN_SAMPLES or self.error_rate < MAX_ERROR_RATE
+                or time.monotonic() - self.last_failure > RECHECK_AFTER)
+
+
+class ModelRouter(object):
+    """
+      Picks the Cortex backend per task type from the configured routes and the measured
+      latency and error rate of each backend.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = routes or ROUTES
+        self.stats = {backend: BackendStats() for backend in BACKEND_MODELS}
+        self._lock = threading.Lock()
+
+    def backends(self, task, prompt_only=False):
+        """The backends to try for `task`, best first, the rest as fallbacks."""
+        configured = [backend for backend in self.routes.get(task, self.routes['default'])
+                      if not (prompt_only and BACKEND_MODELS[backend] is None)]
+        with self._lock:
+            healthy = [backend for backend in configured if self.stats[backend].healthy]
+            unhealthy = [backend for backend in configured if backend not in healthy]
+            latencies = {backend: self.stats[backend].latency for backend in healthy
+                         if self.stats[backend].calls >= MIN_SAMPLES and self.stats[backend].latency}
+
+        if len(latencies) > 1 and healthy[0] in latencies:
+            fastest = min(latencies, key=latencies.get)
+            if latencies[healthy[0]] > SLOW_FACTOR * latencies[fastest]:
+                healthy.remove(fastest)
+                healthy.insert(0, fastest)
+        return healthy + unhealthy
+
+    def record(self, backend, latency, ok):
+        with self._lock:
+            self.stats[backend].record(latency, ok)
+
+    def table(self):
+        with self._lock:
+            return [{'backend': backend, 'calls': stats.calls, 'errors': stats.errors,
+                     'latency_s': round(stats.latency, 2) if stats.latency else None,
+                     'error_rate': round(stats.error_rate, 2)}
+                    for backend, stats in self.stats.items()]
+
+
+router = ModelRouter()
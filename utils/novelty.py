@@ -0,0 +1,95 @@
+import os
+import re
+import math
+from collections import Counter
+
+from utils.translation_memory import split_sentences
+from utils.tracing import span
+
+
+# Ab dieser Kosinus-Ähnlichkeit gilt eine Aussage als schon bekannt
+NOVELTY_THRESHOLD = float(os.environ.get("FULLWIKI_NOVELTY_THRESHOLD", 0.5))
+
+WORD = re.compile(r'\w+')
+BULLET = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s*')
+STOPWORDS = frozenset("""
+a an and are as at be been by for from has had have he her his in into is it its of on or she that the their
+they this to was were which who with
+""".split())
+
+
+def split_statements(text):
+    """Splits key facts or an abstract into single statements, without list markers."""
+    statements = []
+    for line in text.split("\n"):
+        line = BULLET.sub('', line).strip()
+        if line and not line.startswith('#'):
+            statements.extend(sentence for sentence in split_sentences(line) if WORD.search(sentence))
+    return statements
+
+
+def _terms(statement):
+    words = [word for word in WORD.findall(statement.casefold()) if word not in STOPWORDS]
+    return Counter(words)
+
+
+def _vectors(term_counts):
+    """TF-IDF vectors of all statements, normalized to length 1."""
+    document_frequency = Counter(term for counts in term_counts for term in counts)
+    documents = len(term_counts)
+    vectors = []
+    for counts in term_counts:
+        vector = {term: count * (math.log((1 + documents) / (1 + document_frequency[term])) + 1)
+                  for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors.append({term: weight / norm for term, weight in vector.items()})
+    return vectors
+
+
+def _cosine(first, second):
+    if len(first) > len(second):
+        first, second = second, first
+    return sum(weight * second.get(term, 0.0) for term, weight in first.items())
+
+
+def similarities(references, candidates):
+    """TF-IDF cosine similarity of every candidate to every reference, one row per candidate."""
+    vectors = _vectors([_terms(text) for text in list(references) + list(candidates)])
+    reference_vectors = vectors[:len(references)]
+    return [[_cosine(vector, reference) for reference in reference_vectors] for vector in vectors[len(references):]]
+
+
+def novel_statements(reference, foreign, threshold=NOVELTY_THRESHOLD):
+    """
+      Finds the statements of the foreign texts that are not covered by `reference`
+      or by a foreign text earlier in `foreign`.
+
+      Arguments:
+
+      * reference - the English text the others are compared with
+      * foreign - dict of language code -> text, already translated to English
+
+      Returns a dict of language code -> list of the novel statements, in their original order.
+    """
+    reference_statements = split_statements(reference)
+    foreign_statements = {language_code: split_statements(text) for language_code, text in foreign.items()}
+    statements = reference_statements + [statement for language_statements in foreign_statements.values()
+                                         for statement in language_statements]
+
+    with span('novelty', statements=len(statements)) as current:
+        vectors = iter(_vectors([_terms(statement) for statement in statements]))
+        known = [next(vectors) for _ in reference_statements]
+        novel = {}
+        for language_code, language_statements in foreign_statements.items():
+            novel[language_code] = []
+            for statement in language_statements:
+                vector = next(vectors)
+                if not vector or any(_cosine(vector, other) >= threshold for other in known):
+                    continue
+                novel[language_code].append(statement)
+                known.append(vector)
+        novel_count = sum(len(language_statements) for language_statements in novel.values())
+        current.set(novel=novel_count)
+
+    print(f"Novelty filter: {novel_count} of {len(statements) - len(reference_statements)} foreign statements are new")
+    return novel
@@ -0,0 +1,70 @@
+import re
+import html
+
+
+HTML_COMMENT = re.compile(r'<!--.*?-->', re.DOTALL)
+REF = re.compile(r'<ref[^>]*/>|<ref[^>]*>.*?</ref>', re.DOTALL | re.IGNORECASE)
+HTML_TAG = re.compile(r'</?[a-zA-Z][^>]*>')
+TEMPLATE = re.compile(r'\{\{[^{}]*\}\}')
+CITATION = re.compile(r'\[(?:\d+|[a-z]|note \d+|citation needed|clarification needed)\]', re.IGNORECASE)
+FILE_LINK = re.compile(r'\[\[(?:Category|File|Image):[^\]]*\]\]', re.IGNORECASE)
+EXTERNAL_LINK = re.compile(r'\[https?://\S+\s*([^\]]*)\]')
+WIKI_LINK = re.compile(r'\[\[(?:[^|\]]*\|)?([^\]]*)\]\]')
+MARKDOWN_LINK = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+WIKI_EMPHASIS = re.compile(r"'{2,}")
+# Nur paarige Sternchen, "5*3" oder Fußnotenzeichen bleiben stehen
+EMPHASIS = re.compile(r'(?<![\w\\*])(\*{1,3})(?=[^\s*])(.+?)(?<=[^\s\\*])\1(?![\w*])')
+ESCAPE = re.compile(r'\\([\\$*_`#\[\]])')
+# "## Titel" oder "== Titel ==", nicht "#1 single" oder "= 5"
+MARKDOWN_HEADING = re.compile(r'^(#{1,6})\s+(.*?)(?:\s+#+)?$')
+WIKI_HEADING = re.compile(r'^(={1,6})\s*([^=].*?)\s*\1$')
+SPACES = re.compile(r'[ \t\u00a0]+')
+
+
+def _heading(line):
+    match = MARKDOWN_HEADING.match(line) or WIKI_HEADING.match(line)
+    if not match or not match.group(2):
+        return None
+    return len(match.group(1)), match.group(2)
+
+
+def prompt_input(text):
+    """
+      Compact form of wikitext, plain text extracts or display markdown for LLM prompts.
+      Strips markup that is only needed for display (escapes, emphasis, links, HTML, references),
+      collapses whitespace and drops headings of empty sections.
+    """
+    text = HTML_COMMENT.sub('', text)
+    text = REF.sub('', text)
+    text = HTML_TAG.sub('', text)
+    previous = None
+    while previous != text:
+        previous, text = text, TEMPLATE.sub('', text)
+    text = FILE_LINK.sub('', text)
+    text = WIKI_LINK.sub(r'\1', text)
+    text = EXTERNAL_LINK.sub(r'\1', text)
+    text = MARKDOWN_LINK.sub(r'\1', text)
+    text = CITATION.sub('', text)
+    text = WIKI_EMPHASIS.sub('', text)
+    text = EMPHASIS.sub(r'\2', text)
+    text = ESCAPE.sub(r'\1', text)
+    text = html.unescape(text)
+
+    lines = []
+    for line in text.split("\n"):
+        line = SPACES.sub(' ', line).strip()
+        if not line:
+            continue
+        heading = _heading(line)
+        if heading:
+            level, title = heading
+            # Überschriften ohne Inhalt bis zur nächsten gleich hohen Überschrift entfallen
+            while lines and isinstance(lines[-1], tuple) and lines[-1][0] >= level:
+                lines.pop()
+            lines.append(heading)
+        else:
+            lines.append(line)
+    while lines and isinstance(lines[-1], tuple):
+        lines.pop()
+
+    return "\n".join(f"{'#' * line[0]} {line[1]}" if isinstance(line, tuple) else line for line in lines)
@@ -0,0 +1,175 @@
+import os
+import time
+import threading
+from collections import deque, defaultdict
+
+
+# Zeitlimit pro Cortex-Aufruf in Sekunden
+CALL_TIMEOUT = float(os.environ.get("FULLWIKI_CORTEX_TIMEOUT", 180))
+# Doppelte Anfrage, wenn die erste länger als das p95 der letzten Aufrufe braucht
+HEDGING = os.environ.get("FULLWIKI_CORTEX_HEDGING", "1") == "1"
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Circuit Breaker: nach so vielen Fehlern in Folge wird für RESET_TIMEOUT Sekunden nicht mehr angefragt
+FAILURE_THRESHOLD = int(os.environ.get("FULLWIKI_BREAKER_FAILURES", 5))
+RESET_TIMEOUT = float(os.environ.get("FULLWIKI_BREAKER_RESET", 30))
+
+# Der aufrufende Thread fragt die Jobs selbst ab, mit wachsendem Abstand, statt pro Job einen Thread zu blockieren
+POLL_INTERVAL = 0.01
+POLL_MAX_INTERVAL = 0.5
+
+
+class CortexUnavailable(Exception):
+    """Cortex did not answer in time or is considered unhealthy."""
+
+
+class CircuitOpenError(CortexUnavailable):
+    pass
+
+
+class CortexTimeout(CortexUnavailable):
+    pass
+
+
+class CircuitBreaker(object):
+    """
+      Closed: calls pass. Open: calls fail immediately. After RESET_TIMEOUT one probe call
+      is let through (half open), its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if self.probing else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.probing:
+                    print(f"Circuit breaker for {self.name} opened")
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+
+class LatencyWindow(object):
+
+    def __init__(self, size=LATENCY_WINDOW):
+        self.latencies = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+
+    def p95(self):
+        with self._lock:
+            if len(self.latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+breakers = defaultdict(lambda: None)
+latencies = defaultdict(LatencyWindow)
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(name):
+    with _breakers_lock:
+        if breakers[name] is None:
+            breakers[name] = CircuitBreaker(name)
+        return breakers[name]
+
+
+def run_hedged(name, submit, timeout=CALL_TIMEOUT, hedging=HEDGING):
+    """
+      Runs the async job returned by `submit()` and returns its result. The job is polled from
+      the calling thread. If it takes longer than the p95 latency of `name`, a duplicate job is
+      submitted; the first answer wins and the other job is cancelled. Raises CortexTimeout after
+      `timeout` and CircuitOpenError while the circuit of `name` is open.
+    """
+    breaker = breaker_for(name)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{name} is unavailable")
+
+    started = time.monotonic()
+    jobs = []
+    errors = []
+    try:
+        jobs.append(submit())
+        hedge_after = latencies[name].p95() if hedging else None
+        hedged = False
+        interval = POLL_INTERVAL
+        while True:
+            for job in [job for job in jobs if job.is_done()]:
+                jobs.remove(job)
+                try:
+                    result = job.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                latencies[name].add(time.monotonic() - started)
+                breaker.success()
+                return result
+            if not jobs:
+                # Alle Jobs sind fehlgeschlagen
+                raise errors[0]
+
+            elapsed = time.monotonic() - started
+            if elapsed >= timeout:
+                raise CortexTimeout(f"{name} did not answer within {timeout:.0f}s")
+            if hedge_after and not hedged and not errors and elapsed >= hedge_after:
+                print(f"Hedging {name} after {hedge_after:.1f}s")
+                jobs.append(submit())
+                hedged = True
+                interval = POLL_INTERVAL
+                continue
+            next_check = min(interval, timeout - elapsed)
+            if hedge_after and not hedged:
+                next_check = min(next_check, max(hedge_after - elapsed, 0.001))
+            time.sleep(next_check)
+            interval = min(interval * 2, POLL_MAX_INTERVAL)
+    except Exception:
+        breaker.failure()
+        raise
+    finally:
+        for job in jobs:
+            try:
+                job.cancel()
+            except Exception as e:
+                print(f"Could not cancel Cortex query: {e}")
+
+
+def breaker_table():
+    with _breakers_lock:
+        current = {name: breaker for name, breaker in breakers.items() if breaker is not None}
+    return [{'model': name, 'state': breaker.state, 'failures': breaker.failures,
+             'p95_s': round(latencies[name].p95(), 2) if latencies[name].p95() else None}
+            for name, breaker in current.items()]
@@ -0,0 +1,45 @@
+import os
+
+import mwparserfromhell
+
+from utils.novelty import similarities
+from utils.tracing import span
+
+
+# Ab dieser Ähnlichkeit der übersetzten Überschriften gehören zwei Abschnitte zusammen
+ALIGNMENT_THRESHOLD = float(os.environ.get("FULLWIKI_ALIGNMENT_THRESHOLD", 0.4))
+
+
+def article_sections(extract):
+    """The level 2 sections of an extract as a list of (heading, text), subsections are part of the text."""
+    with span('mwparser.parse', kind='alignment'):
+        wikicode = mwparserfromhell.parse(extract)
+    sections = []
+    for section in wikicode.get_sections(levels=[2]):
+        heading = section.nodes[0]
+        sections.append((heading.title.strip(), str(section)[len(str(heading)):].strip()))
+    return sections
+
+
+def align(headings, foreign_headings, threshold=ALIGNMENT_THRESHOLD):
+    """
+      Matches the sections of other languages to the English sections by the similarity of
+      their headings. Several foreign sections can belong to the same English section.
+
+      Arguments:
+
+      * headings - the headings of the English sections
+      * foreign_headings - dict of language code -> headings of its sections, translated to English
+
+      Returns one dict of language code -> indices of the matched foreign sections per English section.
+    """
+    alignment = [{} for _ in headings]
+    with span('section_alignment', sections=len(headings)):
+        for language_code, translated in foreign_headings.items():
+            if not headings or not translated:
+                continue
+            for foreign_index, scores in enumerate(similarities(headings, translated)):
+                best = max(range(len(headings)), key=scores.__getitem__)
+                if scores[best] >= threshold:
+                    alignment[best].setdefault(language_code, []).append(foreign_index)
+    return alignment
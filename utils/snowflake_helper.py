@@ -1,48 +1,126 @@
 import os
 import re
+import time
+import threading
 from dotenv import load_dotenv
 
-from snowflake.snowpark import Session
+from utils.tracing import span
+from utils.llm_usage import current_request, estimate_tokens, split_to_tokens, trim_inputs, CHEAP_MODEL
+from utils.model_router import router, BACKEND_MODELS
+from utils.resilience import run_hedged, CircuitOpenError, CortexUnavailable
+from utils.prompt_text import prompt_input
+
+
+def create_session():
+    # Snowpark braucht über eine Sekunde zum Importieren, erst bei der ersten Verbindung laden
+    from snowflake.snowpark import Session
+
+    load_dotenv('.env')
+    connection_parameters = {
+        "account": os.environ["SNOWFLAKE_ACCOUNT_NAME"],
+        "user": os.environ["SNOWFLAKE_USER"],
+        "password": os.environ["SNOWFLAKE_PASSWORD"],
+        "role": "ACCOUNTADMIN",
+        "database": os.environ["SNOWFLAKE_DATABASE"],
+        "warehouse": os.environ["SNOWFLAKE_WAREHOUSE"],
+        "schema": os.environ["SNOWFLAKE_SCHEMA"],
+    }
+    return Session.builder.configs(connection_parameters).create()
+
+
+_session = None
+_session_lock = threading.Lock()
+
+# Fehlercodes des Connectors, nach denen die Verbindung neu aufgebaut werden muss:
+# Verbindung fehlgeschlagen oder geschlossen, Session oder Token abgelaufen
+SESSION_ERROR_CODES = {250001, 250002, 390111, 390112, 390113, 390114}
+
+
+def get_session():
+    """
+      The Snowflake session of this process, created at first use and shared by all helpers and
+      sessions. Snowpark sessions are thread-safe from version 1.24 on, every call runs its own
+      query; a broken session is replaced through ``reset_session``.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def reset_session(broken):
+    """Drops the shared session after a connection or authentication error, the next call creates a new one."""
+    global _session
+    with _session_lock:
+        if _session is not broken:
+            # Ein anderer Thread hat sie schon ersetzt
+            return
+        _session = None
+    print("Snowflake session dropped, reconnecting on the next call")
+    try:
+        broken.close()
+    except Exception as e:
+        print(f"Could not close the Snowflake session: {e}")
+
+
+def _session_lost(error):
+    """Whether `error` means that the session can not be used any more."""
+    if not type(error).__module__.startswith('snowflake'):
+        return False
+    if getattr(error, 'errno', None) in SESSION_ERROR_CODES:
+        return True
+    from snowflake.connector.errors import OperationalError, InterfaceError, TokenExpiredError, RefreshTokenError
+    from snowflake.snowpark.exceptions import SnowparkSessionException
+    return isinstance(error, (OperationalError, InterfaceError, TokenExpiredError, RefreshTokenError,
+                              SnowparkSessionException))
+
+
+PROMPT_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+
+# Übersetzungen werden nie gekürzt, sonst landet eine halbe Übersetzung im Translation Memory
+UNTRIMMED_KINDS = ('translation', 'search_term')
+
+
+def _fill_prompt(prompt, inputs):
+    # Ein Durchlauf statt format, Anweisungen und Eingaben können selbst Klammern enthalten
+    return PROMPT_PLACEHOLDER.sub(lambda match: inputs.get(match.group(1), match.group(0)), prompt)
 
 
 class SnowflakeHelper:
 
     def __init__(self):
-        load_dotenv('.env')
-        connection_parameters = {
-            "account": os.environ["SNOWFLAKE_ACCOUNT_NAME"],
-            "user": os.environ["SNOWFLAKE_USER"],
-            "password": os.environ["SNOWFLAKE_PASSWORD"],
-            "role": "ACCOUNTADMIN",
-            "database": os.environ["SNOWFLAKE_DATABASE"],
-            "warehouse": os.environ["SNOWFLAKE_WAREHOUSE"],
-            "schema": os.environ["SNOWFLAKE_SCHEMA"],
-        }
-        self.session = Session.builder.configs(connection_parameters).create()
         #self.arctic_statement = "select snowflake.cortex.complete('snowflake-arctic', concat('[INST]',?,?,'[/INST]'))"
         self.mistral_statement = "select snowflake.cortex.complete('mixtral-8x7b', concat(?,?))"
         self.arctic_statement = "select snowflake.cortex.complete('snowflake-arctic', concat(?,?))"
         self.translation_statement = "select snowflake.cortex.translate(?,?,?)"
 
-    def __del__(self):
-        self.session.close()
+    @property
+    def session(self):
+        # Erst beim Aufruf, damit ein Verbindungsfehler wie jeder Cortex-Fehler behandelt wird
+        return get_session()
 
     def translate_search_term_with_cortex(self, search_term, target_language):
         # Unfortunately translation is not working good for single words with arctic
-        response = self.session.sql(self.translation_statement, params=(search_term, 'en', target_language))
-        return response.first()[0]
+        with span('cortex', prompt_kind='search_term', model='cortex-translate'):
+            rows = self._collect('cortex-translate', self.translation_statement, (search_term, 'en', target_language))
+            return rows[0][0]
 
-    def translate(self, text, target_language, is_search_term=False):
+    def _translation_prompt(self, target_language, is_search_term=False, short=False):
         languages = {'de': 'German', 'en': 'English', 'fr': 'French', 'es': 'Spanish', 'it': 'Italian'}
-        target_language = languages.get(target_language, 'English')
+        # Für weitere Sprachen, z.B. der Oberfläche, versteht das Modell auch den Sprachcode
+        target_language = languages.get(target_language, target_language)
 
-        if is_search_term:
+        if is_search_term and short:
+            translation_prompt = f"""Translate the search term "{{text}}" to {target_language}. """ \
+                                 f"""Answer only with the translated search term in quotes."""
+        elif is_search_term:
             translation_prompt = f"""
             You are a search term translator. Your task is to translate the search term to {target_language}.
                             
             It is important, that your output is ONLY the translated search term.
                             
-            Now translate the search term {text} to {target_language}.
+            Now translate the search term {{text}} to {target_language}.
             Think step by step.
             Verify that the translation is 100% correct. Before outputting.
             
@@ -59,18 +137,199 @@ class SnowflakeHelper:
                         
             Now Translate the following text to {target_language}:
                            
-            {text}    
+            {{text}}    
             """
+        return translation_prompt
 
-        response = self.session.sql(self.arctic_statement, params=(translation_prompt, ''))
-
+    def _clean_translation(self, translation, is_search_term=False):
         if is_search_term:
-            search_term_draft = response.first()[0]
-            match = re.search(r'"([^"]*)"', search_term_draft)
+            match = re.search(r'"([^"]*)"', translation)
             if match:
                 return match.group(1)
+        return translation
 
-        return response.first()[0]
+    def translate(self, text, target_language, is_search_term=False):
+        return self.translate_many([(text, target_language)], is_search_term)[0]
+
+    def translate_many(self, items, is_search_term=False):
+        """
+          Translates a list of (text, target_language) pairs in a single Cortex query.
+          Returns the translations in the order of `items`.
+        """
+        if not items:
+            return []
+
+        kind = 'search_term' if is_search_term else 'translation'
+        return self._route(kind, lambda backend: self._translate_with(backend, items, is_search_term))
+
+    def _translate_with(self, backend, items, is_search_term):
+        if backend == 'cortex-translate':
+            return self._cortex_translate_many(items)
+
+        kind = 'search_term' if is_search_term else 'translation'
+        max_prompt_tokens = current_request().max_prompt_tokens
+        prompts, inputs, owners = [], [], []
+        for index, (text, target_language) in enumerate(items):
+            # Der lange Schritt-für-Schritt-Prompt ist nur für Arctic nötig
+            prompt = self._translation_prompt(target_language, is_search_term, short=backend != 'arctic')
+            room = max_prompt_tokens - estimate_tokens(_fill_prompt(prompt, {'text': ''}))
+            # Zu lange Texte werden in Stücken übersetzt statt gekürzt
+            pieces = split_to_tokens(text, room) if max_prompt_tokens and room > 0 else [text]
+            for piece in pieces or [text]:
+                prompts.append(prompt)
+                inputs.append({'text': piece})
+                owners.append(index)
+
+        model = BACKEND_MODELS[backend]
+        if len(prompts) == 1:
+            completions = [self._run_complete(kind, prompts[0], '', model, inputs[0])]
+        else:
+            completions = self._complete_many(kind, prompts, model, inputs)
+        translations = [[] for _ in items]
+        for index, completion in zip(owners, completions):
+            translations[index].append(self._clean_translation(completion, is_search_term))
+        return [" ".join(parts) for parts in translations]
+
+    def _route(self, kind, call, prompt_only=False):
+        """Calls `call(backend)` with the best backend for `kind` and falls back to the next one on errors."""
+        error = None
+        for backend in router.backends(kind, prompt_only=prompt_only):
+            started = time.perf_counter()
+            try:
+                result = call(backend)
+            except CircuitOpenError as e:
+                # Kein echter Aufruf, die Statistik des Routers bleibt unverändert
+                print(f"Cortex backend {backend} skipped for {kind}: {e}")
+                error = e
+                continue
+            except Exception as e:
+                print(f"Cortex backend {backend} failed for {kind}: {e}")
+                router.record(backend, time.perf_counter() - started, ok=False)
+                error = e
+                continue
+            router.record(backend, time.perf_counter() - started, ok=True)
+            return result
+        if error is None:
+            raise CortexUnavailable(f"no backend configured for {kind}")
+        if isinstance(error, CortexUnavailable):
+            raise error
+        # Snowpark- und Verbindungsfehler zeigt die App wie einen Ausfall von Cortex an
+        raise CortexUnavailable(f"all backends failed for {kind}: {error}") from error
+
+    def _collect(self, model, statement, params):
+        """
+          Runs `statement` asynchronously with timeout, hedging and the circuit breaker of `model`.
+          After a connection or authentication error the session is dropped and recreated.
+        """
+        session = self.session
+        try:
+            return run_hedged(model, lambda: session.sql(statement, params=params).collect_nowait())
+        except Exception as e:
+            if _session_lost(e):
+                reset_session(session)
+            raise
+
+    def _statement(self, model):
+        if model == 'snowflake-arctic':
+            return self.arctic_statement
+        if model == 'mixtral-8x7b':
+            return self.mistral_statement
+        return f"select snowflake.cortex.complete('{model}', concat(?,?))"
+
+    def _fit_prompt(self, usage, kind, prompt, text='', inputs=None):
+        """
+          Fills `inputs` into the {name} placeholders of `prompt`. Only the inputs and `text` are
+          trimmed to the prompt budget, never the instructions, and translations not at all.
+        """
+        texts = dict(inputs or {})
+        texts[''] = text
+        instructions = estimate_tokens(_fill_prompt(prompt, dict.fromkeys(texts, '')))
+        input_tokens = sum(estimate_tokens(value) for value in texts.values())
+        if usage.max_prompt_tokens and instructions + input_tokens > usage.max_prompt_tokens:
+            if kind in UNTRIMMED_KINDS:
+                print(f"{kind} prompt exceeds {usage.max_prompt_tokens} tokens, input not trimmed")
+            elif instructions >= usage.max_prompt_tokens:
+                print(f"Prompt instructions alone exceed {usage.max_prompt_tokens} tokens, input not trimmed")
+            else:
+                usage.trimmed += 1
+                texts = trim_inputs(texts, usage.max_prompt_tokens - instructions)
+        text = texts.pop('')
+        return _fill_prompt(prompt, texts), text
+
+    def _budget_model(self, usage, model, prompt_tokens):
+        """The cheap model once the request budget would be spent by `prompt_tokens`, else `model`."""
+        if usage.over_budget(prompt_tokens):
+            usage.degraded += 1
+            return CHEAP_MODEL
+        return model
+
+    def _complete(self, kind, prompt, text='', **inputs):
+        """`inputs` fill the {name} placeholders of `prompt`, `text` is appended to it."""
+        def call(backend):
+            return self._run_complete(kind, prompt, text, BACKEND_MODELS[backend], inputs)
+
+        return self._route(kind, call, prompt_only=True)
+
+    def _run_complete(self, kind, prompt, text, model, inputs=None):
+        usage = current_request()
+        prompt, text = self._fit_prompt(usage, kind, prompt, text, inputs)
+        prompt_tokens = estimate_tokens(prompt + text)
+        model = self._budget_model(usage, model, prompt_tokens)
+
+        with span('cortex', prompt_kind=kind, model=model, prompt_tokens=prompt_tokens) as current:
+            started = time.perf_counter()
+            completion = self._collect(model, self._statement(model), (prompt, text))[0][0]
+            latency = time.perf_counter() - started
+            current.set(completion_tokens=estimate_tokens(completion))
+
+        usage.record(kind, model, prompt_tokens, estimate_tokens(completion), latency)
+        return completion
+
+    def _complete_many(self, kind, prompts, model='snowflake-arctic', inputs=None):
+        """Runs several prompts in one statement, returns the completions in the order of `prompts`."""
+        usage = current_request()
+        inputs = inputs or [None] * len(prompts)
+        prompts = [self._fit_prompt(usage, kind, prompt, '', prompt_inputs)[0]
+                   for prompt, prompt_inputs in zip(prompts, inputs)]
+        prompt_tokens = sum(estimate_tokens(prompt) for prompt in prompts)
+        # Das Budget der Anfrage gilt für den ganzen Batch, nicht für jeden Prompt einzeln
+        model = self._budget_model(usage, model, prompt_tokens)
+
+        with span('cortex', prompt_kind=kind, model=model, chunks=len(prompts), prompt_tokens=prompt_tokens) as current:
+            started = time.perf_counter()
+            values = ", ".join(["(?, ?)"] * len(prompts))
+            statement = (f"select column1, snowflake.cortex.complete('{model}', column2) "
+                         f"from values {values} order by column1")
+            params = [param for index, prompt in enumerate(prompts) for param in (index, prompt)]
+            rows = self._collect(model, statement, params)
+            completions = [row[1] for row in rows]
+            latency = time.perf_counter() - started
+            completion_tokens = sum(estimate_tokens(completion) for completion in completions)
+            current.set(completion_tokens=completion_tokens)
+
+        usage.record(kind, model, prompt_tokens, completion_tokens, latency, calls=len(prompts))
+        return completions
+
+    def _cortex_translate_many(self, items):
+        """Plain translation with Cortex TRANSLATE, the source language is detected."""
+        usage = current_request()
+        prompt_tokens = sum(estimate_tokens(text) for text, _ in items)
+
+        with span('cortex', prompt_kind='translation', model='cortex-translate', chunks=len(items),
+                  prompt_tokens=prompt_tokens):
+            started = time.perf_counter()
+            values = ", ".join(["(?, ?, ?)"] * len(items))
+            statement = (f"select column1, snowflake.cortex.translate(column2, '', column3) "
+                         f"from values {values} order by column1")
+            params = [param for index, (text, target_language) in enumerate(items)
+                      for param in (index, text, target_language)]
+            rows = self._collect('cortex-translate', statement, params)
+            translations = [row[1] for row in rows]
+            latency = time.perf_counter() - started
+
+        usage.record('translation', 'cortex-translate', prompt_tokens,
+                     sum(estimate_tokens(translation) for translation in translations), latency, calls=len(items))
+        return translations
 
     def summarize(self, text):
         prompt = f"""       
@@ -80,8 +339,7 @@ class SnowflakeHelper:
                 
                 """
 
-        response = self.session.sql(self.arctic_statement, params=(prompt, text))
-        return response.first()[0]
+        return self._complete('summary', prompt, prompt_input(text))
 
     def improve_article_outline(self, english_outline, foreign_outline):
 
@@ -103,14 +361,13 @@ class SnowflakeHelper:
                 Make it step by step.                
                                
                 outline from english wikipedia page:
-                {english_outline}
+                {{english_outline}}
                 
                 outline from translation:
-                {foreign_outline}
+                {{foreign_outline}}
                 """
 
-        response = self.session.sql(self.arctic_statement, params=(prompt, ''))
-        return response.first()[0]
+        return self._complete('outline', prompt, english_outline=english_outline, foreign_outline=foreign_outline)
 
     def polish_outline(self, outline, wiki_query):
         prompt = f"""
@@ -131,15 +388,15 @@ class SnowflakeHelper:
                 Think step by step.                
                                
                 current outline:
-                {outline}
+                {{outline}}
 
                 polished outline:                
                 """
 
-        response = self.session.sql(self.arctic_statement, params=(prompt, ''))
-        return response.first()[0]
+        return self._complete('outline', prompt, outline=outline)
 
     def combine_sections(self, master_section, compare_section):
+        master_section, compare_section = prompt_input(master_section), prompt_input(compare_section)
         prompt = f"""
                         You will rewrite a master section with information from a compare section.
                         You need to extract new information from a compare section that do not exists in the master 
@@ -157,18 +414,18 @@ class SnowflakeHelper:
                         Think step by step.                
                                        
                         Master section:
-                        {master_section}
+                        {{master_section}}
 
                         Compare Section:
-                        {compare_section}    
+                        {{compare_section}}    
                         
                         Final Section:            
                         """
 
-        response = self.session.sql(self.arctic_statement, params=(prompt, ''))
-        return response.first()[0]
+        return self._complete('combine', prompt, master_section=master_section, compare_section=compare_section)
 
     def combine_sections_2(self, combined_section):
+        combined_section = prompt_input(combined_section)
         prompt = f"""
                 You are an expert Wikipedia editor.
                 Here you find a text that is a combination of multiple sources.
@@ -180,15 +437,15 @@ class SnowflakeHelper:
                 Rewrite step by step.                
                                
                 Knowlegde sources:
-                {combined_section}
+                {{combined_section}}
                 
                 Combined new Section:            
                 """
         print(prompt)
-        response = self.session.sql(self.arctic_statement, params=(prompt, ''))
-        return response.first()[0]
+        return self._complete('combine', prompt, combined_section=combined_section)
 
     def rewrite_article_section(self, section, wiki_query):
+        section = prompt_input(section)
         prompt = f"""
                     # MISSION
                     You are a Wikipedia editor and an excellent writer of Wikipedia articles.
@@ -203,11 +460,10 @@ class SnowflakeHelper:
                     What a great article that would be.
                     
                     # INPUT
-                    {section}
+                    {{section}}
                     """
 
-        response = self.session.sql(self.arctic_statement, params=(prompt, ''))
-        return response.first()[0]
+        return self._complete('rewrite', prompt, section=section)
 
     def determine_needed_sections(self, master_outline, compare_outline, wiki_query):
         prompt = f"""
@@ -215,11 +471,11 @@ class SnowflakeHelper:
                         You are writing about {wiki_query}.
                         
                         You need to write another section about the topic. Your current section is:
-                        {master_outline}
+                        {{master_outline}}
                         
                         You have access to a remote knowledge base. The knowledge base contains the following data 
                         accessible by the following key: 
-                        {compare_outline}
+                        {{compare_outline}}
                         
                         What data from what entries will you need to write the current section?
                         Output one key or a list of keys separated by a comma. The key must contain in the knowledge 
@@ -233,11 +489,11 @@ class SnowflakeHelper:
                                                
                         """
 
-        response = self.session.sql(self.arctic_statement, params=(prompt, ''))
-
-        return response.first()[0]
+        return self._complete('needed_sections', prompt, master_outline=master_outline,
+                              compare_outline=compare_outline)
 
     def write_the_new_wikipedia_section(self, master_content, current_section, wiki_query):
+        master_content = prompt_input(master_content)
         prompt = f"""
                         You are a Wikipedia editor and an excellent writer of Wikipedia articles. 
                         You are writing about {wiki_query}.
@@ -246,16 +502,15 @@ class SnowflakeHelper:
                         {current_section}
                         
                         Use the following knowledge to write your current section:
-                        {master_content}
+                        {{master_content}}
                         
                         Now write this section.
                         """
 
-        response = self.session.sql(self.arctic_statement, params=(prompt, ''))
-
-        return response.first()[0]
+        return self._complete('write_section', prompt, master_content=master_content)
 
     def extract_keyfacts(self, text, wiki_query):
+        text = prompt_input(text)
         prompt = f"""
                     # MISSION
                     You are a Sparse Priming Representation (SPR) writer. 
@@ -280,9 +535,7 @@ class SnowflakeHelper:
                     another language model, not a human. Use complete sentences.
                     
                     # INPUT about {wiki_query}                    
-                    {text}
+                    {{source}}
                     """
 
-        response = self.session.sql(self.arctic_statement, params=(prompt, ''))
-
-        return response.first()[0]
+        return self._complete('keyfacts', prompt, source=text)
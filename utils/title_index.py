@@ -0,0 +1,141 @@
+import os
+import bisect
+import threading
+from collections import OrderedDict
+
+import requests
+from wikipedia.exceptions import WikipediaException
+
+import utils.wiki_utils as wiki_utils
+from utils.filecache import CACHE_DIRECTORY, get_disk_cache, record_cache_access
+
+
+SUGGESTIONS = 8
+# Kürzere Eingaben werden nur aus dem lokalen Index beantwortet
+REMOTE_MIN_PREFIX = int(os.environ.get("FULLWIKI_SUGGEST_MIN_PREFIX", 3))
+# Eigenes Verzeichnis, damit beim Start nur die Titel durchlaufen werden
+TITLE_CACHE_PATH = os.path.join(CACHE_DIRECTORY, "titles")
+# Obergrenze der gemerkten Präfixe, die am längsten nicht getippten fallen heraus
+PREFIX_LIMIT = int(os.environ.get("FULLWIKI_SUGGEST_PREFIX_LIMIT", 10000))
+
+
+class TitleIndex(object):
+    """
+      Sorted array of the known titles of one language with their page ids, for prefix
+      lookups with bisect. The page id is None for titles without a known id.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._entries = []
+        self._pageids = {}
+
+    def add(self, title, pageid):
+        """Adds a title, returns False if it was already known with a page id."""
+        if title in self._pageids:
+            if self._pageids[title] or not pageid:
+                return False
+            position = bisect.bisect_left(self._keys, title.casefold())
+            while self._entries[position][0] != title:
+                position += 1
+            self._entries[position] = (title, pageid)
+        else:
+            position = bisect.bisect_right(self._keys, title.casefold())
+            self._keys.insert(position, title.casefold())
+            self._entries.insert(position, (title, pageid))
+        self._pageids[title] = pageid
+        return True
+
+    def complete(self, prefix, limit=SUGGESTIONS):
+        """``(title, pageid)`` of up to `limit` titles starting with `prefix`, case insensitive."""
+        key = prefix.casefold()
+        position = bisect.bisect_left(self._keys, key)
+        entries = []
+        while position < len(self._keys) and len(entries) < limit and self._keys[position].startswith(key):
+            entries.append(self._entries[position])
+            position += 1
+        return entries
+
+    def __len__(self):
+        return len(self._keys)
+
+
+_indexes = {}
+# Präfixe, für die prefixsearch weniger als SUGGESTIONS Titel kannte, der lokale Index ist dafür vollständig
+_complete_prefixes = OrderedDict()
+_asked_prefixes = OrderedDict()
+_lock = threading.Lock()
+
+
+def _index(lang):
+    with _lock:
+        if not _indexes:
+            # Beim ersten Aufruf alle bisher gesehenen Titel aus dem Disk-Cache einlesen
+            cache = get_disk_cache(TITLE_CACHE_PATH)
+            for key in cache:
+                title_lang, title = key
+                _indexes.setdefault(title_lang, TitleIndex()).add(title, cache.get(key))
+            print(f"Title index loaded with {sum(len(index) for index in _indexes.values())} titles")
+        return _indexes.setdefault(lang, TitleIndex())
+
+
+def add_titles(lang, titles):
+    """Adds ``(title, pageid)`` pairs to the index of `lang` and keeps them in the disk cache."""
+    index = _index(lang)
+    cache = get_disk_cache(TITLE_CACHE_PATH)
+    for title, pageid in titles:
+        with _lock:
+            added = index.add(title, pageid)
+        if added:
+            cache[(lang, title)] = pageid
+
+
+def _remember(prefixes, key):
+    prefixes[key] = True
+    prefixes.move_to_end(key)
+    while len(prefixes) > PREFIX_LIMIT:
+        prefixes.popitem(last=False)
+
+
+def _known(prefixes, key):
+    if key not in prefixes:
+        return False
+    prefixes.move_to_end(key)
+    return True
+
+
+def _remote_complete(lang, key):
+    return any(_known(_complete_prefixes, (lang, key[:length])) for length in range(REMOTE_MIN_PREFIX, len(key) + 1))
+
+
+def suggest(prefix, lang, limit=SUGGESTIONS):
+    """
+      Up to `limit` titles of the Wikipedia of `lang` starting with `prefix`, as ``(title, pageid)``.
+      Answered from the local index; only if it knows fewer titles, prefixsearch is asked once per
+      prefix and its answer is added to the index.
+    """
+    prefix = " ".join(prefix.split())
+    if not prefix:
+        return []
+
+    index = _index(lang)
+    key = prefix.casefold()
+    with _lock:
+        suggestions = index.complete(prefix, limit)
+        local = (len(suggestions) >= limit or len(prefix) < REMOTE_MIN_PREFIX or _known(_asked_prefixes, (lang, key))
+                 or _remote_complete(lang, key))
+    record_cache_access('title_index', local)
+    if local:
+        return suggestions
+
+    try:
+        results = wiki_utils.prefix_search(prefix, lang=lang, results=limit)
+    except (WikipediaException, requests.RequestException) as e:
+        print(f"Prefix search failed: {e}")
+        return suggestions
+    add_titles(lang, results)
+    with _lock:
+        _remember(_asked_prefixes, (lang, key))
+        if len(results) < limit:
+            _remember(_complete_prefixes, (lang, key))
+        return index.complete(prefix, limit)
@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import uuid
+import html
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+
+# Datei für den JSON-Lines-Export, ohne Angabe wird nicht exportiert
+TRACE_FILE = os.environ.get("FULLWIKI_TRACE_FILE")
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span(object):
+    """
+      A timed step of a rerun with its attributes and child spans.
+    """
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def walk(self, depth=0):
+        yield self, depth
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+
+class _NoSpan(object):
+    """Returned when no trace is active, so instrumentation costs nothing outside a rerun."""
+
+    def set(self, **attributes):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+@contextmanager
+def span(name, **attributes):
+    """Times the enclosed block as a child of the current span. Does nothing without an active trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield NO_SPAN
+        return
+
+    current = Span(name, parent, attributes)
+    parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=repr(e))
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+
+
+def traced(name=None, **attributes):
+    """Decorator version of ``span``."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    return _current_span.get() or NO_SPAN
+
+
+def start_trace(name, **attributes):
+    """Starts a new trace for this rerun and makes its root the current span."""
+    root = Span(name, attributes=attributes)
+    _current_span.set(root)
+    return root
+
+
+def finish_trace(root):
+    """Closes the trace and appends it to ``TRACE_FILE`` if configured."""
+    root.finish()
+    _current_span.set(None)
+    if TRACE_FILE:
+        with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+            for line in trace_to_json_lines(root):
+                f.write(line + "\n")
+
+
+def trace_to_json_lines(root):
+    for current, depth in root.walk():
+        yield json.dumps({
+            'trace_id': current.trace_id,
+            'span_id': current.span_id,
+            'parent_id': current.parent.span_id if current.parent else None,
+            'name': current.name,
+            'depth': depth,
+            'start_ms': round((current.start - root.start) * 1000, 3),
+            'duration_ms': round(current.duration * 1000, 3),
+            'attributes': current.attributes,
+        }, default=str)
+
+
+def waterfall_html(root):
+    """Renders the trace as a waterfall of horizontal bars."""
+    total = root.duration or 1e-9
+    rows = []
+    for current, depth in root.walk():
+        left = (current.start - root.start) / total * 100
+        width = max(current.duration / total * 100, 0.3)
+        attributes = ", ".join(f"{key}={value}" for key, value in current.attributes.items())
+        label = html.escape(f"{current.name} {current.duration * 1000:.1f} ms {attributes}")
+        color = '#e57373' if 'error' in current.attributes else '#64b5f6'
+        rows.append(
+            f'<div style="display:flex; font-size:0.75rem; line-height:1.1rem">'
+            f'<div style="width:40%; padding-left:{depth * 12}px; white-space:nowrap; overflow:hidden; '
+            f'text-overflow:ellipsis" title="{label}">{label}</div>'
+            f'<div style="width:60%; position:relative">'
+            f'<div style="position:absolute; left:{left:.2f}%; width:{width:.2f}%; height:0.8rem; '
+            f'top:0.15rem; background:{color}"></div></div></div>')
+    return "".join(rows)
@@ -0,0 +1,82 @@
+import re
+import hashlib
+import unicodedata
+
+from utils.filecache import get_disk_cache, record_cache_access
+
+
+# Satzgrenze: Satzzeichen, Leerraum, dann ein neuer Satzanfang
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=[\"\'(\[0-9A-ZÀ-ÖØ-Þ])')
+
+# Abkürzungen, nach denen kein neuer Satz beginnt, klein geschrieben
+ABBREVIATIONS = {
+    'dr.', 'mr.', 'mrs.', 'ms.', 'prof.', 'st.', 'sr.', 'jr.', 'mt.', 'ft.', 'gen.', 'col.', 'lt.', 'sgt.', 'rev.',
+    'vs.', 'etc.', 'e.g.', 'i.e.', 'ca.', 'approx.', 'jan.', 'feb.', 'mar.', 'apr.', 'jun.',
+    'jul.', 'aug.', 'sep.', 'sept.', 'oct.', 'nov.', 'dec.', 'u.s.', 'u.k.',
+    'z.b.', 'd.h.', 'u.a.', 'bzw.', 'ggf.', 'vgl.', 'hl.', 'str.', 'mio.', 'mrd.', 'jh.', 'jhd.',
+    'mme.', 'mlle.', 'sta.', 'sto.', 'sra.', 'ecc.', 'sig.', 'dott.',
+}
+# Nur vor einer Zahl Abkürzungen, "No." allein ist ein Satz
+NUMBER_ABBREVIATIONS = {'no.', 'nos.', 'nr.', 'vol.', 'art.', 'p.', 'pp.'}
+# Initialen wie in "J. R. R. Tolkien"
+INITIAL = re.compile(r'^[A-ZÀ-ÖØ-Þ]\.$')
+
+
+def split_sentences(text):
+    """Splits a line of text into sentences, keeping the sentences unchanged."""
+    sentences = []
+    for part in SENTENCE_BOUNDARY.split(text.strip()):
+        last_word = sentences[-1].rsplit(' ', 1)[-1] if sentences else ''
+        # Abkürzungen wie "Dr." oder "St." beenden keinen Satz, kurze Sätze wie "Ja." schon
+        if (last_word.lower() in ABBREVIATIONS or INITIAL.match(last_word)
+                or (last_word.lower() in NUMBER_ABBREVIATIONS and part[:1].isdigit())):
+            sentences[-1] += ' ' + part
+        elif part:
+            sentences.append(part)
+    return sentences
+
+
+def normalize_sentence(text, is_search_term=False):
+    """
+      Normalizes a sentence before it is hashed, so that sentences that only differ
+      in whitespace or unicode composition share one entry.
+      Search terms are also case folded and stripped of surrounding punctuation.
+    """
+    text = unicodedata.normalize('NFC', text)
+    text = ' '.join(text.split())
+    if is_search_term:
+        text = text.casefold().strip(' .,;:!?"\'')
+    return text
+
+
+def memory_key(text, target_language, is_search_term=False):
+    kind = 'term' if is_search_term else 'sentence'
+    digest = hashlib.sha1(normalize_sentence(text, is_search_term).encode('utf-8')).hexdigest()
+    return 'tm', kind, digest, target_language
+
+
+def lookup(text, target_language, is_search_term=False):
+    """Returns the remembered translation of `text` or None."""
+    translation = get_disk_cache().get(memory_key(text, target_language, is_search_term))
+    record_cache_access('translation_memory', translation is not None)
+    return translation
+
+
+def store(text, target_language, translation, is_search_term=False):
+    get_disk_cache()[memory_key(text, target_language, is_search_term)] = translation
+
+
+def label_key(label, target_language):
+    # Feldnamen wie "birth_date" kommen in fast jeder Infobox vor, sie teilen sich alle Artikel
+    return 'tm', 'label', normalize_sentence(label, is_search_term=True), target_language
+
+
+def lookup_label(label, target_language):
+    """Returns the remembered translation of an infobox label or None."""
+    translation = get_disk_cache().get(label_key(label, target_language))
+    record_cache_access('label_dictionary', translation is not None)
+    return translation
+
+
+def store_label(label, target_language, translation):
+    get_disk_cache()[label_key(label, target_language)] = translation
@@ -0,0 +1,318 @@
+"""
+Offline access to Wikipedia through a local multistream dump (``pages-articles-multistream.xml.bz2``).
+
+The dump comes with a text index ``offset:pageid:title``. ``build_index`` turns it into a binary
+file that is memory-mapped and binary searched, so looking up a title costs a few page faults
+instead of an API round trip:
+
+    python -m utils.wiki_dump build enwiki-latest-pages-articles-multistream-index.txt.bz2 enwiki.idx
+
+Layout of the index file (all integers little endian):
+
+* header - magic, number of entries, offset of the title table, offset of the page id table
+* records - stream offset (uint64), page id (uint64), title length (uint16), UTF-8 title
+* title table - record positions (uint64), sorted by the case folded title
+* page id table - page id and record position (2 x uint64), sorted by page id
+"""
+import bz2
+import mmap
+import re
+import struct
+import sys
+from collections import OrderedDict
+from urllib.parse import quote
+from xml.etree import ElementTree
+
+import mwparserfromhell
+from wikipedia.exceptions import PageError, DisambiguationError, RedirectError
+
+from utils.wiki_utils import WikipediaPage
+
+
+MAGIC = b'FWIDX001'
+HEADER = struct.Struct('<8sQQQ')
+RECORD = struct.Struct('<QQH')
+POSITION = struct.Struct('<Q')
+PAGEID_ENTRY = struct.Struct('<QQ')
+
+# Begriffsklärungs-Vorlagen der unterstützten Sprachen
+DISAMBIGUATION_TEMPLATES = re.compile(
+    r'\{\{\s*(disambiguation|disambig|dab|hndis|geodis|begriffsklärung|homonymie|desambiguación|disambigua)\s*[|}]',
+    re.IGNORECASE)
+# Wie die API folgt der Dump auch doppelten Weiterleitungen, aber nicht endlos
+MAX_REDIRECTS = 5
+SKIPPED_LINK_PREFIXES = ('file:', 'image:', 'category:', 'datei:', 'kategorie:', 'fichier:', 'catégorie:',
+                         'archivo:', 'categoría:', 'categoria:')
+
+
+def _title_key(title):
+    return title.casefold()
+
+
+def build_index(index_path, output_path):
+    """
+      Build the binary title index from the dump's ``multistream-index.txt(.bz2)``.
+
+      Arguments:
+
+      * index_path - path of the text index that ships with the multistream dump
+      * output_path - path of the binary index to write
+    """
+    opener = bz2.open if index_path.endswith('.bz2') else open
+    entries = []
+    with opener(index_path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            stream_offset, page_id, title = line.rstrip('\n').split(':', 2)
+            entries.append((title, int(stream_offset), int(page_id)))
+
+    with open(output_path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, 0, 0, 0))
+        positions = []
+        for title, stream_offset, page_id in entries:
+            encoded = title.encode('utf-8')
+            positions.append(out.tell())
+            out.write(RECORD.pack(stream_offset, page_id, len(encoded)))
+            out.write(encoded)
+
+        title_table = out.tell()
+        order = sorted(range(len(entries)), key=lambda i: (_title_key(entries[i][0]), entries[i][0]))
+        for i in order:
+            out.write(POSITION.pack(positions[i]))
+
+        pageid_table = out.tell()
+        for i in sorted(range(len(entries)), key=lambda i: entries[i][2]):
+            out.write(PAGEID_ENTRY.pack(entries[i][2], positions[i]))
+
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, len(entries), title_table, pageid_table))
+
+    print(f"Indexed {len(entries)} titles into {output_path}")
+
+
+class WikiDump(object):
+    """
+      A local multistream dump plus its binary title index.
+    """
+
+    def __init__(self, dump_path, index_path, lang='en', stream_cache_size=16):
+        self.dump_path = dump_path
+        self.lang = lang
+        self.stream_cache_size = stream_cache_size
+        self._streams = OrderedDict()
+
+        with open(index_path, 'rb') as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._title_table, self._pageid_table = HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{index_path} is not a Full Wiki dump index")
+
+    def _record(self, position):
+        stream_offset, page_id, length = RECORD.unpack_from(self._index, position)
+        start = position + RECORD.size
+        title = self._index[start:start + length].decode('utf-8')
+        return title, stream_offset, page_id
+
+    def _record_by_rank(self, rank):
+        position, = POSITION.unpack_from(self._index, self._title_table + rank * POSITION.size)
+        return self._record(position)
+
+    def _lower_bound(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if _title_key(self._record_by_rank(middle)[0]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, title):
+        """Returns ``(title, stream offset, page id)`` for `title` or None."""
+        key = _title_key(title)
+        rank = self._lower_bound(key)
+        first_match = None
+        while rank < self.count:
+            record = self._record_by_rank(rank)
+            if _title_key(record[0]) != key:
+                break
+            if record[0] == title:
+                return record
+            first_match = first_match or record
+            rank += 1
+        return first_match
+
+    def find_pageid(self, page_id):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            current, position = PAGEID_ENTRY.unpack_from(self._index, self._pageid_table + middle * PAGEID_ENTRY.size)
+            if current == page_id:
+                return self._record(position)
+            if current < page_id:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def prefix_search(self, prefix, results=10):
+        """Titles starting with `prefix` (case insensitive) in index order."""
+        return [title for title, _ in self.prefix_records(prefix, results=results)]
+
+    def prefix_records(self, prefix, results=10):
+        """``(title, page id)`` of the titles starting with `prefix` (case insensitive) in index order."""
+        key = _title_key(prefix.strip())
+        rank = self._lower_bound(key)
+        records = []
+        while rank < self.count and len(records) < results:
+            title, _, page_id = self._record_by_rank(rank)
+            if not _title_key(title).startswith(key):
+                break
+            records.append((title, str(page_id)))
+            rank += 1
+        return records
+
+    def _read_stream(self, stream_offset):
+        if stream_offset in self._streams:
+            self._streams.move_to_end(stream_offset)
+            return self._streams[stream_offset]
+
+        decompressor = bz2.BZ2Decompressor()
+        chunks = []
+        with open(self.dump_path, 'rb') as f:
+            f.seek(stream_offset)
+            while not decompressor.eof:
+                data = f.read(256 * 1024)
+                if not data:
+                    break
+                chunks.append(decompressor.decompress(data))
+        stream = b''.join(chunks).decode('utf-8')
+
+        self._streams[stream_offset] = stream
+        if len(self._streams) > self.stream_cache_size:
+            self._streams.popitem(last=False)
+        return stream
+
+    def read_page(self, stream_offset, page_id):
+        """Returns the ``<page>`` element with `page_id` from the stream at `stream_offset`."""
+        stream = self._read_stream(stream_offset)
+        marker = f'<id>{page_id}</id>'
+        end = 0
+        while True:
+            start = stream.find('<page>', end)
+            if start < 0:
+                return None
+            end = stream.find('</page>', start)
+            if end < 0:
+                # Abgeschnittener Stream
+                return None
+            end += len('</page>')
+            # Die erste <id> einer Seite ist die Page-ID, die folgenden gehören zur Revision
+            if stream.find('<id>', start, end) == stream.find(marker, start, end):
+                return ElementTree.fromstring(stream[start:end])
+
+    def page(self, title=None, pageid=None, auto_suggest=True, redirect=True, preload=False):
+        if title is not None and auto_suggest:
+            results = self.prefix_search(title, results=1)
+            if not results:
+                raise PageError(title)
+            title = results[0]
+        return DumpWikipediaPage(self, title=title, pageid=pageid, redirect=redirect)
+
+
+class DumpWikipediaPage(WikipediaPage):
+    """
+      A WikipediaPage that is read from a local dump instead of the API.
+      The dump holds no page views and no page image, the image falls back to the infobox.
+    """
+
+    def __init__(self, dump, title=None, pageid=None, redirect=True, original_title=''):
+        if title is not None:
+            record = dump.find(title)
+            if record is None:
+                raise PageError(title)
+        elif pageid is not None:
+            record = dump.find_pageid(int(pageid))
+            if record is None:
+                raise PageError(pageid=pageid)
+        else:
+            raise ValueError("Either a title or a pageid must be specified")
+
+        self.original_title = original_title or record[0]
+        for _ in range(MAX_REDIRECTS + 1):
+            self.title, stream_offset, page_id = record
+            element = dump.read_page(stream_offset, page_id)
+            if element is None:
+                raise PageError(self.title)
+            redirect_element = element.find('redirect')
+            if redirect_element is None:
+                break
+            if not redirect:
+                raise RedirectError(self.title)
+            record = dump.find(redirect_element.get('title'))
+            if record is None:
+                raise PageError(redirect_element.get('title'))
+        else:
+            # Weiterleitungsschleife
+            raise RedirectError(self.title)
+
+        self.pageid = str(page_id)
+        self.lang = dump.lang
+        self.url = f"https://{dump.lang}.wikipedia.org/wiki/{quote(self.title.replace(' ', '_'))}"
+
+        self._content = element.findtext('revision/text') or ''
+        if DISAMBIGUATION_TEMPLATES.search(self._content):
+            raise DisambiguationError(self.title, self._linked_titles())
+
+        self._extract = _wikitext_to_extract(self._content)
+        self._image_name = None
+        self._pageviews = 0
+        self._revid = element.findtext('revision/id')
+        self._infobox = None
+
+    def _linked_titles(self):
+        wikicode = mwparserfromhell.parse(self._content)
+        return [str(link.title).strip() for link in wikicode.filter_wikilinks()
+                if not str(link.title).strip().lower().startswith(SKIPPED_LINK_PREFIXES)]
+
+    def load_content(self):
+        # Alles wurde bereits beim Lesen aus dem Dump geladen
+        pass
+
+
+def _wikitext_to_extract(wikitext):
+    """
+      Plain text in the format of the TextExtracts API: headings stay as ``== Title ==`` lines,
+      markup, references, files and categories are removed.
+    """
+    wikicode = mwparserfromhell.parse(wikitext)
+    skipped = [tag for tag in wikicode.filter_tags() if str(tag.tag).strip().lower() in ('ref', 'references', 'gallery')]
+    skipped += [link for link in wikicode.filter_wikilinks()
+                if str(link.title).strip().lower().startswith(SKIPPED_LINK_PREFIXES)]
+    for node in skipped:
+        try:
+            wikicode.remove(node)
+        except ValueError:
+            # Bereits mit einem äußeren Knoten entfernt
+            pass
+
+    extract = ''
+    text_nodes = []
+    for node in wikicode.nodes + [None]:
+        if node is None or isinstance(node, mwparserfromhell.nodes.Heading):
+            text = mwparserfromhell.wikicode.Wikicode(text_nodes).strip_code(normalize=True, collapse=True)
+            if text.strip():
+                extract += text.strip() + "\n"
+            text_nodes = []
+            if node is not None:
+                marks = '=' * node.level
+                extract += f"\n\n{marks} {node.title.strip_code().strip()} {marks}\n"
+        else:
+            text_nodes.append(node)
+    return extract.strip() + "\n"
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'build':
+        print("Usage: python -m utils.wiki_dump build <multistream-index.txt.bz2> <output.idx>")
+        sys.exit(1)
+    build_index(sys.argv[2], sys.argv[3])
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+import re
 import requests
 import time
 import mwparserfromhell
@@ -8,14 +9,36 @@ from datetime import datetime, timedelta
 
 from wikipedia.exceptions import (HTTPTimeoutError, WikipediaException, PageError, DisambiguationError,
                                   RedirectError, ODD_ERROR_MESSAGE)
-from wikipedia.util import cache, stdout_encode
+from wikipedia.util import stdout_encode
 from wikipedia import wikipedia
 
-API_URL = 'http://en.wikipedia.org/w/api.php'
+from utils.tracing import span
+from utils.filecache import get_disk_cache, record_cache_access
+
+API_URL_TEMPLATE = 'http://{lang}.wikipedia.org/w/api.php'
+API_URL = API_URL_TEMPLATE.format(lang='en')
 RATE_LIMIT = False
 RATE_LIMIT_MIN_WAIT = timedelta(milliseconds=50)
 RATE_LIMIT_LAST_CALL = None
 USER_AGENT = 'wikipedia (https://github.com/goldsmith/Wikipedia/)'
+LANG = 'en'
+DUMPS = {}
+# Eine HTTP-Session für den ganzen Prozess, die Verbindungen zu Wikipedia werden wiederverwendet
+_http = requests.Session()
+
+# Breite der Vorschaubilder, statt die Originale in voller Auflösung einzubinden
+IMAGE_THUMB_WIDTH = 400
+# Höchstzahl an Titeln pro Anfrage der MediaWiki API
+IMAGE_BATCH_SIZE = 50
+PAGE_BATCH_SIZE = 50
+
+INFOBOX_START = re.compile(r'\{\{\s*Infobox', re.IGNORECASE)
+# Kommentare und Blöcke, in denen Klammern nicht zählen und keine Infobox beginnt
+SKIPPED_WIKITEXT = (r'<!--.*?(?:-->|\Z)'
+                    r'|<(nowiki|pre|syntaxhighlight|source|math)\b[^>]*?(?:/>|>.*?(?:</\1\s*>|\Z))')
+SKIPPED_SPANS = re.compile(SKIPPED_WIKITEXT, re.IGNORECASE | re.DOTALL)
+# Bei Vorlagenparametern ({{{1}}}) stimmt das Zählen der Klammern nicht, dann wird die Seite geparst
+INFOBOX_TOKENS = re.compile(SKIPPED_WIKITEXT + r'|\{\{\{|\{\{|\}\}', re.IGNORECASE | re.DOTALL)
 
 
 def set_lang(prefix):
@@ -29,7 +52,9 @@ def set_lang(prefix):
     """
 
     global API_URL
-    API_URL = 'http://' + prefix.lower() + '.wikipedia.org/w/api.php'
+    global LANG
+    API_URL = API_URL_TEMPLATE.format(lang=prefix.lower())
+    LANG = prefix.lower()
 
     #for cached_func in (search):
     #    cached_func.clear_cache()
@@ -79,6 +104,25 @@ def set_rate_limiting(rate_limit, min_wait=timedelta(milliseconds=50)):
     RATE_LIMIT_LAST_CALL = None
 
 
+def use_dump(dump_path, index_path, lang='en'):
+    """
+      Serve ``search`` and ``page`` for `lang` from a local multistream dump instead of the API.
+      Search becomes a title prefix search.
+
+      Arguments:
+
+      * dump_path - path of the ``pages-articles-multistream.xml.bz2`` dump
+      * index_path - path of the binary index built with ``python -m utils.wiki_dump build``
+
+      Keyword arguments:
+
+      * lang - language of the dump
+    """
+    from utils.wiki_dump import WikiDump
+
+    DUMPS[lang] = WikiDump(dump_path, index_path, lang=lang)
+
+
 def search(query, results=10, suggestion=False):
     """
       Do a Wikipedia search for `query`.
@@ -96,6 +140,10 @@ def search(query, results=10, suggestion=False):
         'limit': results,
         'srsearch': query
     }
+    if LANG in DUMPS:
+        search_results = DUMPS[LANG].prefix_search(query, results=results)
+        return (search_results, None) if suggestion else search_results
+
     if suggestion:
         search_params['srinfo'] = 'suggestion'
     print("Current API URL: ", API_URL, " using query ", query  )
@@ -118,6 +166,165 @@ def search(query, results=10, suggestion=False):
     return list(search_results)
 
 
+def search_candidates(query, results=5, sentences=2, lang=None):
+    """
+      The best `results` hits of a search for `query` on the Wikipedia of `lang` with the first
+      `sentences` sentences of each article, all in one request. Returns a list of dicts with
+      ``title``, ``pageid``, ``extract`` and ``disambiguation``, best hit first.
+    """
+    lang = lang or LANG
+    if lang in DUMPS:
+        return [{'title': title, 'pageid': pageid, 'extract': '', 'disambiguation': False}
+                for title, pageid in DUMPS[lang].prefix_records(query, results=results)]
+
+    params = {
+        'generator': 'search',
+        'gsrsearch': query,
+        'gsrlimit': results,
+        'prop': 'extracts|pageprops',
+        'exintro': '',
+        'explaintext': '',
+        'exsentences': sentences,
+        'exlimit': results,
+        'ppprop': 'disambiguation',
+        'formatversion': '2',
+    }
+    raw_results = _wiki_request(params, lang=lang)
+    if 'error' in raw_results:
+        if raw_results['error']['info'] in ('HTTP request timed out.', 'Pool queue is full'):
+            raise HTTPTimeoutError(query)
+        raise WikipediaException(raw_results['error']['info'])
+
+    # Die Seiten eines Generators kommen ungeordnet, die Reihenfolge der Suche steht in index
+    pages = sorted(raw_results.get('query', {}).get('pages', []), key=lambda page: page.get('index', 0))
+    return [{'title': page['title'], 'pageid': str(page['pageid']), 'extract': page.get('extract', ''),
+             'disambiguation': 'disambiguation' in page.get('pageprops', {})} for page in pages]
+
+
+def _langlink_key(lang, title):
+    return 'langlink', lang, ' '.join(title.split()).casefold()
+
+
+def english_title(query, lang):
+    """
+      Title of the English article for a search `query` in another language, or None.
+
+      Searches the Wikipedia of `lang` and follows the interlanguage link of the best hit, both in
+      one API call. Queries and foreign titles are remembered in the disk cache, so the index of
+      foreign -> English titles grows with every search.
+    """
+    cache = get_disk_cache()
+    title = cache.get(_langlink_key(lang, query))
+    record_cache_access('langlink_index', title is not None)
+    if title is not None:
+        return title
+
+    if lang in DUMPS:
+        # Der Dump enthält keine Sprachlinks
+        return None
+
+    params = {
+        'generator': 'search',
+        'gsrsearch': query,
+        'gsrlimit': 1,
+        'prop': 'langlinks',
+        'lllang': 'en',
+        'formatversion': '2',
+    }
+    raw_results = _wiki_request(params, lang=lang)
+    if 'error' in raw_results:
+        raise WikipediaException(raw_results['error']['info'])
+
+    for page in raw_results.get('query', {}).get('pages', []):
+        for langlink in page.get('langlinks', []):
+            title = langlink.get('title') or langlink.get('*')
+            if title:
+                cache[_langlink_key(lang, query)] = title
+                cache[_langlink_key(lang, page['title'])] = title
+                return title
+    return None
+
+
+def langlink_title(title, lang, pageid=None):
+    """
+      Title of the English article the article `title` on the Wikipedia of `lang` links to, or None.
+      With `pageid` the article is addressed by its id. Shares the disk cache with ``english_title``.
+    """
+    cache = get_disk_cache()
+    english = cache.get(_langlink_key(lang, title))
+    record_cache_access('langlink_index', english is not None)
+    if english is not None or lang in DUMPS:
+        return english
+
+    params = {
+        'prop': 'langlinks',
+        'lllang': 'en',
+        'formatversion': '2',
+    }
+    if pageid:
+        params['pageids'] = pageid
+    else:
+        params['titles'] = title
+    raw_results = _wiki_request(params, lang=lang)
+    if 'error' in raw_results:
+        raise WikipediaException(raw_results['error']['info'])
+
+    for page in raw_results.get('query', {}).get('pages', []):
+        for langlink in page.get('langlinks', []):
+            english = langlink.get('title') or langlink.get('*')
+            if english:
+                cache[_langlink_key(lang, title)] = english
+                return english
+    return None
+
+
+def linked_titles(title, languages, lang='en'):
+    """
+      Titles of the articles in `languages` that the article `title` on the Wikipedia of `lang`
+      links to, as dict of language -> title, all in one request. Languages without an article
+      are left out.
+    """
+    params = {
+        'prop': 'langlinks',
+        'titles': title,
+        'lllimit': 'max',
+        'redirects': '',
+        'formatversion': '2',
+    }
+    raw_results = _wiki_request(params, lang=lang)
+    if 'error' in raw_results:
+        raise WikipediaException(raw_results['error']['info'])
+
+    titles = {}
+    for page in raw_results.get('query', {}).get('pages', []):
+        for langlink in page.get('langlinks', []):
+            linked = langlink.get('title') or langlink.get('*')
+            if langlink.get('lang') in languages and linked:
+                titles[langlink['lang']] = linked
+    return titles
+
+
+def prefix_search(prefix, lang=None, results=10):
+    """
+      Titles starting with `prefix` as a list of ``(title, pageid)``, from the dump of `lang` if
+      there is one, otherwise with the prefixsearch module of the API, which unlike opensearch
+      also returns the page ids.
+    """
+    lang = lang or LANG
+    if lang in DUMPS:
+        return DUMPS[lang].prefix_records(prefix, results=results)
+
+    params = {
+        'list': 'prefixsearch',
+        'pssearch': prefix,
+        'pslimit': results,
+    }
+    raw_results = _wiki_request(params, lang=lang)
+    if 'error' in raw_results:
+        raise WikipediaException(raw_results['error']['info'])
+    return [(result['title'], str(result['pageid'])) for result in raw_results['query']['prefixsearch']]
+
+
 def page(title=None, pageid=None, auto_suggest=True, redirect=True, preload=False):
     """
       Get a WikipediaPage object for the page with title `title` or the pageid
@@ -132,6 +339,9 @@ def page(title=None, pageid=None, auto_suggest=True, redirect=True, preload=Fals
       * preload - load content, summary, images, references, and links during initialization
     """
 
+    if LANG in DUMPS:
+        return DUMPS[LANG].page(title=title, pageid=pageid, auto_suggest=auto_suggest, redirect=redirect)
+
     if title is not None:
         if auto_suggest:
             results, suggestion = search(title, results=1, suggestion=True)
@@ -147,10 +357,165 @@ def page(title=None, pageid=None, auto_suggest=True, redirect=True, preload=Fals
         raise ValueError("Either a title or a pageid must be specified")
 
 
-def _wiki_request(params):
+def pages(titles_or_ids, lang=None, redirect=True, preload=True):
+    """
+      Loads several pages with batched queries instead of one ``page`` call each: one info query
+      per PAGE_BATCH_SIZE titles or page ids and one content query for the pages found, following
+      the continuation the API needs for whole extracts.
+
+      Keyword arguments:
+
+      * titles_or_ids - titles (str) and page ids (int) of the pages to load
+      * lang - the Wikipedia to load from, without it the language set with ``set_lang``
+      * redirect - follow redirects instead of returning a RedirectError
+      * preload - load the content of all pages, otherwise it is loaded on first access
+
+      Returns a dict of every requested title or page id -> WikipediaPage, or the PageError,
+      RedirectError or DisambiguationError that ``page`` would raise for it.
+    """
+    lang = lang or LANG
+    requested = list(dict.fromkeys(titles_or_ids))
+    results = {}
+
+    if lang in DUMPS:
+        for item in requested:
+            try:
+                if isinstance(item, int):
+                    results[item] = DUMPS[lang].page(pageid=item, auto_suggest=False, redirect=redirect)
+                else:
+                    results[item] = DUMPS[lang].page(title=item, auto_suggest=False, redirect=redirect)
+            except WikipediaException as e:
+                results[item] = e
+        return results
+
+    info_params = {
+        'prop': 'info|pageprops',
+        'inprop': 'url',
+        'ppprop': 'disambiguation',
+    }
+    infos = {}
+    # Angefragter Titel -> angefragte Einträge, Weiterleitungen von Page-IDs werden über den Titel aufgelöst
+    titles = {item: [item] for item in requested if not isinstance(item, int)}
+
+    page_ids = [item for item in requested if isinstance(item, int)]
+    for start in range(0, len(page_ids), PAGE_BATCH_SIZE):
+        batch = page_ids[start:start + PAGE_BATCH_SIZE]
+        query_pages, _ = _query_pages(dict(info_params, pageids="|".join(map(str, batch))), lang)
+        by_id = {page.get('pageid'): page for page in query_pages}
+        for pageid in batch:
+            info = by_id.get(pageid)
+            if info is None or 'missing' in info:
+                results[pageid] = PageError(pageid=pageid)
+            elif info.get('redirect') and redirect:
+                titles.setdefault(info['title'], []).append(pageid)
+            else:
+                infos[pageid] = info
+
+    title_list = list(titles)
+    for start in range(0, len(title_list), PAGE_BATCH_SIZE):
+        batch = title_list[start:start + PAGE_BATCH_SIZE]
+        params = dict(info_params, titles="|".join(batch))
+        if redirect:
+            params['redirects'] = ''
+        query_pages, aliases = _query_pages(params, lang)
+        by_title = {page['title']: page for page in query_pages}
+        for title in batch:
+            # Erst normalisiert, dann weitergeleitet
+            resolved = aliases.get(title, title)
+            resolved = aliases.get(resolved, resolved)
+            info = by_title.get(resolved)
+            for item in titles[title]:
+                if info is None or 'missing' in info or 'invalid' in info:
+                    results[item] = PageError(pageid=item) if isinstance(item, int) else PageError(item)
+                else:
+                    infos[item] = info
+
+    found = {}
+    disambiguations = {}
+    for item, info in infos.items():
+        if info.get('redirect'):
+            results[item] = RedirectError(info['title'])
+        elif 'pageprops' in info:
+            disambiguations[item] = info
+        else:
+            found[item] = info
+
+    if disambiguations:
+        # Wie bei page() die Seiten, auf die eine Begriffsklärung verweist
+        links = {}
+        pageids = list(dict.fromkeys(info['pageid'] for info in disambiguations.values()))
+        for start in range(0, len(pageids), PAGE_BATCH_SIZE):
+            params = {'prop': 'links', 'plnamespace': 0, 'pllimit': 'max',
+                      'pageids': "|".join(map(str, pageids[start:start + PAGE_BATCH_SIZE]))}
+            for page in _query_pages(params, lang)[0]:
+                links[page['pageid']] = [link['title'] for link in page.get('links', [])]
+        for item, info in disambiguations.items():
+            results[item] = DisambiguationError(info['title'], links.get(info['pageid'], []))
+
+    contents = {}
+    if preload and found:
+        pageids = list(dict.fromkeys(info['pageid'] for info in found.values()))
+        for start in range(0, len(pageids), PAGE_BATCH_SIZE):
+            params = {
+                'prop': 'extracts|revisions|pageimages|pageviews',
+                'explaintext': '',
+                'exlimit': 'max',
+                'rvprop': 'content|ids',
+                'rvslots': 'main',
+                'pageids': "|".join(map(str, pageids[start:start + PAGE_BATCH_SIZE])),
+            }
+            for page in _query_pages(params, lang)[0]:
+                contents[page.get('pageid')] = page
+
+    for item, info in found.items():
+        content = contents.get(info['pageid'])
+        if preload and (content is None or 'missing' in content or not content.get('revisions')):
+            # Zwischen Info- und Inhaltsabfrage gelöscht, nur diese Seite fehlt
+            results[item] = PageError(pageid=item) if isinstance(item, int) else PageError(item)
+            continue
+        wiki_page = WikipediaPage.from_query(info, lang, original_title=item if isinstance(item, str) else '')
+        if content is not None:
+            wiki_page._set_content(content)
+        results[item] = wiki_page
+
+    return results
+
+
+def _query_pages(params, lang=None):
+    """
+      Runs a query for several pages and follows its continuation, e.g. for extracts, of which
+      the API returns only one whole extract per request. Returns the pages with the fields of
+      all responses merged, and the normalized and redirected titles as dict of from -> to.
+    """
+    params = dict(params, formatversion='2')
+    pages = {}
+    aliases = {}
+    continuation = {}
+    while True:
+        request = _wiki_request(dict(params, **continuation), lang=lang)
+        if 'error' in request:
+            raise WikipediaException(request['error']['info'])
+        query = request.get('query', {})
+        for alias in query.get('normalized', []) + query.get('redirects', []):
+            aliases[alias['from']] = alias['to']
+        for page in query.get('pages', []):
+            # Fehlende Titel haben keine Page-ID
+            merged = pages.setdefault(page.get('pageid') or page['title'], {})
+            for field, value in page.items():
+                if isinstance(value, list) and isinstance(merged.get(field), list):
+                    merged[field].extend(value)
+                else:
+                    merged.setdefault(field, value)
+        if 'continue' not in request:
+            return list(pages.values()), aliases
+        continuation = request['continue']
+
+
+def _wiki_request(params, lang=None):
     """
       Make a request to the Wikipedia API using the given search parameters.
       Returns a parsed dict of the JSON response.
+      Without `lang` the language set with ``set_lang`` is used.
     """
     global RATE_LIMIT_LAST_CALL
     global USER_AGENT
@@ -171,7 +536,9 @@ def _wiki_request(params):
         wait_time = (RATE_LIMIT_LAST_CALL + RATE_LIMIT_MIN_WAIT) - datetime.now()
         time.sleep(int(wait_time.total_seconds()))
 
-    r = requests.get(API_URL, params=params, headers=headers)
+    api_url = API_URL_TEMPLATE.format(lang=lang) if lang else API_URL
+    with span('wiki_request', lang=lang or LANG, query=params.get('list') or params.get('prop') or params['action']):
+        r = _http.get(api_url, params=params, headers=headers)
 
     if RATE_LIMIT:
         RATE_LIMIT_LAST_CALL = datetime.now()
@@ -179,20 +546,54 @@ def _wiki_request(params):
     return r.json()
 
 
-@cache
-def get_image_url(filename):
-    params = {
-        "prop": "imageinfo",
-        "titles": f"File:{filename}",
-        "iiprop": "url"
-    }
+def get_image_urls(filenames, lang=None, width=IMAGE_THUMB_WIDTH):
+    """
+      Resolves several image files to thumbnail URLs of the given width, with one imageinfo
+      query per IMAGE_BATCH_SIZE files. Resolved URLs are kept in the disk cache.
+
+      Returns a dict of filename -> URL; files that do not exist are left out.
+    """
+    lang = lang or LANG
+    cache = get_disk_cache()
+    urls = {}
+    missing = []
+    for filename in dict.fromkeys(filenames):
+        url = cache.get(('image_url', lang, filename, width))
+        record_cache_access('image_url', url is not None)
+        if url is None:
+            missing.append(filename)
+        else:
+            urls[filename] = url
+
+    for start in range(0, len(missing), IMAGE_BATCH_SIZE):
+        batch = missing[start:start + IMAGE_BATCH_SIZE]
+        params = {
+            "prop": "imageinfo",
+            "titles": "|".join(f"File:{filename}" for filename in batch),
+            "iiprop": "url",
+            "iiurlwidth": width,
+        }
+        query = _wiki_request(params, lang=lang)['query']
+
+        # Die API normalisiert die Titel, z.B. Unterstriche zu Leerzeichen
+        filenames_by_title = {f"File:{filename}": filename for filename in batch}
+        for normalized in query.get('normalized', []):
+            filenames_by_title[normalized['to']] = filenames_by_title.get(normalized['from'])
+
+        for page in query['pages'].values():
+            filename = filenames_by_title.get(page.get('title'))
+            if not filename or not page.get('imageinfo'):
+                continue
+            image_info = page['imageinfo'][0]
+            # Nur kleinere Originale haben kein Vorschaubild
+            urls[filename] = image_info.get('thumburl') or image_info['url']
+            cache[('image_url', lang, filename, width)] = urls[filename]
 
-    raw_results = _wiki_request(params)
+    return urls
 
-    page = next(iter(raw_results['query']['pages'].values()))
-    image_info = page['imageinfo'][0]
-    image_url = image_info['url']
-    return image_url
+
+def get_image_url(filename, lang=None, width=IMAGE_THUMB_WIDTH):
+    return get_image_urls([filename], lang=lang, width=width).get(filename)
 
 
 class WikipediaPage(object):
@@ -215,10 +616,31 @@ class WikipediaPage(object):
         self._extract = None
         self._content = None
         self._image_name = None
+        self._pageviews = None
+        self._revid = None
+        self._infobox = None
+        self.lang = LANG
 
         if preload:
             self.load_content()
 
+    @classmethod
+    def from_query(cls, info, lang, original_title=''):
+        """A page from the answer of a batched info query, without a request of its own."""
+        page = cls.__new__(cls)
+        page.title = info['title']
+        page.original_title = original_title or info['title']
+        page.pageid = str(info['pageid'])
+        page.url = info['fullurl']
+        page._extract = None
+        page._content = None
+        page._image_name = None
+        page._pageviews = None
+        page._revid = None
+        page._infobox = None
+        page.lang = lang
+        return page
+
     def __repr__(self):
         return stdout_encode(u'<WikipediaPage \'{}\'>'.format(self.title))
 
@@ -325,9 +747,9 @@ class WikipediaPage(object):
 
         if not getattr(self, '_content', False):
             query_params = {
-                'prop': 'extracts|revisions|pageimages',
+                'prop': 'extracts|revisions|pageimages|pageviews',
                 'explaintext': '',
-                "rvprop": "content",
+                "rvprop": "content|ids",
                 "rvslots": "main",
                 "formatversion": "2",
                 "format": "json"
@@ -337,14 +759,23 @@ class WikipediaPage(object):
             else:
                 query_params['pageids'] = self.pageid
             print(query_params)
-            request = _wiki_request(query_params)
+            request = _wiki_request(query_params, lang=getattr(self, 'lang', None))
 
-            self._extract = request['query']['pages'][0]['extract']
-            self._content = request['query']['pages'][0]['revisions'][0]['slots']['main']['content']
             print(request['query']['pages'][0].keys())
             print(request['query']['pages'][0].get('pageimage'))
-            if 'pageimage' in request['query']['pages'][0]:
-                self._image_name = request['query']['pages'][0]['pageimage']
+            self._set_content(request['query']['pages'][0])
+
+    def _set_content(self, page):
+        """Takes over the extract, wikitext, revision, image and page views of a content query."""
+        revision = (page.get('revisions') or [{}])[0]
+        self._extract = page.get('extract', '')
+        self._content = revision.get('slots', {}).get('main', {}).get('content', '')
+        self._revid = revision.get('revid')
+        if 'pageimage' in page:
+            self._image_name = page['pageimage']
+        # Tägliche Aufrufe der letzten 60 Tage, fehlende Tage sind None
+        pageviews = page.get('pageviews', {})
+        self._pageviews = sum(views for views in pageviews.values() if views)
 
     @property
     def content(self):
@@ -368,24 +799,97 @@ class WikipediaPage(object):
         return self._image_name
 
     @property
-    def infobox(self):
-        page_content = self.content
-        wikicode = mwparserfromhell.parse(page_content)
+    def pageviews(self):
+        """Page views of the last 60 days, used as popularity of the article."""
+        if getattr(self, '_pageviews', None) is None:
+            self._content = None
+            self.load_content()
 
-        infoboxes = wikicode.filter_templates(matches="Infobox")
+        return self._pageviews
 
-        if not infoboxes:
+    @property
+    def infobox(self):
+        """
+          Parameters of the first infobox as plain text, or None.
+          Extracted once per revision and kept on the page and in the disk cache.
+        """
+        # Seiten aus älteren Caches haben die Attribute noch nicht
+        if getattr(self, '_infobox', None) is None:
+            page_content = self.content
+            revid = getattr(self, '_revid', None)
+            # Version 2: ohne die Fehler des Klammerzählens bei {{{1}}} und Kommentaren
+            key = ('infobox', 2, getattr(self, 'lang', LANG), self.pageid, revid)
+            infobox = get_disk_cache().get(key) if revid else None
+            record_cache_access('infobox', infobox is not None)
+            if infobox is None:
+                infobox = _parse_infobox(page_content)
+                if revid:
+                    get_disk_cache()[key] = infobox
+            self._infobox = infobox
+
+        # Ein leeres Dictionary steht für "keine Infobox"
+        return self._infobox or None
+
+
+def _infobox_wikitext(content):
+    """
+      The wikitext of the first infobox template, located without parsing the page. Comments and
+      nowiki, pre or math blocks are skipped while counting braces. None if the braces do not
+      balance or the infobox contains template parameters ({{{1}}}).
+    """
+    start = INFOBOX_START.search(content)
+    skipped_spans = SKIPPED_SPANS.finditer(content)
+    skipped = next(skipped_spans, None)
+    while start:
+        while skipped and skipped.end() <= start.start():
+            skipped = next(skipped_spans, None)
+        if not skipped or skipped.start() > start.start():
+            break
+        # Auskommentierte Infobox, die nächste suchen
+        start = INFOBOX_START.search(content, skipped.end())
+    if not start:
+        return None
+
+    depth = 0
+    for token in INFOBOX_TOKENS.finditer(content, start.start()):
+        if token.group() == '{{{':
             return None
-
-        infobox = infoboxes[0]  # Nehmen wir die erste gefundene Infobox
-        # print(infobox)
-        infobox_data = {}
-
-        for param in infobox.params:
-            param_name = str(param.name).strip()
-            param_value = str(param.value).strip()
-            # Bereinigen und Entfernen von übermäßigem Wikitext
-            param_value_clean = mwparserfromhell.parse(param_value).strip_code()
-            infobox_data[param_name] = param_value_clean
-
-        return infobox_data
+        if token.group() in ('{{', '}}'):
+            depth += 1 if token.group() == '{{' else -1
+            if depth == 0:
+                return content[start.start():token.end()]
+    return None
+
+
+def _find_infobox(wikicode):
+    for template in wikicode.filter_templates():
+        if str(template.name).strip().lower().startswith('infobox'):
+            return template
+    return None
+
+
+def _parse_infobox(content):
+    if not INFOBOX_START.search(content):
+        return {}
+
+    infobox = None
+    infobox_text = _infobox_wikitext(content)
+    if infobox_text:
+        with span('mwparser.parse', kind='infobox'):
+            nodes = mwparserfromhell.parse(infobox_text).nodes
+        if len(nodes) == 1 and isinstance(nodes[0], mwparserfromhell.nodes.Template):
+            infobox = nodes[0]
+    if infobox is None:
+        # Die ganze Seite parsen, wie vor dem schnellen Weg
+        with span('mwparser.parse', kind='infobox_page'):
+            infobox = _find_infobox(mwparserfromhell.parse(content))
+        if infobox is None:
+            return {}
+
+    infobox_data = {}
+    for param in infobox.params:
+        param_name = str(param.name).strip()
+        # Bereinigen und Entfernen von übermäßigem Wikitext, der Wert ist schon geparst
+        infobox_data[param_name] = param.value.strip_code().strip()
+
+    return infobox_data
@@ -1,42 +1,54 @@
 import re
-
-
-def convert_headings(text):
-    levels = {'=': '#', '==': '##', '===': '###', '====': '####'}
-    for wikicode, markdown in levels.items():
-        text = text.replace(wikicode, markdown).replace(wikicode[::-1], "")
-    return text
-
-
-#def convert_headings(text):
-#    # Regex, die die Wikitext-Überschriften erkennt und gruppiert
-#    pattern = r'(=+)([^=]+)\1'
-
-    # Funktion, die das Regex-Match nimmt und in Markdown-Format konvertiert
-#    def replace_with_markdown(match):
-#        level = len(match.group(1))  # Bestimmt die Tiefe der Überschrift basierend auf der Anzahl der '='
-#        heading_text = match.group(2).strip()  # Entfernt zusätzliche Leerzeichen um den Text
-#        return f"{'#' * level} {heading_text}"
-
-    # Ersetzt alle Überschriften im gegebenen Text
-#    return re.sub(pattern, replace_with_markdown, text)
-
-
-def convert_bold_italic(text):
-    text = text.replace("'''", '**')  # Fett in Markdown
-    text = text.replace("''", '*')    # Kursiv in Markdown
-    return text
-
-
-def convert_links(text):
-    pattern = r'\[\[(.*?)\|(.*?)\]\]'
-    replacement = r'[\2](\1)'
-    text = re.sub(pattern, replacement, text)
-    return text
-
-
-def wiki_to_markdown(text):
-    text = convert_headings(text)
-    text = convert_bold_italic(text)
-    text = convert_links(text)
-    return text
+from urllib.parse import quote
+
+
+# Überschriften, Hervorhebungen und Links in einem regulären Ausdruck, der Text wird nur einmal durchlaufen
+TOKEN = re.compile(r"""
+    # Der Lookahead lässt die Suche schnell über Text ohne Markup springen
+    (?=[='\[])
+    (?:
+      ^(?P<level>={1,6})[ \t]*(?P<title>[^\n]*?)[ \t]*(?P=level)[ \t]*$
+    | (?P<emphasis>'{5}|'{3}|'{2})
+    | \[\[(?P<target>[^\[\]|\n]+)(?:\|(?P<label>[^\[\]\n]*))?\]\]
+    )
+""", re.MULTILINE | re.VERBOSE)
+EMPHASIS = {"'''''": '***', "'''": '**', "''": '*'}
+HIDDEN_LINK_NAMESPACES = ('category:', 'file:', 'image:')
+
+
+def _article_url(target, lang):
+    return f"https://{lang}.wikipedia.org/wiki/{quote(target.strip().replace(' ', '_'), safe='/:#()')}"
+
+
+def _convert(match, lang):
+    if match.group('level'):
+        hashes = '#' * len(match.group('level'))
+        return f"{hashes} {wiki_to_markdown(match.group('title'), lang)} {hashes}"
+    if match.group('emphasis'):
+        return EMPHASIS[match.group('emphasis')]
+    target = match.group('target')
+    if target.strip().lower().startswith(HIDDEN_LINK_NAMESPACES):
+        return ''
+    label = wiki_to_markdown(match.group('label') or target, lang)
+    return f"[{label}]({_article_url(target, lang)})"
+
+
+def wiki_to_markdown(text, lang='en', escape=False):
+    """
+      Converts headings, bold and italic text and links of wikitext to Markdown in a single pass.
+
+      Headings become "## Title ##", links point to the article on the Wikipedia of `lang`.
+      Category and file links are dropped. With `escape` dollar signs are escaped and every line
+      break becomes a Markdown paragraph break, as needed for st.markdown.
+    """
+    text = str(text)
+    if escape:
+        # Escapes für st.markdown, str.replace ist hier schneller als jeder reguläre Ausdruck
+        if '$' in text:
+            text = text.replace("$", "\\$")
+        if '\n' in text:
+            text = text.replace("\n", "  \n  \n")
+    # Die meisten Knoten enthalten kein Markup
+    if '=' not in text and "''" not in text and '[[' not in text:
+        return text
+    return TOKEN.sub(lambda match: _convert(match, lang), text)